@@ -0,0 +1,19 @@
+import pytest
+
+
+class FakeClock:
+    """Manually advanced monotonic clock, its sleep() advances it instead of waiting."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
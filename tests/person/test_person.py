@@ -5,6 +5,7 @@ from swarm import Agent, Swarm  # type: ignore[import]
 from tests.person.test_person_response_form import filled_action_form_text  # noqa: F401
 from token_world.llm.llm import Message
 from token_world.person.person import (
+    PeopleManager,
     PersonHandler,
     person_entity,
     get_person_action_form,
@@ -99,3 +100,12 @@ def test_person_handler_act(filled_action_form_text):  # noqa: F811
     action = handler.act(client)
     assert action == "Go to the store"
     assert handler.message_traversal.node.message["content"] == filled_action_form_text
+
+
+def test_people_manager_remove_entity():
+    manager = PeopleManager(client=Mock(spec=Swarm), environment=Mock())
+    entity = person_entity("John Doe")
+    manager.add_entity(entity)
+    manager.remove_entity(entity.id)
+    manager.remove_entity(entity.id)
+    assert manager._person_handlers == {}
@@ -0,0 +1,84 @@
+import sqlite3
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from token_world.autosave import Checkpointer
+from token_world.entity import EntityManager, physical_entity
+
+
+def test_requires_a_trigger():
+    with pytest.raises(ValueError, match="interval or a tick count"):
+        Checkpointer(MagicMock(), interval=None)
+    with pytest.raises(ValueError, match="Tick count must be positive"):
+        Checkpointer(MagicMock(), every_n_ticks=0)
+
+
+def test_checkpoint_every_n_ticks():
+    saved = threading.Event()
+    save = MagicMock(side_effect=lambda: saved.set())
+    checkpointer = Checkpointer(save, interval=None, every_n_ticks=3)
+    checkpointer.start()
+    try:
+        checkpointer.tick()
+        checkpointer.tick()
+        assert not saved.wait(0.05)
+        checkpointer.tick()
+        assert saved.wait(1.0)
+    finally:
+        checkpointer.stop()
+    assert save.call_count == 1
+    assert checkpointer.checkpoint_count == 1
+    assert checkpointer.last_duration is not None
+
+
+def test_checkpoint_on_interval():
+    saved = threading.Semaphore(0)
+    checkpointer = Checkpointer(saved.release, interval=0.01)
+    checkpointer.start()
+    try:
+        assert saved.acquire(timeout=1.0)
+        assert saved.acquire(timeout=1.0)
+    finally:
+        checkpointer.stop()
+    checkpointer.stop()
+
+
+def test_double_start_raises():
+    checkpointer = Checkpointer(MagicMock(), interval=10.0)
+    checkpointer.start()
+    try:
+        with pytest.raises(RuntimeError, match="already started"):
+            checkpointer.start()
+    finally:
+        checkpointer.stop()
+
+
+def test_failed_checkpoint_is_logged(caplog):
+    checkpointer = Checkpointer(
+        MagicMock(side_effect=OSError("disk full")), interval=None, every_n_ticks=1
+    )
+    checkpointer.checkpoint()
+    assert checkpointer.checkpoint_count == 0
+    assert "Checkpoint failed: disk full" in caplog.text
+
+
+def test_background_save_of_entity_manager(tmp_path):
+    db_path = tmp_path / "world.db"
+    manager = EntityManager(db_path)
+    ball = physical_entity("Ball", x=1.0)
+    manager.add_entity(ball)
+    checkpointer = Checkpointer(manager.save, interval=None, every_n_ticks=1)
+    checkpointer.start()
+    try:
+        for i in range(50):
+            ball.properties["x"] = float(i)
+            checkpointer.tick()
+    finally:
+        checkpointer.stop()
+    manager.save()
+
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert conn.execute("SELECT x FROM entity_positions").fetchone() == (49.0,)
@@ -0,0 +1,146 @@
+import pickle
+import sqlite3
+
+import pytest
+
+from token_world.codec import CODECS, JsonCodec, OrjsonCodec, PickleCodec, codec_for
+from token_world.columnar import ColumnStore
+from token_world.entity import Entity, EntityManager, physical_entity
+
+PROPERTIES = {"is_physical": True, "x": 1.5, "mood": "calm", "memory": ["a", {"b": None}]}
+
+
+@pytest.fixture
+def tmp_db_path(tmpdir):
+    return tmpdir / "test_codec.db"
+
+
+def make_codec(name):
+    # orjson is an optional extra
+    if name == OrjsonCodec.name:
+        pytest.importorskip("orjson")
+    return CODECS[name]()
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_codecs_round_trip(name):
+    codec = make_codec(name)
+    encoded = codec.encode(PROPERTIES)
+    assert isinstance(encoded, bytes) == codec.binary
+    assert codec.decode(encoded) == PROPERTIES
+
+
+def test_json_codecs_are_compatible():
+    pytest.importorskip("orjson")
+    assert OrjsonCodec().decode(JsonCodec().encode(PROPERTIES)) == PROPERTIES
+    assert JsonCodec().decode(OrjsonCodec().encode(PROPERTIES)) == PROPERTIES
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_codecs_encode_column_backed_values(name):
+    codec = make_codec(name)
+    store = ColumnStore(("x",))
+    entity = physical_entity("Ball", x=1.0)
+    store.bind(entity)
+    store.column("x")[:] = 5.0
+    assert codec.decode(codec.encode(entity.properties))["x"] == 5.0
+
+
+def test_codec_for_falls_back_on_format():
+    json_codec, pickle_codec = JsonCodec(), PickleCodec()
+    assert codec_for("{}", json_codec) is json_codec
+    assert codec_for(b"", pickle_codec) is pickle_codec
+    assert isinstance(codec_for("{}", pickle_codec), JsonCodec)
+    with pytest.raises(ValueError, match="binary properties row"):
+        codec_for(b"", json_codec)
+
+
+def test_binary_codec_writes_whole_rows(tmp_db_path):
+    manager = EntityManager(tmp_db_path, codec=PickleCodec())
+    ball = physical_entity("Ball", x=3.0)
+    manager.add_entity(ball)
+    manager.save()
+    ball.properties["x"] = 4.0
+    manager.save()
+    with sqlite3.connect(tmp_db_path) as conn:
+        (data,) = conn.execute("SELECT properties FROM entities").fetchone()
+    assert isinstance(data, bytes)
+
+    reloaded = EntityManager(tmp_db_path, codec=PickleCodec())
+    reloaded.load()
+    assert reloaded.entities[ball.id] == ball
+    assert reloaded.dirty_count == 0
+    assert reloaded.find(("x", "=", 4.0)) == [ball]
+
+
+@pytest.mark.parametrize("cache_size", [None, 1])
+def test_text_rows_are_read_and_migrated_by_binary_codecs(tmp_db_path, cache_size):
+    ball = physical_entity("Ball", x=1.0)
+    other = Entity.new("Other", value=1)
+    manager = EntityManager(tmp_db_path)
+    manager.add_entity(ball)
+    manager.add_entity(other)
+    manager.save()
+    manager.close()
+
+    binary = EntityManager(tmp_db_path, cache_size=cache_size, codec=PickleCodec())
+    binary.load()
+    assert binary.entities[ball.id] == ball
+    # A lazy manager only migrates the entities it loaded
+    assert binary.dirty_count == (2 if cache_size is None else 1)
+    binary.entities[ball.id].properties["x"] = 2.0
+    binary.save()
+    binary.close()
+
+    with sqlite3.connect(tmp_db_path) as conn:
+        types = conn.execute(
+            "SELECT typeof(properties) FROM entities WHERE id = ?", (ball.id,)
+        ).fetchall()
+    assert types == [("blob",)]
+    reopened = EntityManager(tmp_db_path, codec=PickleCodec())
+    reopened.load()
+    assert reopened.entities[ball.id].properties["x"] == 2.0
+    assert reopened.entities[other.id] == other
+
+
+class _Payload:
+    ran = False
+
+    def __reduce__(self):
+        return (_Payload._run, ())
+
+    @staticmethod
+    def _run():
+        _Payload.ran = True
+        return {}
+
+
+@pytest.mark.parametrize("cache_size", [None, 1])
+def test_text_codecs_never_unpickle_binary_rows(tmp_db_path, cache_size):
+    manager = EntityManager(tmp_db_path)
+    manager.add_entity(Entity.new("Decoy"))
+    manager.save()
+    manager.close()
+    with sqlite3.connect(tmp_db_path) as conn:
+        conn.execute("UPDATE entities SET properties = ?", (pickle.dumps(_Payload()),))
+
+    reopened = EntityManager(tmp_db_path, cache_size=cache_size)
+    with pytest.raises(ValueError, match="binary properties row"):
+        reopened.load()
+        list(reopened.entities.values())
+    assert not _Payload.ran
+
+
+def test_new_indexed_columns_are_backfilled_from_binary_rows(tmp_db_path):
+    manager = EntityManager(tmp_db_path, codec=PickleCodec())
+    hot = Entity.new("Hot", temperature=90.0)
+    manager.add_entity(hot)
+    manager.add_entity(Entity.new("Cold", temperature=10.0))
+    manager.save()
+    manager.close()
+
+    indexed = EntityManager(
+        tmp_db_path, indexed_properties={"temperature": "REAL"}, codec=PickleCodec()
+    )
+    indexed.load()
+    assert indexed.find(("temperature", ">", 50.0)) == [hot]
@@ -0,0 +1,199 @@
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+from token_world.columnar import ColumnarProperties, ColumnStore
+from token_world.entity import Entity, EntityManager, EntityProperties, physical_entity
+
+
+@pytest.fixture
+def store():
+    return ColumnStore(("x", "y"), capacity=2)
+
+
+@pytest.fixture
+def manager(tmp_path, store):
+    return EntityManager(tmp_path / "test_entities.db", column_store=store)
+
+
+def test_requires_columns():
+    with pytest.raises(ValueError, match="at least one column"):
+        ColumnStore(())
+
+
+def test_bind_creates_view(store):
+    entity = physical_entity("Ball", x=1.0, y=2.0, color="red")
+    store.bind(entity)
+    assert isinstance(entity.properties, ColumnarProperties)
+    assert store.column("x").tolist() == [1.0]
+    store.column("x")[0] = 5.0
+    assert entity.properties["x"] == 5.0
+    assert entity.properties.get("x") == 5.0
+    assert entity.properties["color"] == "red"
+    entity.properties["y"] = 7.0
+    assert store.column("y").tolist() == [7.0]
+    with pytest.raises(ValueError, match="already bound"):
+        store.bind(entity)
+
+
+def test_view_behaves_like_dict(store):
+    entity = physical_entity("Ball", x=1.0, y=2.0)
+    store.bind(entity)
+    store.column("x")[0] = 3.0
+    expected = {"is_physical": True, "x": 3.0, "y": 2.0, "z": 0.0}
+    assert entity.properties == expected
+    assert dict(entity.properties) == expected
+    assert entity.properties.copy() == expected
+    assert json.loads(json.dumps(entity.properties)) == expected
+    assert repr(entity.properties) == repr(expected)
+    with pytest.raises(KeyError, match="cannot be removed"):
+        del entity.properties["x"]
+    with pytest.raises(KeyError, match="cannot be removed"):
+        entity.properties.pop("y")
+    assert entity.properties.pop("z") == 0.0
+
+
+def test_accepts_numeric_columns_only(store):
+    assert store.accepts(physical_entity("Ball"))
+    assert not store.accepts(Entity.new("Idea"))
+    assert not store.accepts(Entity.new("Flag", x=True, y=1.0))
+
+
+def test_capacity_grows(store):
+    entities = [physical_entity(f"Ball {i}", x=float(i)) for i in range(5)]
+    for entity in entities:
+        store.bind(entity)
+    assert store.column("x").tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert entities[0].properties["x"] == 0.0
+
+
+def test_unbind_keeps_rows_dense(store):
+    entities = [physical_entity(f"Ball {i}", x=float(i)) for i in range(3)]
+    for entity in entities:
+        store.bind(entity)
+    store.unbind(entities[0])
+    assert type(entities[0].properties) is EntityProperties
+    assert entities[0].properties["x"] == 0.0
+    assert store.column("x").tolist() == [2.0, 1.0]
+    assert store.ids == [entities[2].id, entities[1].id]
+    assert store.row(entities[2].id) == 0
+    entities[2].properties["x"] = 20.0
+    assert store.column("x").tolist() == [20.0, 1.0]
+
+
+def test_manager_binds_and_tracks_commits(manager, store, tmp_path):
+    ball = physical_entity("Ball", x=1.0, y=2.0)
+    idea = Entity.new("Idea")
+    manager.add_entity(ball)
+    manager.add_entity(idea)
+    manager.save()
+    assert store.ids == [ball.id]
+
+    ys = store.column("y")
+    ys += np.array([10.0])
+    assert manager.dirty_count == 0
+    store.commit("y")
+    assert manager.dirty_count == 1
+    assert manager.entities_within((1.0, 12.0, 0.0), 0.5) == [ball]
+    manager.save()
+
+    with sqlite3.connect(tmp_path / "test_entities.db") as conn:
+        row = conn.execute(
+            "SELECT properties, y FROM entities JOIN entity_positions USING (id) WHERE id = ?",
+            (ball.id,),
+        )
+        properties, y = row.fetchone()
+    assert json.loads(properties)["y"] == 12.0
+    assert y == 12.0
+    with pytest.raises(KeyError):
+        store.commit("z")
+
+
+def test_bulk_commits_share_a_copy_of_the_columns(manager, store):
+    balls = [physical_entity(f"Ball {i}", x=float(i), y=0.0, mood="calm") for i in range(3)]
+    for ball in balls:
+        manager.add_entity(ball)
+    for tick in range(1, 3):
+        with manager.transaction():
+            store.changing("y")
+            store.column("y")[:] += 1.0
+            store.commit("y")
+            if tick == 2:
+                balls[0].properties["mood"] = "dizzy"
+            assert balls[1].snapshot()["y"] == tick - 1.0
+    assert [ball.snapshot()["y"] for ball in balls] == [2.0, 2.0, 2.0]
+    assert balls[0].snapshot()["mood"] == "dizzy"
+    assert dict(balls[1].snapshot()) == {
+        "is_physical": True,
+        "x": 1.0,
+        "y": 2.0,
+        "z": 0.0,
+        "mood": "calm",
+    }
+    assert manager._dirty[balls[1].id] is None
+
+    # Commits outside a transaction leave readers with the live properties
+    store.column("y")[:] = 5.0
+    store.commit("y")
+    assert balls[2].snapshot()["y"] == 5.0
+
+
+def test_bulk_commits_publish_frames_and_move_the_index(tmp_path):
+    store = ColumnStore(("x", "y", "z"))
+    manager = EntityManager(tmp_path / "test_entities.db", column_store=store)
+    balls = [physical_entity(f"Ball {i}", x=float(i), y=0.0) for i in range(3)]
+    for ball in balls:
+        manager.add_entity(ball)
+    manager.save()
+    with manager.transaction():
+        store.changing("x")
+        store.column("x")[:] += 1.0
+        store.commit("x")
+    committed = [ball.committed for ball in balls]
+    assert [ball.snapshot()["x"] for ball in balls] == [1.0, 2.0, 3.0]
+
+    manager.remove_entity(balls[0].id)
+    with manager.transaction():
+        store.changing("x")
+        store.column("x")[:] += 100.0
+        store.commit("x")
+        # Readers and spatial queries see the last published frame until the end
+        assert balls[1].snapshot()["x"] == 2.0
+        assert manager.entities_within((2.0, 0.0, 0.0), 0.5) == [balls[1]]
+    # Published rows are not copied again, they read the new frame
+    assert [ball.committed for ball in balls[1:]] == committed[1:]
+    assert [ball.snapshot()["x"] for ball in balls[1:]] == [102.0, 103.0]
+    assert manager.entities_within((102.0, 0.0, 0.0), 0.5) == [balls[1]]
+    assert manager.spatial_index.within_box(0.0, -1.0, 10.0, 1.0) == []
+    assert manager.dirty_count == 2
+
+    # Written one by one, an entity leaves the frames until its next bulk commit
+    balls[2].properties["x"] = 7.0
+    assert balls[2].snapshot()["x"] == 7.0
+    assert manager.entities_within((7.0, 0.0, 0.0), 0.5) == [balls[2]]
+    with manager.transaction():
+        store.changing("y")
+        store.column("y")[:] = 1.0
+        store.commit("y")
+    assert dict(balls[2].snapshot())["y"] == 1.0
+    assert manager.entities_within((7.0, 1.0, 0.0), 0.5) == [balls[2]]
+
+    manager.save()
+    assert manager.dirty_count == 0
+    reloaded = EntityManager(tmp_path / "test_entities.db")
+    reloaded.load()
+    assert reloaded.entities[balls[1].id].properties["x"] == 102.0
+    assert reloaded.entities[balls[2].id].properties["y"] == 1.0
+
+
+def test_lazy_eviction_unbinds(tmp_path):
+    store = ColumnStore(("x", "y"))
+    manager = EntityManager(tmp_path / "test_entities.db", cache_size=1, column_store=store)
+    first, second = physical_entity("First", x=1.0), physical_entity("Second", x=2.0)
+    manager.add_entity(first)
+    manager.add_entity(second)
+    assert store.ids == [second.id]
+    assert manager.entities[first.id].properties["x"] == 1.0
+    assert store.ids == [first.id]
@@ -0,0 +1,115 @@
+import pytest
+
+from token_world.compact import CompactEntity, CompactEntityTable, EntityIdInterner, SchemaRegistry
+from token_world.entity import Entity, physical_entity
+
+
+def test_interner_round_trip():
+    interner = EntityIdInterner()
+    assert interner.intern("alice") == 0
+    assert interner.intern("bob") == 1
+    assert interner.intern("alice") == 0
+    assert interner.key("bob") == 1
+    assert interner.id(0) == "alice"
+    assert len(interner) == 2
+    assert "alice" in interner
+    with pytest.raises(KeyError):
+        interner.key("carol")
+
+
+def test_interner_reuses_released_keys():
+    interner = EntityIdInterner()
+    interner.intern("alice")
+    interner.intern("bob")
+    assert interner.release("alice") == 0
+    assert "alice" not in interner
+    assert len(interner) == 1
+    with pytest.raises(KeyError):
+        interner.id(0)
+    assert interner.intern("carol") == 0
+    assert interner.id(0) == "carol"
+    assert interner.intern("dave") == 2
+
+
+def test_compact_entity_has_no_instance_dict():
+    entity = CompactEntity(0, "Ball", {"x": 1.0}, SchemaRegistry())
+    assert not hasattr(entity, "__dict__")
+    with pytest.raises(AttributeError):
+        entity.color = "red"  # type: ignore[attr-defined]
+
+
+def test_compact_entities_share_schemas():
+    schemas = SchemaRegistry()
+    first = CompactEntity(0, "First", {"x": 1.0, "y": 2.0}, schemas)
+    second = CompactEntity(1, "Second", {"x": 3.0, "y": 4.0}, schemas)
+    assert first._schema is second._schema
+    # Schemas are scoped to their registry, so tables never share them
+    elsewhere = CompactEntity(2, "Elsewhere", {"x": 0.0, "y": 0.0}, SchemaRegistry())
+    assert elsewhere._schema is not first._schema
+    assert first.properties == {"x": 1.0, "y": 2.0}
+    assert second["y"] == 4.0
+    assert second.get("z", 0.0) == 0.0
+
+
+def test_compact_entity_set_property():
+    schemas = SchemaRegistry()
+    entity = CompactEntity(0, "Ball", {"x": 1.0}, schemas)
+    entity["x"] = 5.0
+    entity["color"] = "red"
+    assert entity.properties == {"x": 5.0, "color": "red"}
+    assert entity._schema is schemas.of(("x", "color"))
+    other = CompactEntity(1, "Other", {"x": 0.0, "color": "blue"}, schemas)
+    assert other._schema is entity._schema
+    assert len(schemas) == 2
+
+
+def test_compact_entity_properties_are_read_only():
+    entity = CompactEntity(0, "Ball", {"x": 1.0}, SchemaRegistry())
+    with pytest.raises(TypeError):
+        entity.properties["x"] = 5.0  # type: ignore[index]
+    assert entity["x"] == 1.0
+
+
+def test_table_uses_external_ids():
+    table = CompactEntityTable()
+    ball = physical_entity("Ball", id="ball", x=1.0)
+    compact = table.add(ball)
+    table.add(Entity.new("Idea", id="idea"))
+    assert compact.key == 0
+    assert table["ball"] is compact
+    assert table.get_by_key(1).name == "Idea"
+    assert table.get("missing") is None
+    assert "ball" in table
+    assert 0 not in table
+    assert list(table) == ["ball", "idea"]
+    assert len(table) == 2
+    assert table.to_entity(compact) == ball
+    with pytest.raises(ValueError, match="already managed"):
+        table.add(ball)
+
+
+def test_table_remove():
+    table = CompactEntityTable()
+    table.add(Entity.new("Idea", id="idea"))
+    table.remove("idea")
+    assert "idea" not in table
+    assert len(table) == 0
+    with pytest.raises(KeyError):
+        table["idea"]
+    with pytest.raises(KeyError):
+        table.remove("idea")
+    assert table.add(Entity.new("Idea again", id="idea")).key == 0
+
+
+def test_table_remove_recycles_keys_and_slots():
+    table = CompactEntityTable()
+    for i in range(3):
+        table.add(Entity.new(f"Idea {i}", id=f"idea{i}"))
+    for i in range(3):
+        table.remove(f"idea{i}")
+    assert len(table.interner) == 0
+    for i in range(3):
+        table.add(Entity.new(f"Other {i}", id=f"other{i}"))
+    assert sorted(table[f"other{i}"].key for i in range(3)) == [0, 1, 2]
+    assert len(table._entities) == 3
+    assert sorted(table) == ["other0", "other1", "other2"]
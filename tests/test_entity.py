@@ -1,6 +1,10 @@
+from pathlib import Path
 import sqlite3
 import pytest
-from token_world.entity import Entity, EntityManager
+import json
+import math
+import threading
+from token_world.entity import Entity, EntityManager, physical_entity
 import re
 
 
@@ -46,3 +50,740 @@ def test_entity_manager_save(entity, manager, tmp_db_path):
         name, properties = cursor.fetchone()
         assert name == "Test Entity"
         assert '{"attribute": "value"}' == properties
+
+
+def test_entity_properties_are_tracked(entity):
+    changed = []
+    entity.properties.listener = changed.append
+    entity.properties["attribute"] = "other"
+    entity.properties.update(x=1.0)
+    entity.properties.setdefault("y", 2.0)
+    entity.properties.setdefault("y", 3.0)
+    entity.properties.pop("x")
+    entity.properties.pop("missing", None)
+    del entity.properties["y"]
+    assert changed == ["attribute", "x", "y", "x", "y"]
+    assert entity.properties == {"attribute": "other"}
+
+
+def test_add_entity_marks_dirty(manager, entity):
+    assert manager.dirty_count == 0
+    manager.add_entity(entity)
+    assert manager.dirty_count == 1
+
+
+def test_save_clears_dirty(manager, entity):
+    manager.add_entity(entity)
+    manager.save()
+    assert manager.dirty_count == 0
+    entity.properties["attribute"] = "changed"
+    assert manager.dirty_count == 1
+
+
+def test_save_only_writes_dirty_entities(manager, tmp_db_path):
+    first, second = Entity.new("First", value=1), Entity.new("Second", value=2)
+    manager.add_entity(first)
+    manager.add_entity(second)
+    manager.save()
+
+    with sqlite3.connect(tmp_db_path) as conn:
+        conn.execute("UPDATE entities SET properties = '{}' WHERE id = ?", (second.id,))
+    first.properties["value"] = 10
+    manager.save()
+
+    loaded = EntityManager(tmp_db_path)
+    loaded.load()
+    assert loaded.entities[first.id].properties == {"value": 10}
+    assert loaded.entities[second.id].properties == {}
+
+
+def test_loaded_entities_are_clean_and_tracked(manager, entity, tmp_db_path):
+    manager.add_entity(entity)
+    manager.save()
+
+    loaded = EntityManager(tmp_db_path)
+    loaded.load()
+    assert loaded.dirty_count == 0
+    loaded.entities[entity.id].properties["attribute"] = "changed"
+    assert loaded.dirty_count == 1
+
+
+def test_mark_dirty(manager, entity):
+    manager.add_entity(entity)
+    manager.save()
+    manager.mark_dirty(entity.id)
+    assert manager.dirty_count == 1
+    with pytest.raises(KeyError):
+        manager.mark_dirty("unknown")
+
+
+def read_properties(db_path, entity_id):
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT properties FROM entities WHERE id = ?", (entity_id,))
+        return json.loads(cursor.fetchone()[0])
+
+
+def test_save_writes_changed_fields_only(manager, tmp_db_path):
+    entity = physical_entity("Ball", x=1.0, y=2.0, color="red", mass=3)
+    manager.add_entity(entity)
+    manager.save()
+
+    with sqlite3.connect(tmp_db_path) as conn:
+        conn.execute(
+            "UPDATE entities SET properties = json_set(properties, '$.color', 'blue') WHERE id = ?",
+            (entity.id,),
+        )
+    entity.properties["x"] = 5.0
+    del entity.properties["mass"]
+    manager.save()
+
+    assert read_properties(tmp_db_path, entity.id) == {
+        "is_physical": True,
+        "x": 5.0,
+        "y": 2.0,
+        "z": 0.0,
+        "color": "blue",
+    }
+
+
+def test_save_rewrites_row_when_most_fields_changed(manager, tmp_db_path):
+    entity = Entity.new("Small", a=1, b=2)
+    manager.add_entity(entity)
+    manager.save()
+
+    with sqlite3.connect(tmp_db_path) as conn:
+        conn.execute("UPDATE entities SET properties = '{}' WHERE id = ?", (entity.id,))
+    entity.properties["a"] = 10
+    entity.properties["b"] = 20
+    manager.save()
+
+    assert read_properties(tmp_db_path, entity.id) == {"a": 10, "b": 20}
+
+
+def test_field_updates_preserve_value_types(manager, tmp_db_path):
+    entity = Entity.new("Typed", a=0, b=0, c=0, d=0, e=0, f=0, g=0, h=0)
+    manager.add_entity(entity)
+    manager.save()
+
+    entity.properties.update(a=True, b=None, c="text", d={"nested": [1, 2]})
+    manager.save()
+
+    assert read_properties(tmp_db_path, entity.id) == {
+        "a": True,
+        "b": None,
+        "c": "text",
+        "d": {"nested": [1, 2]},
+        "e": 0,
+        "f": 0,
+        "g": 0,
+        "h": 0,
+    }
+
+
+@pytest.mark.parametrize("cache_size", [None, 1])
+def test_non_finite_floats_are_saved_as_whole_rows(tmp_db_path, cache_size):
+    manager = EntityManager(tmp_db_path, cache_size=cache_size)
+    entity = Entity.new("Ball", id="ball", a=0.0, b=0.0, c=0.0, d=0.0)
+    manager.add_entity(entity)
+    manager.save()
+
+    entity.properties["a"] = float("nan")
+    manager.save()
+    assert manager.dirty_count == 0
+    entity.properties["b"] = float("inf")
+    manager.save()
+    # The stored row now holds non-finite floats, later changes still rewrite it whole
+    entity.properties["c"] = 1.0
+    manager.save()
+    manager.close()
+
+    reopened = EntityManager(tmp_db_path, cache_size=cache_size)
+    reopened.load()
+    properties = reopened.entities["ball"].properties
+    assert properties["a"] != properties["a"]
+    assert (properties["b"], properties["c"]) == (float("inf"), 1.0)
+    properties["d"] = 2.0
+    reopened.save()
+    assert read_properties(tmp_db_path, "ball")["d"] == 2.0
+
+
+def test_unencodable_changes_keep_every_entity_dirty(tmp_db_path):
+    manager = EntityManager(tmp_db_path, keyframe_interval=10)
+    first, second = Entity.new("First", id="a", value=0), Entity.new("Second", id="b", value=0)
+    manager.add_entity(first)
+    manager.add_entity(second)
+    manager.save()
+    first.properties["value"] = 1
+    manager.record_version()
+    second.properties["value"] = {1, 2}
+    with pytest.raises(TypeError):
+        manager.save()
+    assert manager.dirty_count == 2
+
+    second.properties["value"] = [1, 2]
+    manager.save()
+    assert read_properties(tmp_db_path, "a") == {"value": 1}
+    assert manager.entities_at(1)["a"].properties["value"] == 1
+
+
+def test_unencodable_write_backs_keep_the_entity_dirty(populated_db):
+    lazy = EntityManager(populated_db, cache_size=1)
+    lazy.entities["e0"].properties["tags"] = {"round"}
+    with pytest.raises(TypeError):
+        lazy.entities["e1"]
+    assert lazy.dirty_count == 1
+    lazy.entities["e0"].properties["tags"] = ["round"]
+    lazy.save()
+    assert read_properties(populated_db, "e0")["tags"] == ["round"]
+
+
+def test_failed_save_keeps_entities_dirty(manager, entity, tmp_db_path):
+    manager.add_entity(entity)
+    manager.save()
+    entity.properties["attribute"] = "changed"
+    with sqlite3.connect(tmp_db_path) as conn:
+        conn.execute("DROP TABLE entities")
+    with pytest.raises(sqlite3.OperationalError):
+        manager.save()
+    assert manager.dirty_count == 1
+
+
+@pytest.fixture
+def populated_db(tmp_db_path):
+    manager = EntityManager(tmp_db_path)
+    for i in range(10):
+        manager.add_entity(physical_entity(f"Entity {i}", id=f"e{i}", x=float(i)))
+    manager.save()
+    return tmp_db_path
+
+
+def test_lazy_load_does_not_hydrate(populated_db):
+    lazy = EntityManager(populated_db, cache_size=3)
+    lazy.load()
+    assert lazy._cache.cached_count == 0
+    assert len(lazy.entities) == 10
+    assert len(lazy.spatial_index) == 10
+
+
+def test_lazy_get_hydrates_and_evicts(populated_db):
+    lazy = EntityManager(populated_db, cache_size=3)
+    lazy.load()
+    assert lazy.entities["e1"].name == "Entity 1"
+    assert "e2" in lazy.entities
+    assert "missing" not in lazy.entities
+    with pytest.raises(KeyError):
+        lazy.entities["missing"]
+    for i in range(5):
+        lazy.entities[f"e{i}"]
+    assert lazy._cache.cached_count == 3
+    assert list(lazy._cache._cache) == ["e2", "e3", "e4"]
+
+
+def test_lazy_eviction_writes_back(populated_db):
+    lazy = EntityManager(populated_db, cache_size=2)
+    lazy.load()
+    lazy.entities["e0"].properties["x"] = 100.0
+    lazy.entities["e1"]
+    lazy.entities["e2"]
+    assert lazy.dirty_count == 0
+
+    reloaded = EntityManager(populated_db)
+    reloaded.load()
+    assert reloaded.entities["e0"].properties["x"] == 100.0
+
+
+def test_lazy_pinned_entities_stay_cached(populated_db):
+    lazy = EntityManager(populated_db, cache_size=1)
+    pinned = lazy.entities["e0"]
+    lazy.pin("e0")
+    lazy.entities["e1"]
+    lazy.entities["e2"]
+    assert lazy.entities["e0"] is pinned
+    lazy.unpin("e0")
+    assert lazy._cache.cached_count == 1
+
+
+def test_lazy_entities_fetched_while_pins_fill_the_cache_stay_attached(populated_db):
+    lazy = EntityManager(populated_db, cache_size=1)
+    lazy.pin("e0")
+    lazy.entities["e0"]
+    fetched = lazy.entities["e1"]
+    assert lazy._cache.cached_count == 2
+    fetched.properties["x"] = 100.0
+    assert lazy.dirty_count == 1
+    added = Entity.new("Added", id="added")
+    lazy.add_entity(added)
+    added.properties["x"] = 5.0
+    lazy.save()
+
+    reloaded = EntityManager(populated_db)
+    reloaded.load()
+    assert reloaded.entities["e1"].properties["x"] == 100.0
+    assert reloaded.entities["added"].properties["x"] == 5.0
+
+
+def test_lazy_iteration_includes_new_entities(populated_db):
+    lazy = EntityManager(populated_db, cache_size=2)
+    lazy.load()
+    new = Entity.new("New", id="new")
+    lazy.add_entity(new)
+    assert len(lazy.entities) == 11
+    assert sorted(lazy.entities) == sorted([f"e{i}" for i in range(10)] + ["new"])
+    values = list(lazy.entities.values())
+    assert len(values) == 11
+    assert sorted(entity.id for entity in values) == sorted(lazy.entities)
+    lazy.save()
+    assert len(lazy.entities) == 11
+
+
+def test_lazy_spatial_queries_hydrate(populated_db):
+    lazy = EntityManager(populated_db, cache_size=2)
+    lazy.load()
+    assert [entity.id for entity in lazy.nearest_entities((4.2, 0.0, 0.0), 2)] == ["e4", "e5"]
+
+
+def test_invalid_cache_size(tmp_db_path):
+    with pytest.raises(ValueError, match="Cache capacity must be positive"):
+        EntityManager(tmp_db_path, cache_size=0)
+
+
+def test_indexed_properties_are_written_to_columns(manager, tmp_db_path):
+    entity = physical_entity("Ball", x=1.5, y=2.0, tags=["round"])
+    manager.add_entity(entity)
+    manager.save()
+    entity.properties["x"] = 3.0
+    manager.save()
+
+    with sqlite3.connect(tmp_db_path) as conn:
+        row = conn.execute(
+            "SELECT prop_is_person, prop_is_physical, x, y FROM entities "
+            "JOIN entity_positions USING (id) WHERE id = ?",
+            (entity.id,),
+        ).fetchone()
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(entities)")}
+    assert row == (None, 1, 3.0, 2.0)
+    # Coordinates are only stored in entity_positions
+    assert "prop_x" not in columns
+    with pytest.raises(ValueError, match="already indexed by entity_positions"):
+        EntityManager(tmp_db_path, indexed_properties={"x": "REAL"})
+
+
+def test_indexed_property_columns_are_backfilled(tmp_db_path):
+    with sqlite3.connect(tmp_db_path) as conn:
+        conn.execute("CREATE TABLE entities (id TEXT PRIMARY KEY, name TEXT, properties TEXT)")
+        conn.execute("INSERT INTO entities VALUES ('a', 'A', '{\"is_person\": true, \"x\": 1}')")
+
+    manager = EntityManager(tmp_db_path, indexed_properties={"mood": "TEXT"})
+    manager.load()
+    with sqlite3.connect(tmp_db_path) as conn:
+        row = conn.execute("SELECT prop_is_person, prop_mood FROM entities").fetchone()
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(entities)")}
+    assert row == (1, None)
+    assert "entities_prop_mood" in indexes
+    assert [entity.id for entity in manager.find(("is_person", "=", True))] == ["a"]
+
+
+def test_rows_with_non_finite_numbers_are_backfilled(tmp_db_path):
+    properties = json.dumps({"is_physical": True, "x": 1.0, "y": 2.0, "mass": float("nan")})
+    with sqlite3.connect(tmp_db_path) as conn:
+        conn.execute("CREATE TABLE entities (id TEXT PRIMARY KEY, name TEXT, properties TEXT)")
+        conn.execute("INSERT INTO entities VALUES ('a', 'A', ?)", (properties,))
+
+    manager = EntityManager(tmp_db_path, indexed_properties={"mass": "REAL"})
+    manager.load()
+    with sqlite3.connect(tmp_db_path) as conn:
+        prop_row = conn.execute("SELECT prop_is_physical, prop_mass FROM entities").fetchone()
+        position = conn.execute("SELECT x, y FROM entity_positions").fetchone()
+    assert prop_row == (1, None)
+    assert position == (1.0, 2.0)
+    assert math.isnan(manager.entities["a"].properties["mass"])
+
+
+def test_invalid_indexed_properties(tmp_db_path):
+    with pytest.raises(ValueError, match="not a valid identifier"):
+        EntityManager(tmp_db_path, indexed_properties={"bad key": "TEXT"})
+    with pytest.raises(ValueError, match="unsupported type"):
+        EntityManager(tmp_db_path, indexed_properties={"mood": "BLOB"})
+
+
+def test_find(tmp_db_path):
+    manager = EntityManager(tmp_db_path, indexed_properties={"mood": "TEXT"})
+    alice = physical_entity("Alice", is_person=True, x=10.0, mood="happy")
+    ball = physical_entity("Ball", x=50.0)
+    idea = Entity.new("Idea", mood="happy", x=100.0)
+    for entity in (alice, ball, idea):
+        manager.add_entity(entity)
+    assert manager.find(("is_person", "=", True)) == [alice]
+
+    manager.save()
+    assert manager.find(("is_person", "=", True)) == [alice]
+    assert manager.find(("is_physical", "=", True), ("x", ">", 20.0)) == [ball]
+    # Coordinates only match physical entities
+    assert manager.find(("x", ">", 20.0)) == [ball]
+    assert sorted(e.name for e in manager.find(("mood", "=", "happy"))) == ["Alice", "Idea"]
+    assert len(manager.find()) == 3
+
+    ball.properties["x"] = 0.0
+    alice.properties["is_person"] = False
+    assert manager.find(("is_physical", "=", True), ("x", ">", 20.0)) == []
+    assert manager.find(("is_person", "=", True)) == []
+    assert manager.find(("x", "<", 5.0)) == [ball]
+    assert manager.find(("x", ">", 20.0)) == []
+
+
+@pytest.mark.parametrize("cache_size", [None, 2])
+def test_scan_any_of_reads_only_matching_rows(tmp_db_path, cache_size):
+    manager = EntityManager(tmp_db_path, indexed_properties={"mood": "TEXT"})
+    manager.add_entity(physical_entity("Alice", id="alice", is_person=True))
+    manager.add_entity(Entity.new("Idea", id="idea", is_person=False, mood="happy"))
+    manager.add_entity(Entity.new("Blank", id="blank", mood=""))
+    manager.add_entity(Entity.new("Plain", id="plain"))
+    manager.save()
+
+    loaded = EntityManager(tmp_db_path, cache_size=cache_size, indexed_properties={"mood": "TEXT"})
+    loaded.load()
+    decoded = []
+    decode = loaded._decode
+    loaded._decode = lambda data: decoded.append(data) or decode(data)
+    assert [entity.id for entity in loaded.scan(any_of=["is_person"])] == ["alice"]
+    assert sorted(e.id for e in loaded.scan(any_of=["is_person", "mood"])) == ["alice", "idea"]
+    assert len(decoded) == (0 if cache_size is None else 3)
+
+    # Unsaved changes are matched in memory
+    loaded.entities["plain"].properties["is_person"] = True
+    loaded.entities["alice"].properties["is_person"] = False
+    assert [entity.id for entity in loaded.scan(any_of=["is_person"])] == ["plain"]
+    assert list(loaded.scan(any_of=[])) == []
+    with pytest.raises(ValueError, match="not indexed"):
+        list(loaded.scan(any_of=["color"]))
+
+
+def test_find_rejects_unindexed_properties(manager):
+    with pytest.raises(ValueError, match="not indexed"):
+        manager.find(("mood", "=", "happy"))
+    with pytest.raises(ValueError, match="Unsupported operator"):
+        manager.find(("x", "LIKE", 1.0))
+
+
+def test_connection_is_reused_per_thread(manager):
+    conn = manager._connection()
+    assert manager._connection() is conn
+    other = []
+    thread = threading.Thread(target=lambda: other.append(manager._connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+    manager.close()
+    assert manager._connection() is not conn
+
+
+def test_pragmas_are_applied(tmp_db_path):
+    manager = EntityManager(tmp_db_path, pragmas={"synchronous": "FULL", "cache_size": -1000})
+    conn = manager._connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert conn.execute("PRAGMA synchronous").fetchone() == (2,)
+    assert conn.execute("PRAGMA cache_size").fetchone() == (-1000,)
+
+
+def test_invalid_pragmas(tmp_db_path):
+    with pytest.raises(ValueError, match="Invalid pragma"):
+        EntityManager(tmp_db_path, pragmas={"synchronous": "OFF; DROP TABLE entities"})
+    with pytest.raises(ValueError, match="Invalid pragma"):
+        EntityManager(tmp_db_path, pragmas={"bad name": 1})
+
+
+def test_transaction_publishes_snapshot_on_commit(manager):
+    ball = physical_entity("Ball", x=0.0, y=0.0)
+    manager.add_entity(ball)
+    assert ball.snapshot() is ball.properties
+    with manager.transaction():
+        ball.properties["x"] = 1.0
+        with manager.transaction():
+            ball.properties["y"] = 1.0
+        assert ball.snapshot() == {"is_physical": True, "x": 0.0, "y": 0.0, "z": 0.0}
+    snapshot = ball.snapshot()
+    assert snapshot == {"is_physical": True, "x": 1.0, "y": 1.0, "z": 0.0}
+    with pytest.raises(TypeError):
+        snapshot["x"] = 2.0  # type: ignore[index]
+
+    with manager.transaction():
+        ball.properties["x"] = 2.0
+        assert ball.snapshot()["x"] == 1.0
+    assert ball.snapshot()["x"] == 2.0
+
+    ball.properties["x"] = 3.0
+    assert ball.snapshot()["x"] == 3.0
+
+
+def test_concurrent_transactions_are_not_torn(manager):
+    balls = [physical_entity(f"Ball {i}") for i in range(20)]
+    for ball in balls:
+        manager.add_entity(ball)
+    stop = threading.Event()
+    errors = []
+
+    def produce():
+        while not stop.is_set():
+            with manager.transaction():
+                for ball in balls:
+                    ball.properties["x"] += 1.0
+                    ball.properties["y"] += 1.0
+
+    def read():
+        while not stop.is_set():
+            for ball in balls:
+                snapshot = ball.snapshot()
+                if snapshot["x"] != snapshot["y"]:
+                    errors.append(snapshot)
+
+    def save():
+        while not stop.is_set():
+            manager.save()
+
+    threads = [threading.Thread(target=target) for target in (produce, produce, read, save)]
+    for thread in threads:
+        thread.start()
+    stop.wait(0.3)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    manager.save()
+    loaded = EntityManager(manager.db_path)
+    loaded.load()
+    for ball in balls:
+        saved = loaded.entities[ball.id].properties
+        assert saved["x"] == saved["y"] == ball.properties["x"]
+
+
+def test_write_backs_during_a_save_are_not_overwritten_by_it(manager, tmp_db_path):
+    ball = Entity.new("Ball", id="ball", x=0.0, a=0, b=0, c=0)
+    manager.add_entity(ball)
+    manager.save()
+    ball.properties["x"] = 1.0
+    saving, written_back = threading.Event(), threading.Event()
+    execute_write = manager._execute_write
+
+    def slow_write(cursor, batch):
+        if not saving.is_set():
+            saving.set()
+            # Without the flush lock the write back below commits first
+            written_back.wait(0.2)
+        return execute_write(cursor, batch)
+
+    def write_back():
+        saving.wait()
+        ball.properties["x"] = 2.0
+        manager._write_back(["ball"])
+        written_back.set()
+
+    manager._execute_write = slow_write
+    thread = threading.Thread(target=write_back)
+    thread.start()
+    manager.save()
+    thread.join()
+    assert read_properties(tmp_db_path, "ball")["x"] == 2.0
+
+
+def test_record_version_requires_history(manager):
+    with pytest.raises(RuntimeError, match="History is disabled"):
+        manager.record_version()
+
+
+def test_versions_store_keyframes_and_deltas(tmp_db_path):
+    manager = EntityManager(tmp_db_path, keyframe_interval=3)
+    balls = [physical_entity(f"Ball {i}", x=float(i)) for i in range(10)]
+    for ball in balls:
+        manager.add_entity(ball)
+    assert manager.record_version() == 1
+    for version in range(2, 6):
+        balls[0].properties["y"] = float(version)
+        assert manager.record_version() == version
+    manager.save()
+
+    with sqlite3.connect(tmp_db_path) as conn:
+        keyframes = conn.execute(
+            "SELECT version FROM entity_versions WHERE keyframe ORDER BY version"
+        ).fetchall()
+        counts = dict(
+            conn.execute("SELECT version, count(*) FROM entity_history GROUP BY version").fetchall()
+        )
+    assert keyframes == [(1,), (4,)]
+    assert counts == {1: 10, 2: 1, 3: 1, 4: 10, 5: 1}
+
+    for version in range(1, 6):
+        entities = manager.entities_at(version)
+        assert len(entities) == 10
+        assert entities[balls[0].id].properties["y"] == (0.0 if version == 1 else float(version))
+        assert entities[balls[1].id] == balls[1]
+    with pytest.raises(KeyError, match="Version 6 not recorded"):
+        manager.entities_at(6)
+
+
+def test_versions_include_added_entities_and_survive_reopen(tmp_db_path):
+    manager = EntityManager(tmp_db_path, keyframe_interval=10)
+    first = Entity.new("First", value=1)
+    manager.add_entity(first)
+    manager.record_version()
+    second = Entity.new("Second", value=2)
+    manager.add_entity(second)
+    manager.record_version()
+    manager.save()
+    manager.close()
+
+    reopened = EntityManager(tmp_db_path, keyframe_interval=10)
+    assert reopened.version == 2
+    reopened.load()
+    reopened.entities[first.id].properties["value"] = 3
+    assert reopened.record_version() == 3
+    assert set(reopened.entities_at(1)) == {first.id}
+    assert set(reopened.entities_at(2)) == {first.id, second.id}
+    assert reopened.entities_at(3)[first.id].properties["value"] == 3
+
+
+def test_lazy_keyframe_uses_unsaved_changes(tmp_db_path):
+    manager = EntityManager(tmp_db_path, cache_size=2, keyframe_interval=1)
+    entities = [Entity.new(f"Entity {i}", value=i) for i in range(5)]
+    for entity in entities:
+        manager.add_entity(entity)
+    manager.save()
+    manager.entities[entities[0].id].properties["value"] = 10
+    manager.record_version()
+    snapshot = manager.entities_at(1)
+    assert {entity_id: e.properties["value"] for entity_id, e in snapshot.items()} == {
+        entities[0].id: 10,
+        **{entity.id: entity.properties["value"] for entity in entities[1:]},
+    }
+
+
+def test_checkout_branches_world_at_version(tmp_db_path, tmpdir):
+    manager = EntityManager(tmp_db_path, keyframe_interval=2)
+    ball = physical_entity("Ball")
+    manager.add_entity(ball)
+    for x in range(1, 5):
+        ball.properties["x"] = float(x)
+        manager.record_version()
+
+    branch_path = Path(tmpdir) / "branch.db"
+    manager.checkout(2, branch_path)
+    branch = EntityManager(branch_path, keyframe_interval=2)
+    branch.load()
+    assert branch.entities[ball.id].properties["x"] == 2.0
+    assert branch.version == 2
+    assert [e.id for e in branch.entities_within((2.0, 0.0, 0.0), 0.5)] == [ball.id]
+    branch.entities[ball.id].properties["x"] = 7.0
+    assert branch.record_version() == 3
+    assert branch.entities_at(3)[ball.id].properties["x"] == 7.0
+    assert branch.entities_at(1)[ball.id].properties["x"] == 1.0
+
+
+def _write_jsonl(path, entities):
+    with open(path, "w") as f:
+        for entity in entities:
+            f.write(
+                json.dumps({"id": entity.id, "name": entity.name, "properties": entity.properties})
+                + "\n"
+            )
+
+
+@pytest.mark.parametrize("cache_size", [None, 2])
+def test_import_jsonl_streams_chunks(tmp_db_path, tmpdir, cache_size):
+    entities = [physical_entity(f"Ball {i}", x=float(i), is_person=i % 2 == 0) for i in range(7)]
+    path = Path(tmpdir) / "entities.jsonl"
+    _write_jsonl(path, entities)
+
+    manager = EntityManager(tmp_db_path, cache_size=cache_size)
+    assert manager.import_jsonl(path, chunk_size=3) == 7
+    assert manager.dirty_count == 0
+    assert len(manager.entities) == 7
+    assert manager.entities[entities[5].id] == entities[5]
+    assert [e.id for e in manager.entities_within((4.0, 0.0, 0.0), 0.5)] == [entities[4].id]
+    assert len(manager.find(("is_person", "=", True))) == 4
+    if cache_size is not None:
+        assert manager._cache is not None and manager._cache.cached_count <= 2
+
+
+def test_import_jsonl_rejects_duplicates(manager, tmpdir):
+    entity = Entity.new("Existing")
+    manager.add_entity(entity)
+    path = Path(tmpdir) / "entities.jsonl"
+    _write_jsonl(path, [Entity.new("New"), entity])
+    with pytest.raises(ValueError, match=f"Entity with id {entity.id} already managed"):
+        manager.import_jsonl(path)
+
+    twice = Entity.new("Twice")
+    _write_jsonl(path, [twice, twice])
+    with pytest.raises(ValueError, match=f"Entity with id {twice.id} already managed"):
+        manager.import_jsonl(path)
+
+
+def test_export_jsonl_round_trips(manager, tmp_db_path, tmpdir):
+    entities = [Entity.new(f"Entity {i}", value=i, nested={"list": [i]}) for i in range(5)]
+    for entity in entities:
+        manager.add_entity(entity)
+    path = Path(tmpdir) / "entities.jsonl"
+    assert manager.export_jsonl(path, page_size=2) == 5
+    assert manager.dirty_count == 0
+
+    other = EntityManager(Path(tmpdir) / "other.db")
+    assert other.import_jsonl(path) == 5
+    assert dict(other.entities) == {entity.id: entity for entity in entities}
+
+
+@pytest.mark.parametrize("cache_size", [None, 2])
+def test_remove_entity_deletes_row_on_save(tmp_db_path, cache_size):
+    manager = EntityManager(tmp_db_path, cache_size=cache_size)
+    kept, removed = physical_entity("Kept"), physical_entity("Removed", is_person=True)
+    manager.add_entity(kept)
+    manager.add_entity(removed)
+    manager.save()
+    manager.add_entity(Entity.new("Filler 1"))
+    manager.add_entity(Entity.new("Filler 2"))
+
+    detached = manager.remove_entity(removed.id)
+    assert detached == removed
+    assert removed.id not in manager.entities
+    assert len(manager.entities) == 3
+    assert manager.entities_within((0.0, 0.0, 0.0), 1.0) == [kept]
+    assert manager.find(("is_person", "=", True)) == []
+    assert removed.id not in set(manager.entities)
+    detached.properties["x"] = 1.0
+    assert removed.id not in manager._dirty
+    with pytest.raises(KeyError):
+        manager.remove_entity(removed.id)
+
+    manager.save()
+    with sqlite3.connect(tmp_db_path) as conn:
+        assert conn.execute(
+            "SELECT count(*) FROM entities WHERE id = ?", (removed.id,)
+        ).fetchone() == (0,)
+        assert conn.execute("SELECT count(*) FROM entity_positions").fetchone() == (1,)
+    reloaded = EntityManager(tmp_db_path, cache_size=cache_size)
+    reloaded.load()
+    assert removed.id not in reloaded.entities
+    assert len(reloaded.entities) == 3
+
+
+def test_remove_unsaved_entity_and_add_it_back(manager):
+    entity = Entity.new("Test")
+    manager.add_entity(entity)
+    manager.remove_entity(entity.id)
+    assert manager.dirty_count == 0
+    manager.add_entity(entity)
+    manager.save()
+    reloaded = EntityManager(manager.db_path)
+    reloaded.load()
+    assert reloaded.entities[entity.id] == entity
+
+
+def test_removed_entities_leave_history(tmp_db_path):
+    manager = EntityManager(tmp_db_path, keyframe_interval=10)
+    entity = Entity.new("Test")
+    manager.add_entity(entity)
+    manager.record_version()
+    manager.remove_entity(entity.id)
+    manager.record_version()
+    assert set(manager.entities_at(1)) == {entity.id}
+    assert manager.entities_at(2) == {}
@@ -0,0 +1,109 @@
+import pytest
+
+from token_world.entity import Entity, EntityManager, physical_entity
+from token_world.events import ChangeCollector, EntityEvent, EntityEventBus, EntityEventKind
+
+ADDED, UPDATED, REMOVED = EntityEventKind.ADDED, EntityEventKind.UPDATED, EntityEventKind.REMOVED
+
+
+@pytest.fixture
+def manager(tmpdir):
+    return EntityManager(tmpdir / "test_events.db")
+
+
+def test_subscriptions_filter_on_kind_and_key():
+    bus = EntityEventBus()
+    everything, positions, added = [], [], []
+    bus.subscribe(everything.append)
+    bus.subscribe(positions.append, kinds=[UPDATED], keys=["x", "y"])
+    bus.subscribe(added.append, kinds=[ADDED])
+    events = [
+        EntityEvent(ADDED, "a"),
+        EntityEvent(UPDATED, "a", "x"),
+        EntityEvent(UPDATED, "a", "mood"),
+        EntityEvent(REMOVED, "a"),
+    ]
+    for event in events:
+        bus.publish(event)
+    assert everything == events
+    assert positions == [EntityEvent(UPDATED, "a", "x")]
+    assert added == [EntityEvent(ADDED, "a")]
+
+
+def test_publish_many_delivers_one_batch_to_batch_subscribers():
+    bus = EntityEventBus()
+    events, batches = [], []
+    bus.subscribe(events.append, keys=["x"])
+    bus.subscribe_batches(batches.append, kinds=[UPDATED])
+    bus.publish_many(UPDATED, ["a", "b"], "x")
+    bus.publish_many(UPDATED, [], "x")
+    bus.publish(EntityEvent(UPDATED, "c", "mood"))
+    assert events == [EntityEvent(UPDATED, "a", "x"), EntityEvent(UPDATED, "b", "x")]
+    assert [batch.entity_ids for batch in batches] == [["a", "b"], ["c"]]
+    assert batches[0].events() == events
+
+
+def test_unsubscribe_stops_delivery():
+    bus = EntityEventBus()
+    received = []
+    subscription = bus.subscribe(received.append, keys=["x"])
+    assert bus
+    bus.unsubscribe(subscription)
+    assert not bus
+    bus.publish(EntityEvent(UPDATED, "a", "x"))
+    assert received == []
+
+
+def test_failing_subscriber_does_not_block_others():
+    bus = EntityEventBus()
+    received = []
+    bus.subscribe(lambda event: 1 / 0)
+    bus.subscribe(received.append)
+    bus.publish(EntityEvent(ADDED, "a"))
+    assert received == [EntityEvent(ADDED, "a")]
+
+
+def test_manager_publishes_additions_and_updates(manager):
+    received = []
+    manager.events.subscribe(received.append)
+    entity = Entity.new("Test", value=1)
+    manager.add_entity(entity)
+    entity.properties["value"] = 2
+    del entity.properties["value"]
+    assert received == [
+        EntityEvent(ADDED, entity.id),
+        EntityEvent(UPDATED, entity.id, "value"),
+        EntityEvent(UPDATED, entity.id, "value"),
+    ]
+
+
+def test_transaction_events_are_coalesced_until_commit(manager):
+    ball = physical_entity("Ball")
+    manager.add_entity(ball)
+    seen = []
+    manager.events.subscribe(lambda event: seen.append((event, ball.snapshot()["x"])))
+    with manager.transaction():
+        ball.properties["x"] = 1.0
+        ball.properties["x"] = 2.0
+        ball.properties["y"] = 1.0
+        assert seen == []
+    assert seen == [
+        (EntityEvent(UPDATED, ball.id, "x"), 2.0),
+        (EntityEvent(UPDATED, ball.id, "y"), 2.0),
+    ]
+
+
+def test_change_collector_drains_changed_ids(manager):
+    collector = ChangeCollector(manager.events, kinds=[UPDATED], keys=["x"])
+    moving, still = physical_entity("Moving"), physical_entity("Still")
+    manager.add_entity(moving)
+    manager.add_entity(still)
+    moving.properties["x"] = 1.0
+    moving.properties["x"] = 2.0
+    still.properties["mood"] = "calm"
+    assert len(collector) == 1
+    assert collector.drain() == {moving.id}
+    assert collector.drain() == set()
+    collector.close()
+    moving.properties["x"] = 3.0
+    assert len(collector) == 0
@@ -1,14 +1,14 @@
 import pytest
 from unittest.mock import MagicMock
-from token_world.entity import Entity
+from token_world.columnar import ColumnStore
+from token_world.entity import Entity, EntityManager
+from token_world.snapshot import SnapshotBuffer
 from token_world.drawable.physical import PhysicalEntityHandler
 
 
 @pytest.fixture
 def entity_fixture():
-    entity = MagicMock(spec=Entity)
-    entity.properties = {"x": 10, "y": 20, "is_physical": True}
-    return entity
+    return Entity.new("Ball", x=10, y=20, is_physical=True)
 
 
 @pytest.fixture
@@ -49,3 +49,39 @@ def test_draw(batch_fixture):
     handler._batch = batch_fixture
     handler.draw()
     batch_fixture.draw.assert_called_once()
+
+
+def test_release_draw_callback_deletes_shape(entity_fixture, batch_fixture):
+    handler = PhysicalEntityHandler()
+    handler._batch = batch_fixture
+    callback = handler.new_draw_callback(entity_fixture)
+    callback.shape = MagicMock()
+    handler.release_draw_callback(callback)
+    callback.shape.delete.assert_called_once()
+
+
+def test_physical_handler_is_tagged():
+    assert PhysicalEntityHandler.tags == frozenset({"is_physical"})
+
+
+def test_physical_handler_watches_position():
+    assert PhysicalEntityHandler.watched_keys == frozenset({"x", "y"})
+
+
+def test_apply_snapshot_moves_shapes(tmp_path):
+    store = ColumnStore(("x", "y"))
+    manager = EntityManager(tmp_path / "test_physical.db", column_store=store)
+    stored = Entity.new("Stored", x=1.0, y=2.0, is_physical=True)
+    manager.add_entity(stored)
+    loose = Entity.new("Loose", x=3, y=4, is_physical=True)
+    handler = PhysicalEntityHandler()
+    stored_callback = handler.new_draw_callback(stored)
+    loose_callback = handler.new_draw_callback(loose)
+    store.column("x")[:] = 5.0
+    loose.properties["x"] = 6
+    assert handler.apply_snapshot(SnapshotBuffer().publish(store))
+    assert stored_callback.shape.position == (5.0, 2.0)
+    assert loose_callback.shape.position == (6, 4)
+    handler.release_draw_callback(loose_callback)
+    assert list(handler._callbacks) == [stored.id]
+    manager.close()
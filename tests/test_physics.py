@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from token_world.columnar import ColumnStore
+from token_world.entity import Entity, EntityManager, physical_entity
+from token_world.events import ChangeCollector, EntityEventKind
+from token_world.physics import PhysicsSystem
+
+
+@pytest.fixture
+def store():
+    return ColumnStore(("x", "y", "z"))
+
+
+def test_gravity_and_bounces_match_per_entity_integration(store):
+    physics = PhysicsSystem(store, gravity=(0.0, -10.0), restitution=0.5)
+    balls = [physical_entity(f"ball {i}", x=float(i), y=1.0 + i) for i in range(3)]
+    for ball in balls:
+        store.bind(ball)
+    expected = [(1.0 + i, 0.0) for i in range(3)]
+    for _ in range(10):
+        physics.step(0.1)
+        for i, (y, vy) in enumerate(expected):
+            vy -= 1.0
+            y += vy * 0.1
+            if y < 0:
+                y, vy = -y, -vy * 0.5
+            expected[i] = (y, vy)
+    np.testing.assert_allclose(store.column("y"), [y for y, _ in expected])
+    np.testing.assert_allclose(physics.velocities[:, 1], [vy for _, vy in expected])
+    np.testing.assert_array_equal(store.column("x"), [0.0, 1.0, 2.0])
+    assert len(physics) == 3
+
+
+def test_velocities_follow_entities_across_row_changes(store):
+    physics = PhysicsSystem(store, gravity=(0.0, 0.0))
+    first = physical_entity("first", vx=1.0, vy=0.0)
+    second = physical_entity("second", y=5.0, vx=2.0, vy=0.0)
+    lamp = Entity.new("lamp", x=0.0, y=0.0, z=0.0)
+    for entity in (first, second, lamp):
+        store.bind(entity)
+    physics.step(1.0)
+    assert (first.properties["x"], second.properties["x"], lamp.properties["x"]) == (1.0, 2.0, 0.0)
+
+    store.unbind(first)
+    third = physical_entity("third", y=5.0)
+    store.bind(third)
+    physics.set_velocity(third.id, (0.0, 1.0))
+    physics.step(1.0)
+    assert second.properties["x"] == 4.0
+    assert third.properties["y"] == 6.0
+    assert physics.velocity(second.id) == (2.0, 0.0)
+    assert len(physics) == 2
+    with pytest.raises(ValueError, match="one entry per axis"):
+        PhysicsSystem(store, gravity=(0.0,))
+
+
+def test_steps_commit_moved_columns(tmp_path, store):
+    manager = EntityManager(tmp_path / "test_physics.db", column_store=store)
+    moved = ChangeCollector(manager.events, kinds=[EntityEventKind.UPDATED], keys=["x", "y"])
+    ball = physical_entity("ball", y=10.0)
+    manager.add_entity(ball)
+    physics = PhysicsSystem(store)
+    with manager.transaction():
+        physics.step(0.1)
+    assert moved.drain() == {ball.id}
+    assert ball.snapshot()["y"] == pytest.approx(10.0 - 0.098)
+    assert manager.spatial_index.position(ball.id)[1] == pytest.approx(10.0 - 0.098)
+    manager.close()
+
+
+def test_snapshots_follow_every_committed_step(tmp_path, store):
+    manager = EntityManager(tmp_path / "test_physics.db", column_store=store)
+    ball = physical_entity("ball", y=10.0)
+    manager.add_entity(ball)
+    physics = PhysicsSystem(store, gravity=(0.0, -10.0))
+    heights = []
+    for _ in range(3):
+        with manager.transaction():
+            before = ball.snapshot()["y"]
+            physics.step(0.1)
+            # Readers see the previous tick until the transaction ends
+            assert ball.snapshot()["y"] == before
+        heights.append(ball.snapshot()["y"])
+    assert heights == pytest.approx([9.9, 9.7, 9.4])
+    physics.step(0.1)
+    assert ball.snapshot()["y"] == pytest.approx(9.0)
+    manager.close()
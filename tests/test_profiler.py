@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from token_world.profiler import Profiler
+
+
+def test_sections_keep_a_rolling_window(clock):
+    profiler = Profiler(window=100, clock=clock)
+    for i in range(1, 201):
+        with profiler.section("draw"):
+            clock.now += i / 1000
+    assert "draw" in profiler
+    assert len(profiler.samples("draw")) == 100
+    stats = profiler.percentiles("draw")
+    assert stats["count"] == 100
+    assert stats["p50"] == pytest.approx(0.1505)
+    assert stats["p99"] == pytest.approx(0.19901)
+    assert profiler.percentiles("missing") == {"count": 0}
+    with pytest.raises(ValueError, match="must be positive"):
+        Profiler(window=0)
+
+
+def test_marks_measure_rates(clock):
+    profiler = Profiler(clock=clock)
+    assert profiler.rate("tick") == 0.0
+    for _ in range(11):
+        profiler.mark("tick")
+        clock.now += 0.1
+    assert len(profiler.samples("tick")) == 10
+    assert profiler.rate("tick") == pytest.approx(10.0)
+
+
+def test_export_json(tmp_path):
+    profiler = Profiler()
+    profiler.record("sync", 0.002)
+    profiler.record("frame", 0.016)
+    profiler.export_json(tmp_path / "profile.json")
+    exported = json.loads((tmp_path / "profile.json").read_text())
+    assert list(exported) == ["frame", "sync"]
+    assert exported["sync"] == {"count": 1, "mean": 0.002, "p50": 0.002, "p95": 0.002, "p99": 0.002}
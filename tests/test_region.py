@@ -0,0 +1,148 @@
+from pathlib import Path
+
+import pytest
+
+from token_world.entity import Entity, physical_entity
+from token_world.person.person import person_entity
+from token_world.region import RegionManager
+
+
+@pytest.fixture
+def regions(tmpdir):
+    manager = RegionManager(Path(tmpdir), region_size=100.0)
+    yield manager
+    manager.close()
+
+
+def test_entities_are_sharded_by_region(regions, tmpdir):
+    agent = regions.add_entity(person_entity("Alice", x=10.0, y=10.0))
+    town_item = regions.add_entity(physical_entity("Lamp", x=20.0, y=20.0))
+    forest_item = regions.add_entity(physical_entity("Tree", x=250.0, y=10.0))
+    idea = regions.add_entity(Entity.new("Idea"))
+
+    assert set(regions.regions) == {(0, 0)}
+    assert set(regions.regions[(0, 0)].entities) == {agent.id, town_item.id}
+    assert idea.id in regions.global_entities.entities
+    forest_db = Path(tmpdir) / "regions" / "2_0.db"
+    assert not forest_db.exists()
+    regions.save()
+    assert forest_db.exists()
+    assert regions.get(forest_item.id) == forest_item
+    assert set(regions.regions) == {(0, 0), (2, 0)}
+    regions.update()
+    assert set(regions.regions) == {(0, 0)}
+    with pytest.raises(ValueError, match="already managed"):
+        regions.add_entity(forest_item)
+
+
+def test_agent_entering_a_dormant_region_activates_it(regions):
+    agent = regions.add_entity(person_entity("Alice", x=10.0, y=10.0))
+    tree = regions.add_entity(physical_entity("Tree", x=150.0, y=10.0))
+    ball = regions.add_entity(physical_entity("Ball", x=50.0, y=10.0))
+    assert set(regions.regions) == {(0, 0)}
+
+    ball.properties["x"] = 160.0
+    regions.update()
+    assert set(regions.regions) == {(0, 0)}
+
+    agent.properties["x"] = 120.0
+    regions.update()
+    assert set(regions.regions) == {(1, 0)}
+    forest = regions.regions[(1, 0)]
+    assert set(forest.entities) == {agent.id, tree.id, ball.id}
+    assert forest.entities[ball.id].properties["x"] == 160.0
+    assert [e.id for e in regions.entities_within((120.0, 10.0, 0.0), 5.0)] == [agent.id]
+
+
+def test_regions_persist_and_reactivate_on_load(tmpdir):
+    root = Path(tmpdir)
+    regions = RegionManager(root, region_size=100.0)
+    agent = regions.add_entity(person_entity("Alice", x=310.0, y=10.0))
+    tree = regions.add_entity(physical_entity("Tree", x=10.0, y=10.0))
+    idea = regions.add_entity(Entity.new("Idea"))
+    regions.remove_entity(idea.id)
+    regions.save()
+    regions.close()
+
+    reopened = RegionManager(root, region_size=100.0)
+    reopened.load()
+    assert set(reopened.regions) == {(3, 0)}
+    assert reopened.get(agent.id) == agent
+    assert reopened.get(tree.id) == tree
+    assert idea.id not in reopened.global_entities.entities
+    assert reopened.remove_entity(tree.id) == tree
+    with pytest.raises(KeyError):
+        reopened.get(tree.id)
+    reopened.close()
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashingConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, *args):
+        return self._conn.execute(*args)
+
+    def commit(self):
+        raise Crash
+
+
+def moved_ball(root: Path) -> RegionManager:
+    regions = RegionManager(root, region_size=100.0)
+    regions.add_entity(person_entity("Alice", x=10.0, y=10.0))
+    ball = regions.add_entity(physical_entity("Ball", id="ball", x=50.0, y=10.0))
+    regions.save()
+    ball.properties["x"] = 150.0
+    regions.update()
+    return regions
+
+
+def test_dormant_placements_wait_for_save(tmpdir):
+    root = Path(tmpdir)
+    regions = moved_ball(root)
+    regions.close()
+
+    reopened = RegionManager(root, region_size=100.0)
+    reopened.load()
+    assert reopened.get("ball").properties["x"] == 50.0
+    assert "ball" not in reopened.activate((1, 0)).entities
+    reopened.close()
+
+
+def test_save_interrupted_before_the_directory_commits(tmpdir):
+    root = Path(tmpdir)
+    regions = moved_ball(root)
+    directory = regions._directory
+    regions._directory = CrashingConnection(directory)
+    with pytest.raises(Crash):
+        regions.save()
+    directory.close()
+
+    reopened = RegionManager(root, region_size=100.0)
+    reopened.load()
+    # The copy written to the dormant region is dropped, the ball stays where it was
+    assert "ball" not in reopened.activate((1, 0)).entities
+    assert reopened.get("ball").properties["x"] == 50.0
+    reopened.close()
+
+
+def test_save_interrupted_after_the_directory_commits(tmpdir, monkeypatch):
+    root = Path(tmpdir)
+    regions = moved_ball(root)
+
+    def crash():
+        raise Crash
+
+    monkeypatch.setattr(regions.regions[(0, 0)], "save", crash)
+    with pytest.raises(Crash):
+        regions.save()
+
+    reopened = RegionManager(root, region_size=100.0)
+    reopened.load()
+    assert "ball" not in reopened.regions[(0, 0)].entities
+    assert reopened.get("ball").properties["x"] == 150.0
+    reopened.close()
@@ -0,0 +1,100 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from token_world.columnar import ColumnStore
+from token_world.drawable.base import DrawableEntityHandler
+from token_world.entity import physical_entity
+from token_world.person.person import PeopleManager
+from token_world.profiler import Profiler
+from token_world.renderer import WorldRenderer
+from token_world.snapshot import SnapshotBuffer
+from token_world.viewport import Viewport
+from token_world.world import World
+
+
+@pytest.fixture
+def handler() -> MagicMock:
+    handler = MagicMock(spec=DrawableEntityHandler)
+    handler.id, handler.tags, handler.watched_keys = "handler", None, None
+    handler.new_draw_callback.side_effect = lambda entity: MagicMock(name=entity.name)
+    return handler
+
+
+@pytest.fixture
+def world(tmp_path, handler) -> World:
+    people_manager = PeopleManager(client=MagicMock(), environment=MagicMock())
+    world = World(
+        tmp_path, people_manager, [handler], keyframe_interval=10, viewport=Viewport(100, 100)
+    )
+    yield world
+    world.close()
+
+
+@patch("token_world.renderer.Window")
+def test_draw_syncs_and_draws_the_world(MockWindow, world: World, handler: MagicMock):
+    renderer = WorldRenderer(world)
+    ball = world.add_entity(physical_entity("ball", x=10.0, y=10.0))
+    renderer.draw()
+    world._draw_callbacks[ball.id, handler.id].assert_called_once()
+    handler.draw.assert_called_once()
+    MockWindow.return_value.clear.assert_called_once()
+    assert MockWindow.return_value.view[12:14] == (0.0, 0.0)
+
+
+@patch("token_world.renderer.clock")
+@patch("token_world.renderer.Window")
+def test_replay_restores_versions_in_order(MockWindow, mock_clock, world: World):
+    ball = world.add_entity(physical_entity("ball", x=0.0))
+    for x in (0.0, 1.0, 2.0):
+        ball.properties["x"] = x
+        world.tick()
+    renderer = WorldRenderer(world)
+    renderer.replay([2, 1])
+    mock_clock.schedule_interval.assert_called_once_with(renderer._replay_step, 0.1)
+    renderer._replay_step(0.1)
+    assert ball.properties["x"] == 1.0
+    renderer._replay_step(0.1)
+    assert ball.properties["x"] == 0.0
+    renderer._replay_step(0.1)
+    mock_clock.unschedule.assert_called_once_with(renderer._replay_step)
+
+
+@patch("token_world.renderer.Label")
+@patch("token_world.renderer.Window")
+def test_profiled_frames_feed_the_overlay(MockWindow, MockLabel, world: World, handler: MagicMock):
+    world.profiler = Profiler()
+    renderer = WorldRenderer(world)
+    world.add_entity(physical_entity("ball", x=10.0, y=10.0))
+    world.tick()
+    world.tick()
+    renderer.draw()
+    renderer.draw()
+    assert {"frame", "sync", "view", "draw.handler", "tick"} <= set(world.profiler.names)
+    lines = renderer.overlay.lines()
+    assert lines[2].startswith("draw handler p95")
+    assert lines[3].startswith("entities 1  ticks/s")
+    MockLabel.return_value.draw.assert_called()
+    assert "FPS" in MockLabel.return_value.text
+
+
+@patch("token_world.renderer.Window")
+def test_snapshots_replace_synced_callbacks(MockWindow, tmp_path, handler: MagicMock):
+    handler.apply_snapshot.return_value = True
+    people_manager = PeopleManager(client=MagicMock(), environment=MagicMock())
+    world = World(tmp_path, people_manager, [handler], column_store=ColumnStore(("x", "y")))
+    world.snapshots = SnapshotBuffer()
+    renderer = WorldRenderer(world)
+    ball = world.add_entity(physical_entity("ball", x=10.0, y=10.0))
+    world.tick()
+    renderer.draw()
+    handler.apply_snapshot.assert_called_once_with(world.snapshots.latest)
+    world._draw_callbacks[ball.id, handler.id].assert_not_called()
+    assert world.synced_count == 0
+    world.close()
+
+
+def test_snapshots_need_a_column_store(world: World):
+    world.snapshots = SnapshotBuffer()
+    with pytest.raises(RuntimeError, match="column store"):
+        world.tick()
@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from token_world.scheduler import OverrunPolicy, TickScheduler
+
+
+def scheduler_with_durations(clock, durations, **options):
+    starts = []
+    remaining = iter(durations)
+
+    def tick():
+        starts.append(round(clock.now, 6))
+        clock.now += next(remaining)
+
+    return TickScheduler(tick, clock=clock, sleep=clock.sleep, **options), starts
+
+
+def test_ticks_are_paced_against_the_clock(clock):
+    scheduler, starts = scheduler_with_durations(clock, [0.05, 0.02, 0.08], rate=10.0)
+    scheduler.run(max_ticks=3)
+    assert starts == [0.0, 0.1, 0.2]
+    assert scheduler.tick_count == 3
+    assert scheduler.overrun_count == 0
+    assert scheduler.last_duration == pytest.approx(0.08)
+
+
+def test_catch_up_runs_missed_ticks_back_to_back(clock):
+    scheduler, starts = scheduler_with_durations(clock, [0.25, 0.0, 0.0, 0.0, 0.0], rate=10.0)
+    scheduler.run(max_ticks=5)
+    assert starts == [0.0, 0.25, 0.25, 0.3, 0.4]
+    assert scheduler.overrun_count == 1
+    assert scheduler.dropped_count == 0
+
+
+def test_catch_up_is_limited(clock):
+    scheduler, starts = scheduler_with_durations(
+        clock, [0.95, 0.0, 0.0, 0.0], rate=10.0, max_catch_up=2
+    )
+    scheduler.run(max_ticks=4)
+    assert starts == [0.0, 0.95, 0.95, 1.0]
+    assert scheduler.dropped_count == 7
+
+
+def test_drop_skips_missed_ticks(clock):
+    scheduler, starts = scheduler_with_durations(
+        clock, [0.25, 0.0, 0.0], rate=10.0, policy=OverrunPolicy.DROP
+    )
+    scheduler.run(max_ticks=3)
+    assert starts == [0.0, 0.3, 0.4]
+    assert scheduler.overrun_count == 1
+    assert scheduler.dropped_count == 2
+
+
+def test_max_speed_never_sleeps(clock):
+    scheduler, starts = scheduler_with_durations(clock, [0.01] * 3, rate=None)
+    scheduler.run(max_ticks=3)
+    assert starts == [0.0, 0.01, 0.02]
+    assert scheduler.period is None
+
+
+def test_stop_interrupts_a_background_scheduler():
+    ticked = threading.Event()
+    scheduler = TickScheduler(ticked.set, rate=0.001)
+    scheduler.start()
+    assert ticked.wait(5)
+    with pytest.raises(RuntimeError, match="already started"):
+        scheduler.start()
+    scheduler.stop()
+    assert scheduler.tick_count == 1
+    with pytest.raises(ValueError, match="must be positive"):
+        TickScheduler(ticked.set, rate=0)
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from token_world.columnar import ColumnStore
+from token_world.entity import EntityManager, physical_entity
+from token_world.snapshot import SnapshotBuffer
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ColumnStore(("x", "y", "z"))
+    manager = EntityManager(tmp_path / "test_snapshot.db", column_store=store)
+    manager.add_entity(physical_entity("a", x=0.0, y=1.0))
+    manager.add_entity(physical_entity("b", x=10.0, y=1.0))
+    yield store
+    manager.close()
+
+
+def test_published_snapshots_are_immutable_copies(store):
+    buffer = SnapshotBuffer()
+    assert buffer.latest is None and buffer.interpolated() is None
+    first = buffer.publish(store)
+    store.column("x")[:] += 1.0
+    second = buffer.publish(store)
+    assert (buffer.previous, buffer.latest) == (first, second)
+    assert (first.sequence, second.sequence) == (0, 1)
+    assert first.position(store.ids[1]) == (10.0, 1.0)
+    assert second.position(store.ids[1]) == (11.0, 1.0)
+    assert second.layout is first.layout and second.rows is first.rows
+    with pytest.raises(ValueError):
+        first.positions[0, 0] = 5.0
+
+
+def test_interpolation_blends_the_last_two_ticks(store, clock):
+    buffer = SnapshotBuffer(clock=clock)
+    buffer.publish(store)
+    assert buffer.interpolated() is buffer.latest
+    clock.now = 0.1
+    store.column("x")[:] += 1.0
+    latest = buffer.publish(store)
+    blended = buffer.interpolated(now=0.125)
+    np.testing.assert_allclose(blended.positions[:, 0], [0.25, 10.25])
+    assert blended.rows is latest.rows
+    assert buffer.interpolated(now=0.5) is latest
+
+
+def test_layout_changes_are_not_interpolated(store, clock):
+    buffer = SnapshotBuffer(clock=clock)
+    buffer.publish(store)
+    store.bind(physical_entity("c", x=5.0))
+    clock.now = 0.1
+    latest = buffer.publish(store)
+    assert len(latest) == 3
+    assert buffer.interpolated(now=0.15) is latest
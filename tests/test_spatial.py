@@ -0,0 +1,227 @@
+import random
+import sqlite3
+import threading
+from math import dist
+
+import pytest
+
+from token_world.entity import Entity, EntityManager, physical_entity
+from token_world.spatial import SpatialGrid
+
+
+@pytest.fixture
+def grid():
+    return SpatialGrid(cell_size=10.0)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return EntityManager(tmp_path / "test_entities.db", spatial_cell_size=10.0)
+
+
+def test_invalid_cell_size():
+    with pytest.raises(ValueError, match="Cell size must be positive"):
+        SpatialGrid(cell_size=0)
+
+
+def test_insert_move_and_remove(grid):
+    grid.insert("a", (1.0, 1.0, 0.0))
+    assert "a" in grid
+    assert len(grid) == 1
+    grid.insert("a", (55.0, -3.0, 0.0))
+    assert grid.position("a") == (55.0, -3.0, 0.0)
+    assert grid.within((1.0, 1.0, 0.0), 5.0) == []
+    assert grid.within((55.0, -3.0, 0.0), 1.0) == ["a"]
+    grid.remove("a")
+    grid.remove("a")
+    assert "a" not in grid
+    assert grid.nearest((0.0, 0.0, 0.0), 1) == []
+
+
+def test_within_uses_3d_distance(grid):
+    grid.insert("near", (0.0, 0.0, 1.0))
+    grid.insert("above", (0.0, 0.0, 20.0))
+    assert grid.within((0.0, 0.0, 0.0), 5.0) == ["near"]
+
+
+def test_within_box(grid):
+    grid.insert("in", (5.0, 5.0, 0.0))
+    grid.insert("edge", (20.0, 20.0, 0.0))
+    grid.insert("out", (25.0, 5.0, 0.0))
+    assert sorted(grid.within_box(0.0, 0.0, 20.0, 20.0)) == ["edge", "in"]
+
+
+def test_box_queries_spanning_far_more_cells_than_are_used(grid):
+    rng = random.Random(1)
+    positions = {i: (rng.uniform(0, 5000), rng.uniform(0, 5000), 0.0) for i in range(1000)}
+    for key, position in positions.items():
+        grid.insert(key, position)
+    # Billions of cells, only the used ones may be visited
+    assert sorted(grid.within_box(-1e6, -1e6, 1e6, 1e6)) == sorted(positions)
+    assert sorted(grid.within((0.0, 0.0, 0.0), 1e6)) == sorted(positions)
+    in_half = sorted(key for key, (x, _, _) in positions.items() if x <= 2500)
+    assert sorted(grid.within_box(-1e6, -1e6, 2500, 1e6)) == in_half
+    assert grid.within_box(1e5, 1e5, 1e6, 1e6) == []
+    assert SpatialGrid().within_box(-1e6, -1e6, 1e6, 1e6) == []
+
+
+def test_move_many_only_moves_keys_in_the_grid(grid):
+    grid.insert("near", (1.0, 1.0, 0.0))
+    grid.insert("far", (5.0, 5.0, 0.0))
+    grid.move_many(["near", "far", "absent"], [(2.0, 2.0, 0.0), (95.0, 5.0, 0.0), (0, 0, 0)])
+    assert "absent" not in grid
+    assert grid.position("near") == (2.0, 2.0, 0.0)
+    assert grid.within_box(90.0, 0.0, 100.0, 10.0) == ["far"]
+    assert grid.nearest((100.0, 0.0, 0.0), 1) == ["far"]
+
+
+def test_move_many_with_known_cell_changes(grid):
+    grid.insert("stays", (1.0, 1.0, 0.0))
+    grid.insert("leaves", (5.0, 5.0, 0.0))
+    grid.insert("breaks", (6.0, 6.0, 0.0))
+    grid.move_many(
+        ["stays", "leaves", "breaks", "absent"],
+        [(2.0, 2.0, 1.0), (95.0, 5.0, 0.0), (float("nan"), 0.0, 0.0), (0.0, 0.0, 0.0)],
+        [1, 2, 3],
+    )
+    assert "absent" not in grid and "breaks" not in grid
+    assert grid.position("stays") == (2.0, 2.0, 1.0)
+    assert grid.within_box(0.0, 0.0, 10.0, 10.0) == ["stays"]
+    assert grid.within_box(90.0, 0.0, 100.0, 10.0) == ["leaves"]
+
+
+@pytest.mark.parametrize("bad", [float("nan"), float("inf"), -float("inf")])
+def test_non_finite_positions_stay_out_of_the_grid(grid, bad):
+    grid.insert("a", (bad, 0.0, 0.0))
+    assert "a" not in grid
+    grid.insert("a", (1.0, 1.0, 0.0))
+    grid.insert("b", (2.0, 2.0, 0.0))
+    grid.insert("a", (0.0, bad, 0.0))
+    grid.move_many(["b"], [(2.0, 2.0, bad)])
+    assert len(grid) == 0
+    assert grid.within_box(-100.0, -100.0, 100.0, 100.0) == []
+
+
+def test_box_queries_while_another_thread_moves_keys():
+    grid = SpatialGrid(cell_size=1.0)
+    for key in range(500):
+        grid.insert(key, (key % 20, key // 20, 0.0))
+    stop = threading.Event()
+
+    def move():
+        rng = random.Random(0)
+        while not stop.is_set():
+            key = rng.randrange(500)
+            grid.insert(key, (rng.uniform(0, 20), rng.uniform(0, 25), 0.0))
+            grid.remove(rng.randrange(500))
+
+    mover = threading.Thread(target=move)
+    mover.start()
+    try:
+        for _ in range(300):
+            for key, (x, y, _) in grid.items_in_box(0, 0, 10, 10):
+                assert 0 <= x <= 10 and 0 <= y <= 10
+            grid.nearest((5.0, 5.0, 0.0), 3)
+    finally:
+        stop.set()
+        mover.join()
+
+
+def test_queries_match_brute_force(grid):
+    rng = random.Random(42)
+    positions = {
+        i: (rng.uniform(-200, 200), rng.uniform(-200, 200), rng.uniform(-5, 5)) for i in range(500)
+    }
+    for key, position in positions.items():
+        grid.insert(key, position)
+
+    for _ in range(20):
+        center = (rng.uniform(-250, 250), rng.uniform(-250, 250), 0.0)
+        expected_within = sorted(k for k, p in positions.items() if dist(p, center) <= 30.0)
+        assert sorted(grid.within(center, 30.0)) == expected_within
+
+        expected_nearest = sorted(positions, key=lambda k: dist(positions[k], center))[:7]
+        assert grid.nearest(center, 7) == expected_nearest
+
+
+def test_nearest_max_distance(grid):
+    grid.insert("close", (1.0, 0.0, 0.0))
+    grid.insert("far", (100.0, 0.0, 0.0))
+    assert grid.nearest((0.0, 0.0, 0.0), 5, max_distance=50.0) == ["close"]
+    assert grid.nearest((0.0, 0.0, 0.0), 5) == ["close", "far"]
+    assert grid.nearest((0.0, 0.0, 0.0), 0) == []
+
+
+def test_manager_indexes_physical_entities(manager):
+    alice = physical_entity("Alice", x=0.0, y=0.0)
+    ball = physical_entity("Ball", x=3.0, y=4.0)
+    for entity in (alice, ball, Entity.new("Idea")):
+        manager.add_entity(entity)
+    assert len(manager.spatial_index) == 2
+    assert manager.nearest_entities((0.0, 0.0, 0.0), 2) == [alice, ball]
+    assert manager.entities_within((0.0, 0.0, 0.0), 4.0) == [alice]
+
+
+def test_manager_index_follows_moves(manager):
+    ball = physical_entity("Ball", x=0.0, y=0.0)
+    manager.add_entity(ball)
+    ball.properties["x"] = 100.0
+    assert manager.entities_within((0.0, 0.0, 0.0), 10.0) == []
+    assert manager.entities_within((100.0, 0.0, 0.0), 1.0) == [ball]
+    ball.properties["is_physical"] = False
+    assert ball.id not in manager.spatial_index
+
+
+def test_manager_drops_non_finite_positions(manager):
+    events = []
+    manager.events.subscribe(events.append)
+    ball = physical_entity("Ball", x=0.0, y=0.0)
+    manager.add_entity(ball)
+    ball.properties["x"] = float("nan")
+    assert ball.id not in manager.spatial_index
+    assert [event.key for event in events] == [None, "x"]
+    ball.properties["x"] = 5.0
+    assert manager.entities_within((5.0, 0.0, 0.0), 1.0) == [ball]
+
+
+def test_positions_are_persisted(manager, tmp_path):
+    ball = physical_entity("Ball", x=1.0, y=2.0, z=3.0)
+    manager.add_entity(ball)
+    manager.save()
+    ball.properties["y"] = 5.0
+    manager.save()
+
+    with sqlite3.connect(tmp_path / "test_entities.db") as conn:
+        rows = conn.execute("SELECT id, x, y, z FROM entity_positions").fetchall()
+    assert rows == [(ball.id, 1.0, 5.0, 3.0)]
+
+    del ball.properties["is_physical"]
+    manager.save()
+    with sqlite3.connect(tmp_path / "test_entities.db") as conn:
+        assert conn.execute("SELECT count(*) FROM entity_positions").fetchone() == (0,)
+
+
+def test_loaded_entities_are_indexed(manager, tmp_path):
+    ball = physical_entity("Ball", x=1.0, y=2.0)
+    manager.add_entity(ball)
+    manager.save()
+
+    loaded = EntityManager(tmp_path / "test_entities.db")
+    loaded.load()
+    assert loaded.nearest_entities((0.0, 0.0, 0.0), 1) == [ball]
+
+
+def test_positions_backfilled_for_existing_database(tmp_path):
+    db_path = tmp_path / "old.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE entities (id TEXT PRIMARY KEY, name TEXT, properties TEXT)")
+        conn.execute(
+            "INSERT INTO entities VALUES ('ball', 'Ball', ?)",
+            ('{"is_physical": true, "x": 1.0, "y": 2.0}',),
+        )
+        conn.execute("INSERT INTO entities VALUES ('idea', 'Idea', '{}')")
+
+    EntityManager(db_path)
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT id, x, y, z FROM entity_positions").fetchall()
+    assert rows == [("ball", 1.0, 2.0, 0.0)]
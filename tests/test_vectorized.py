@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from token_world.columnar import ColumnStore
+from token_world.drawable.vectorized import GlyphBuffer, VectorizedPhysicalEntityHandler
+from token_world.entity import EntityManager, physical_entity
+from token_world.snapshot import SnapshotBuffer
+
+
+def test_glyph_buffer_stays_dense():
+    glyphs = GlyphBuffer(capacity=1)
+    glyphs.add("a", 1.0, 2.0)
+    glyphs.add("b", 3.0, 4.0)
+    glyphs.add("c", 5.0, 6.0)
+    with pytest.raises(ValueError, match="already has a glyph"):
+        glyphs.add("a", 0.0, 0.0)
+    glyphs.remove("a")
+    glyphs.set("c", 7.0, 8.0)
+    assert len(glyphs) == 2
+    assert "a" not in glyphs
+    np.testing.assert_array_equal(glyphs.positions, [[7.0, 8.0], [3.0, 4.0]])
+    assert glyphs.positions.dtype == np.float32
+
+
+def test_callbacks_write_positions_into_buffer():
+    handler = VectorizedPhysicalEntityHandler()
+    ball = physical_entity("Ball", x=1.0, y=2.0)
+    callback = handler.new_draw_callback(ball)
+    handler.glyphs.dirty = False
+    ball.properties["x"] = 5.0
+    callback()
+    assert handler.glyphs.dirty
+    np.testing.assert_array_equal(handler.glyphs.positions, [[5.0, 2.0]])
+    handler.release_draw_callback(callback)
+    assert len(handler.glyphs) == 0
+
+
+def test_draw_renders_glyphs():
+    pyglet = pytest.importorskip("pyglet")
+    try:
+        window = pyglet.window.Window(100, 100, visible=False)
+    except Exception as e:  # pragma: no cover
+        pytest.skip(f"No GL context available: {e}")
+    try:
+        pyglet.gl.glClearColor(1.0, 1.0, 1.0, 1.0)
+        window.switch_to()
+        window.clear()
+        handler = VectorizedPhysicalEntityHandler()
+        handler.new_draw_callback(physical_entity("Ball", x=50.0, y=50.0))
+        handler.draw()
+        image = pyglet.image.get_buffer_manager().get_color_buffer().get_image_data()
+        data = image.get_data("RGBA", image.width * 4)
+
+        def pixel(x, y):
+            offset = (y * image.width + x) * 4
+            return tuple(data[offset:][:4])
+
+        assert pixel(55, 52) == (255, 0, 0, 255)
+        assert pixel(30, 30) == (255, 255, 255, 255)
+    finally:
+        window.close()
+
+
+def test_snapshot_positions_are_gathered_by_id(tmp_path):
+    store = ColumnStore(("x", "y"))
+    manager = EntityManager(tmp_path / "test_vectorized.db", column_store=store)
+    handler = VectorizedPhysicalEntityHandler()
+    stored = [physical_entity(f"e{i}", x=float(i), y=0.0) for i in range(3)]
+    for entity in stored:
+        manager.add_entity(entity)
+    loose = physical_entity("Loose", x=7.0, y=7.0)
+    callbacks = [handler.new_draw_callback(entity) for entity in [stored[2], loose, stored[0]]]
+    buffer = SnapshotBuffer()
+    store.column("y")[:] = 5.0
+    loose.properties["y"] = 8.0
+    assert handler.apply_snapshot(buffer.publish(store))
+    np.testing.assert_array_equal(handler.glyphs.positions, [[2.0, 5.0], [7.0, 8.0], [0.0, 5.0]])
+
+    handler.release_draw_callback(callbacks[1])
+    store.column("x")[:] += 1.0
+    handler.apply_snapshot(buffer.publish(store))
+    np.testing.assert_array_equal(handler.glyphs.positions, [[3.0, 5.0], [1.0, 5.0]])
+    manager.close()
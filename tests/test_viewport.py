@@ -0,0 +1,32 @@
+import pytest
+
+from token_world.viewport import Viewport
+
+
+def test_pan_and_zoom_keep_anchor_in_place():
+    viewport = Viewport(800, 600, margin_pixels=0)
+    assert viewport.bounds() == (0.0, 0.0, 800.0, 600.0)
+    viewport.pan(-100, 50)
+    assert viewport.to_world(0, 0) == (100.0, -50.0)
+    viewport.zoom_at(2.0, 400, 300)
+    assert viewport.to_world(400, 300) == (500.0, 250.0)
+    assert viewport.bounds() == (300.0, 100.0, 700.0, 400.0)
+    viewport.zoom_at(1e9, 0, 0)
+    assert viewport.zoom == viewport.max_zoom
+    with pytest.raises(ValueError, match="Zoom must be between"):
+        Viewport(800, 600, zoom=0.0)
+
+
+def test_view_matrix_maps_world_to_pixels():
+    viewport = Viewport(800, 600, x=100.0, y=200.0, zoom=2.0)
+    m = viewport.view_matrix()
+    x, y = 150.0, 210.0
+    assert (m[0] * x + m[4] * y + m[12], m[1] * x + m[5] * y + m[13]) == (100.0, 20.0)
+
+
+def test_clusters_aggregate_nearby_positions():
+    viewport = Viewport(800, 600, zoom=0.1, cluster_pixels=10.0)
+    assert not viewport.detailed
+    assert viewport.clusters([]) == []
+    positions = [(10.0, 10.0, 0.0), (30.0, 50.0, 5.0), (150.0, 10.0, 0.0)]
+    assert sorted(viewport.clusters(positions)) == [(20.0, 30.0, 2), (150.0, 10.0, 1)]
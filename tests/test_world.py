@@ -1,11 +1,14 @@
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock
 from pathlib import Path
 from token_world.drawable.base import DrawableEntityHandler
 from token_world.world import World
-from token_world.entity import Entity, EntityManager
+from token_world.entity import Entity, EntityManager, physical_entity
 from token_world.world import persistent_world
 from token_world.person.person import PeopleManager
+from token_world.viewport import Viewport
+import subprocess
+import sys
 import tempfile
 import shutil
 
@@ -14,14 +17,15 @@ import shutil
 def drawable_handler() -> DrawableEntityHandler:
     mock_handler = MagicMock(spec=DrawableEntityHandler)
     mock_handler.id = "test_handler"
+    mock_handler.tags = None
+    mock_handler.watched_keys = None
     mock_handler.is_applicable.return_value = True
     mock_handler.new_draw_callback.return_value = "draw_callback"
     return mock_handler
 
 
 @pytest.fixture
-@patch("token_world.world.Window")
-def world(MockWindow, temp_dir):
+def world(temp_dir):
     world = World(temp_dir, PeopleManager(client=MagicMock(), environment=MagicMock()), [])
     return world
 
@@ -37,7 +41,7 @@ def test_init(world: World, temp_dir):
     assert (temp_dir / World.DB_FILE).exists()
     assert world._entity_manager.entities == {}
     assert world._drawable_entity_handler == {}
-    assert world._draw_callbacks == []
+    assert world._draw_callbacks == {}
 
 
 def test_add_drawable_callback_factory(world: World, drawable_handler: DrawableEntityHandler):
@@ -78,14 +82,14 @@ def test_add_entity(world: World, drawable_handler: MagicMock):
     drawable_handler.is_applicable.return_value = False
     result = world.add_entity(test_entity2)
     assert test_entity2.id in world._entity_manager.entities
-    world._draw_callbacks == []
+    assert world._draw_callbacks == {}
 
     test_entity3 = Entity.new("test_entity3")
     drawable_handler.is_applicable.return_value = True
     result = world.add_entity(test_entity3)
     assert test_entity3.id in world._entity_manager.entities
     assert drawable_handler.new_draw_callback.called_once_with(test_entity)
-    assert world._draw_callbacks == [drawable_handler.new_draw_callback.return_value]
+    assert list(world._draw_callbacks.values()) == [drawable_handler.new_draw_callback.return_value]
 
 
 def test_add_non_person_entity(world: World, drawable_handler: MagicMock):
@@ -97,7 +101,7 @@ def test_add_non_person_entity(world: World, drawable_handler: MagicMock):
     assert result == non_person
     assert non_person.id in world._entity_manager.entities
     assert non_person.id not in world._people_manager._person_handlers
-    assert world._draw_callbacks == [drawable_handler.new_draw_callback.return_value]
+    assert list(world._draw_callbacks.values()) == [drawable_handler.new_draw_callback.return_value]
 
 
 def test_add_person_entity(world: World, drawable_handler: MagicMock):
@@ -109,7 +113,7 @@ def test_add_person_entity(world: World, drawable_handler: MagicMock):
     assert result == person
     assert person.id in world._entity_manager.entities
     assert person.id in world._people_manager._person_handlers
-    assert world._draw_callbacks == [drawable_handler.new_draw_callback.return_value]
+    assert list(world._draw_callbacks.values()) == [drawable_handler.new_draw_callback.return_value]
 
 
 def test_persisted_world_load_and_save(temp_dir):
@@ -124,3 +128,247 @@ def test_persisted_world_load_and_save(temp_dir):
     with persistent_world(temp_dir, mock_people_manager, [mock_handler]) as world:
         assert len(world._entity_manager.entities) == 1
         assert world._entity_manager.entities[mock_entity.id] == mock_entity
+
+
+@pytest.mark.parametrize("tags", [frozenset({"is_physical"}), None])
+def test_load_reads_only_the_rows_handlers_apply_to(temp_dir, drawable_handler, tags):
+    people_manager = PeopleManager(client=MagicMock(), environment=MagicMock())
+    source = World(temp_dir, people_manager, [])
+    ball = source.add_entity(physical_entity("Ball"))
+    for i in range(5):
+        source.add_entity(Entity.new(f"Idea {i}"))
+    source.save()
+    source.close()
+
+    drawable_handler.tags = tags
+    drawable_handler.is_applicable.side_effect = lambda entity: entity.id == ball.id
+    world = World(temp_dir, people_manager, [drawable_handler], entity_cache_size=10)
+    decoded = []
+    decode = world._entity_manager._decode
+    world._entity_manager._decode = lambda data: decoded.append(data) or decode(data)
+    world.load()
+    assert list(world._draw_callbacks) == [(ball.id, drawable_handler.id)]
+    # Untagged handlers must be asked about every entity
+    assert len(decoded) == (6 if tags is None else 1)
+
+
+def test_lazy_world_pins_handled_entities(temp_dir, drawable_handler: MagicMock):
+    people_manager = PeopleManager(client=MagicMock(), environment=MagicMock())
+    world = World(temp_dir, people_manager, [drawable_handler], entity_cache_size=1)
+    drawn = world.add_entity(Entity.new("drawn"))
+    drawable_handler.is_applicable.return_value = False
+    world.add_entity(Entity.new("ignored"))
+    world.add_entity(Entity.new("other"))
+    assert world._entity_manager.entities[drawn.id] is drawn
+
+
+def test_persisted_world_autosaves(temp_dir):
+    with persistent_world(
+        temp_dir, MagicMock(spec=PeopleManager), [], autosave_every_n_ticks=1
+    ) as world:
+        assert world.checkpointer is not None
+        world.add_entity(Entity.new("mock_entity"))
+        world.tick()
+        world.checkpointer.stop()
+        assert world.checkpointer.checkpoint_count == 1
+        assert world._entity_manager.dirty_count == 0
+
+
+def test_world_ticks_record_versions(temp_dir):
+    world = World(temp_dir, MagicMock(spec=PeopleManager), [], keyframe_interval=10)
+    entity = world.add_entity(Entity.new("mock_entity", value=1))
+    world.tick()
+    entity.properties["value"] = 2
+    world.tick()
+    assert world._entity_manager.version == 2
+    assert world._entity_manager.entities_at(1)[entity.id].properties["value"] == 1
+
+
+def test_world_import_dispatches_handlers_after_loading(temp_dir, drawable_handler: MagicMock):
+    source = World(temp_dir / "source", MagicMock(spec=PeopleManager), [])
+    entities = [source.add_entity(Entity.new(f"Entity {i}")) for i in range(3)]
+    path = temp_dir / "entities.jsonl"
+    assert source.export_jsonl(path) == 3
+
+    counts = []
+    people_manager = MagicMock(spec=PeopleManager)
+    people_manager.is_person.return_value = False
+    world = World(temp_dir / "target", people_manager, [drawable_handler])
+    drawable_handler.is_applicable.side_effect = lambda entity: counts.append(
+        len(world._entity_manager.entities)
+    )
+    assert world.import_jsonl(path, chunk_size=1) == 3
+    assert counts == [3, 3, 3]
+    handled = [call.args[0] for call in drawable_handler.is_applicable.call_args_list]
+    assert sorted(handled, key=lambda e: e.id) == sorted(entities, key=lambda e: e.id)
+
+
+def test_remove_entity(world: World, drawable_handler: MagicMock, temp_dir):
+    world.add_drawable_callback_factory(drawable_handler)
+    person = world.add_entity(Entity.new("person", is_person=True))
+    other = world.add_entity(Entity.new("other"))
+    world.save()
+
+    assert world.remove_entity(person.id) is person
+    assert person.id not in world._entity_manager.entities
+    assert person.id not in world._people_manager._person_handlers
+    assert list(world._draw_callbacks) == [(other.id, drawable_handler.id)]
+    drawable_handler.release_draw_callback.assert_called_once_with(
+        drawable_handler.new_draw_callback.return_value
+    )
+    world.save()
+
+    entity_manager = EntityManager(temp_dir / World.DB_FILE)
+    entity_manager.load()
+    assert entity_manager.entities == {other.id: other}
+
+
+def test_tagged_handlers_skip_is_applicable(world: World, drawable_handler: MagicMock):
+    tagged = MagicMock(spec=DrawableEntityHandler)
+    tagged.id = "tagged"
+    tagged.tags = frozenset({"is_physical", "is_visible"})
+    tagged.watched_keys = None
+    world.add_drawable_callback_factory(tagged)
+    world.add_drawable_callback_factory(drawable_handler)
+    drawable_handler.is_applicable.return_value = False
+
+    ball = world.add_entity(Entity.new("ball", is_physical=True, is_visible=True))
+    world.add_entity(Entity.new("idea", is_physical=False))
+    tagged.is_applicable.assert_not_called()
+    tagged.new_draw_callback.assert_called_once_with(ball)
+    assert drawable_handler.is_applicable.call_count == 2
+    assert list(world._draw_callbacks) == [(ball.id, "tagged")]
+
+
+def test_sync_runs_watched_callbacks_only_after_changes(world: World):
+    watched = MagicMock(spec=DrawableEntityHandler)
+    watched.id, watched.tags, watched.watched_keys = "watched", None, frozenset({"x"})
+    watched.new_draw_callback.side_effect = lambda entity: MagicMock(name=entity.name)
+    world.add_drawable_callback_factory(watched)
+    moving = world.add_entity(Entity.new("moving", x=0.0))
+    still = world.add_entity(Entity.new("still", x=0.0))
+    callbacks = {key[0]: callback for key, callback in world._draw_callbacks.items()}
+
+    assert world.sync_draw_callbacks() == 0
+    moving.properties["x"] = 1.0
+    moving.properties["x"] = 2.0
+    still.properties["mood"] = "calm"
+    assert world.sync_draw_callbacks() == 1
+    assert world.synced_count == 1
+    callbacks[moving.id].assert_called_once()
+    callbacks[still.id].assert_not_called()
+    assert world.sync_draw_callbacks() == 0
+
+    with world._entity_manager.transaction():
+        still.properties["x"] = 1.0
+    world.remove_entity(moving.id)
+    assert world.sync_draw_callbacks() == 1
+    callbacks[still.id].assert_called_once()
+
+
+def test_sync_runs_polled_callbacks_every_frame(world: World, drawable_handler: MagicMock):
+    drawable_handler.new_draw_callback.return_value = MagicMock()
+    world.add_drawable_callback_factory(drawable_handler)
+    world.add_entity(Entity.new("entity"))
+    assert world.sync_draw_callbacks() == 1
+    assert world.sync_draw_callbacks() == 1
+    assert drawable_handler.new_draw_callback.return_value.call_count == 2
+
+
+def test_viewport_culls_entities_out_of_view(temp_dir, drawable_handler: MagicMock):
+    drawable_handler.new_draw_callback.side_effect = lambda entity: MagicMock(name=entity.name)
+    viewport = Viewport(100, 100, margin_pixels=0)
+    people_manager = PeopleManager(client=MagicMock(), environment=MagicMock())
+    world = World(temp_dir, people_manager, [drawable_handler], viewport=viewport)
+    near = world.add_entity(physical_entity("near", x=10.0, y=10.0))
+    far = world.add_entity(physical_entity("far", x=500.0, y=10.0))
+    idea = world.add_entity(Entity.new("idea"))
+    assert list(world._draw_callbacks) == [(idea.id, "test_handler")]
+
+    assert world.update_view() == 1
+    assert set(world._draw_callbacks) == {(idea.id, "test_handler"), (near.id, "test_handler")}
+    viewport.pan(-450, 0)
+    assert world.update_view() == 1
+    assert set(world._draw_callbacks) == {(idea.id, "test_handler"), (far.id, "test_handler")}
+    drawable_handler.release_draw_callback.assert_called_once()
+    near.properties["x"] = 480.0
+    assert world.update_view() == 2
+
+    viewport.zoom_at(0.1, 0, 0)
+    assert world.update_view() == 0
+    assert list(world._draw_callbacks) == [(idea.id, "test_handler")]
+    assert world.clusters == [(490.0, 10.0, 2)]
+    world.remove_entity(far.id)
+    assert far.id not in world._cullable
+
+
+def test_viewport_zoomed_out_to_the_minimum_clusters_every_entity(
+    temp_dir, drawable_handler: MagicMock
+):
+    viewport = Viewport(800, 600, zoom=0.001, margin_pixels=0)
+    people_manager = PeopleManager(client=MagicMock(), environment=MagicMock())
+    world = World(temp_dir, people_manager, [drawable_handler], viewport=viewport)
+    for i in range(1000):
+        world.add_entity(physical_entity(f"Ball {i}", x=float(i % 100) * 10, y=float(i // 100)))
+    assert world.update_view() == 0
+    assert sum(count for _, _, count in world.clusters) == 1000
+
+
+def test_lazy_world_only_hydrates_entities_in_view(temp_dir, drawable_handler: MagicMock):
+    drawable_handler.tags = frozenset({"is_physical"})
+    people_manager = PeopleManager(client=MagicMock(), environment=MagicMock())
+    source = World(temp_dir / "source", people_manager, [])
+    for i in range(20):
+        source.add_entity(physical_entity(f"Ball {i}", id=f"b{i}", x=50.0 * i, y=10.0))
+    path = temp_dir / "entities.jsonl"
+    source.export_jsonl(path)
+    source.save()
+
+    for load in ("load", "import_jsonl"):
+        root = temp_dir / "source" if load == "load" else temp_dir / "target"
+        world = World(
+            root,
+            people_manager,
+            [drawable_handler],
+            entity_cache_size=5,
+            viewport=Viewport(100, 100, margin_pixels=0),
+        )
+        if load == "load":
+            world.load()
+        else:
+            world.import_jsonl(path)
+        cache = world._entity_manager._cache
+        assert cache is not None
+        assert len(world._cullable) == 20
+        assert cache.cached_count == 0
+        # Balls at x 0, 50 and 100 are in view
+        assert world.update_view() == 3
+        assert cache.cached_count == 3
+        world.close()
+
+
+def test_world_runs_without_pyglet():
+    script = "import sys, token_world.world; print('pyglet' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    assert result.stdout.strip() == "False", result.stderr
+
+
+def test_restore_version_replays_recorded_state(temp_dir, drawable_handler: MagicMock):
+    drawable_handler.new_draw_callback.side_effect = lambda entity: MagicMock(name=entity.name)
+    people_manager = PeopleManager(client=MagicMock(), environment=MagicMock())
+    world = World(temp_dir, people_manager, [drawable_handler], keyframe_interval=10)
+    ball = world.add_entity(Entity.new("ball", x=0.0, mood="calm"))
+    world.tick()
+    ball.properties["x"] = 5.0
+    del ball.properties["mood"]
+    added = world.add_entity(Entity.new("added"))
+    world.tick()
+
+    world.restore_version(1)
+    assert ball.properties == {"x": 0.0, "mood": "calm"}
+    assert added.id not in world._entity_manager.entities
+    assert (added.id, "test_handler") not in world._draw_callbacks
+    world.restore_version(2)
+    assert ball.properties == {"x": 5.0}
+    assert world._entity_manager.entities[added.id] == added
+    assert (added.id, "test_handler") in world._draw_callbacks
@@ -0,0 +1,75 @@
+import logging
+import threading
+from time import perf_counter
+from typing import Callable, Optional
+
+
+class Checkpointer:
+    """Calls save from a background thread every interval seconds and/or every N ticks."""
+
+    def __init__(
+        self,
+        save: Callable[[], None],
+        interval: Optional[float] = 60.0,
+        every_n_ticks: Optional[int] = None,
+    ):
+        if interval is None and every_n_ticks is None:
+            raise ValueError("Either an interval or a tick count is required")
+        if every_n_ticks is not None and every_n_ticks <= 0:
+            raise ValueError(f"Tick count must be positive, got {every_n_ticks}")
+        self._save = save
+        self.interval = interval
+        self.every_n_ticks = every_n_ticks
+        self.checkpoint_count = 0
+        self.last_duration: Optional[float] = None
+        self._ticks = 0
+        self._requested = threading.Event()
+        self._pending = False
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("Checkpointer already started")
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="checkpointer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._requested.set()
+        self._thread.join()
+        self._thread = None
+
+    def tick(self):
+        self._ticks += 1
+        if self.every_n_ticks is not None and self._ticks % self.every_n_ticks == 0:
+            self.request()
+
+    def request(self):
+        self._pending = True
+        self._requested.set()
+
+    def _run(self):
+        while True:
+            woken = self._requested.wait(self.interval)
+            self._requested.clear()
+            # Requests made before stop() still get their checkpoint
+            if not woken or self._pending:
+                self._pending = False
+                self.checkpoint()
+            if self._stopping:
+                return
+
+    def checkpoint(self):
+        start = perf_counter()
+        try:
+            self._save()
+        except Exception as e:
+            logging.error(f"Checkpoint failed: {e}", exc_info=True)
+            return
+        self.last_duration = perf_counter() - start
+        self.checkpoint_count += 1
+        logging.debug(f"Checkpoint {self.checkpoint_count} took {self.last_duration:.3f}s")
@@ -0,0 +1,89 @@
+import argparse
+from pathlib import Path
+import random
+import tempfile
+from time import perf_counter
+from typing import Any, Dict, List
+
+from token_world.codec import CODECS, PropertyCodec
+from token_world.entity import Entity, EntityManager
+
+
+def _bags(count: int) -> List[Dict[str, Any]]:
+    # A mix of bare physical bodies and people carrying text and nested state
+    rng = random.Random(0)
+    bags: List[Dict[str, Any]] = []
+    for i in range(count):
+        bag: Dict[str, Any] = {
+            "is_physical": True,
+            "x": rng.uniform(0, 800),
+            "y": rng.uniform(0, 600),
+            "z": 0.0,
+            "vx": rng.uniform(-1, 1),
+            "vy": rng.uniform(-1, 1),
+            "color": [rng.randrange(256) for _ in range(3)],
+        }
+        if i % 4 == 0:
+            bag |= {
+                "is_person": True,
+                "mood": rng.choice(["calm", "curious", "angry", "tired"]),
+                "age": rng.randrange(10, 90),
+                "memories": [f"Saw entity {rng.randrange(count)} at tick {t}" for t in range(5)],
+                "relationships": {str(rng.randrange(count)): rng.uniform(-1, 1) for _ in range(3)},
+            }
+        bags.append(bag)
+    return bags
+
+
+def _throughput(codec: PropertyCodec, bags: List[Dict[str, Any]]) -> Dict[str, float]:
+    start = perf_counter()
+    encoded = [codec.encode(bag) for bag in bags]
+    encode_time = perf_counter() - start
+    start = perf_counter()
+    for data in encoded:
+        codec.decode(data)
+    decode_time = perf_counter() - start
+    size = sum(len(data.encode() if isinstance(data, str) else data) for data in encoded)
+    return {
+        "encode": len(bags) / encode_time,
+        "decode": len(bags) / decode_time,
+        "bytes": size / len(bags),
+    }
+
+
+def _database_size(codec: PropertyCodec, bags: List[Dict[str, Any]]) -> int:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "world.db"
+        manager = EntityManager(db_path, codec=codec, pragmas={"journal_mode": "DELETE"})
+        for i, bag in enumerate(bags):
+            manager.add_entity(Entity.new(f"Entity {i}", **bag))
+        manager.save()
+        manager.close()
+        return db_path.stat().st_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare entity property codecs")
+    parser.add_argument("--count", type=int, default=50_000)
+    parser.add_argument("--codecs", nargs="+", default=sorted(CODECS), choices=sorted(CODECS))
+    args = parser.parse_args()
+
+    bags = _bags(args.count)
+    print(f"Entities: {args.count}")
+    print(f"{'codec':<8} {'encode/s':>12} {'decode/s':>12} {'bytes/entity':>13} {'db size':>12}")
+    for name in args.codecs:
+        try:
+            codec = CODECS[name]()
+        except ImportError as e:
+            print(f"{name:<8} skipped: {e}")
+            continue
+        result = _throughput(codec, bags)
+        db_size = _database_size(codec, bags)
+        print(
+            f"{name:<8} {result['encode']:>12,.0f} {result['decode']:>12,.0f} "
+            f"{result['bytes']:>13.1f} {db_size / 1024:>10,.0f}KB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import gc
+import json
+import tracemalloc
+from typing import Callable, List, Tuple
+import uuid
+
+from token_world.compact import CompactEntityTable
+from token_world.entity import Entity
+
+
+def _rows(count: int) -> List[Tuple[str, str, str]]:
+    # Rows as EntityManager.load() reads them from SQLite
+    return [
+        (
+            str(uuid.uuid4()),
+            f"Entity {i}",
+            json.dumps({"is_physical": True, "x": i * 1.5, "y": i * 2.5, "z": 0.0, "mood": "calm"}),
+        )
+        for i in range(count)
+    ]
+
+
+def _measure(build: Callable[[], object], count: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        used = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return used / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory used per loaded entity")
+    parser.add_argument("--count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = _rows(args.count)
+
+    def build_entities():
+        # Copy ids so both layouts pay for their own id strings
+        return {
+            (entity_id := "".join(id)): Entity(entity_id, name, json.loads(data))
+            for id, name, data in rows
+        }
+
+    def build_compact():
+        table = CompactEntityTable()
+        for id, name, data in rows:
+            table.add(Entity("".join(id), name, json.loads(data)))
+        return table
+
+    entity_bytes = _measure(build_entities, args.count)
+    compact_bytes = _measure(build_compact, args.count)
+    print(f"Entities measured: {args.count}")
+    print(f"Entity:        {entity_bytes:8.1f} bytes/entity")
+    print(f"CompactEntity: {compact_bytes:8.1f} bytes/entity")
+    print(f"Savings:       {1 - compact_bytes / entity_bytes:8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,9 @@ import logging
 import os
 from pathlib import Path
 import argparse
+import threading
 from dotenv import load_dotenv
 
-from pyglet.app import run  # type: ignore[import]
-
-from token_world.drawable.physical import PhysicalEntityHandler
 from token_world.environment import Environment
 from token_world.person.person import people_manager_executor, person_entity
 from token_world.world import persistent_world
@@ -37,12 +35,29 @@ def main():
         default=os.getenv("OPENAI_API_KEY"),
         help="The API key for the Swarm API",
     )
+    parser.add_argument(
+        "--entity_cache_size",
+        type=int,
+        default=None,
+        help="Keep at most this many entities in memory, loading the rest on demand.",
+    )
+    parser.add_argument(
+        "--autosave_interval",
+        type=float,
+        default=60.0,
+        help="Seconds between background checkpoints of the world.",
+    )
     parser.add_argument(
         "--log_level",
         type=str,
         default="INFO",
         help="Set the logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)",
     )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Run the simulation without opening a window.",
+    )
     args = parser.parse_args()
 
     logging.basicConfig(
@@ -59,14 +74,32 @@ def main():
     openai_client = OpenAI(base_url=args.openai_base_url, api_key=args.openai_api_key)
     client = Swarm(client=openai_client)
 
-    physical_entity_handler = PhysicalEntityHandler()
+    handlers = []
+    if not args.headless:
+        # Imported here so headless runs never load pyglet
+        from token_world.drawable.physical import PhysicalEntityHandler
+
+        handlers.append(PhysicalEntityHandler())
     environment = Environment(client)
     with people_manager_executor(client, environment) as people_manager, persistent_world(
-        args.world_dir, people_manager, [physical_entity_handler]
+        args.world_dir,
+        people_manager,
+        handlers,
+        args.entity_cache_size,
+        autosave_interval=args.autosave_interval,
     ) as world:
         if not world._entity_manager.entities:
             world.add_entity(person_entity("Alice", x=100, y=350))
-        run()
+        if args.headless:
+            try:
+                # People act on their own thread, wait for Ctrl-C
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
+        else:
+            from token_world.renderer import WorldRenderer
+
+            WorldRenderer(world).run()
 
 
 if __name__ == "__main__":
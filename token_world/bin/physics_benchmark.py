@@ -0,0 +1,105 @@
+import argparse
+from functools import partial
+from pathlib import Path
+import tempfile
+from time import perf_counter
+from typing import Callable, List
+
+from token_world.columnar import ColumnStore
+from token_world.entity import Entity, EntityManager, physical_entity
+from token_world.events import ChangeCollector, EntityEventKind
+from token_world.physics import PhysicsSystem
+
+
+def _bodies(count: int) -> List[Entity]:
+    return [physical_entity(f"Body {i}", x=float(i % 1000), y=float(i % 600)) for i in range(count)]
+
+
+def _per_entity_step(bodies: List[Entity], velocities: List[float], dt: float):
+    # The integration sanity_world used to do, one property write per entity
+    for i, body in enumerate(bodies):
+        velocities[i] -= 9.8 * dt
+        y = body.properties["y"] + velocities[i] * dt
+        if y < 0:
+            y = -y
+            velocities[i] *= -0.9
+        body.properties["y"] = y
+
+
+def _managed_tick(manager: EntityManager, moved: ChangeCollector, step: Callable[[], None]):
+    # What a world tick does, the renderer draining the moved entities once per frame
+    with manager.transaction():
+        step()
+    moved.drain()
+
+
+def _time_managed(count: int, ticks: int, dt: float, columnar: bool) -> float:
+    """Times ticks of bodies managed by an EntityManager, with the column store or one by one."""
+    with tempfile.TemporaryDirectory() as root:
+        store = ColumnStore(("x", "y", "z"), capacity=count) if columnar else None
+        manager = EntityManager(Path(root) / "bodies.db", column_store=store)
+        bodies = _bodies(count)
+        for body in bodies:
+            manager.add_entity(body)
+        manager.save()
+        moved = ChangeCollector(manager.events, kinds=[EntityEventKind.UPDATED], keys=["x", "y"])
+        if store is not None:
+            physics = PhysicsSystem(store)
+            step = partial(physics.step, dt)
+        else:
+            step = partial(_per_entity_step, bodies, [0.0] * count, dt)
+        _managed_tick(manager, moved, step)
+        try:
+            return _time_per_tick(partial(_managed_tick, manager, moved, step), ticks)
+        finally:
+            manager.close()
+
+
+def _time_per_tick(step, ticks: int) -> float:
+    start = perf_counter()
+    for _ in range(ticks):
+        step()
+    return (perf_counter() - start) / ticks * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time physics ticks for growing body counts")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument(
+        "--per-entity-limit",
+        type=int,
+        default=100_000,
+        help="Only time the per-entity loop up to this many bodies.",
+    )
+    parser.add_argument(
+        "--managed-limit",
+        type=int,
+        default=1_000_000,
+        help="Only time ticks of bodies managed by an EntityManager up to this many bodies.",
+    )
+    args = parser.parse_args()
+
+    dt = 0.1
+    print(f"{'bodies':>10} {'integrate':>12} {'managed':>12} {'per entity':>12}  (ms/tick)")
+    for count in args.counts:
+        bodies = _bodies(count)
+        store = ColumnStore(("x", "y", "z"), capacity=count)
+        for body in bodies:
+            store.bind(body)
+        physics = PhysicsSystem(store)
+        physics.step(dt, commit=False)
+        integrate = _time_per_tick(lambda: physics.step(dt, commit=False), args.ticks)
+        # Transactions of the manager, with its dirty tracking, spatial index and events, for the
+        # column store and for the same bodies written one property at a time
+        managed = "-"
+        if count <= args.managed_limit:
+            managed = f"{_time_managed(count, args.ticks, dt, columnar=True):.2f}"
+        per_entity = "-"
+        if count <= args.per_entity_limit:
+            per_entity = f"{_time_managed(count, args.ticks, dt, columnar=False):.2f}"
+        print(f"{count:>10,} {integrate:>12.2f} {managed:>12} {per_entity:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import logging
+from pathlib import Path
+import tempfile
+
+from token_world.drawable.physical import PhysicalEntityHandler
+from token_world.entity import EntityManager
+from token_world.person.person import PeopleManager
+from token_world.renderer import WorldRenderer
+from token_world.viewport import Viewport
+from token_world.world import World
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the recorded history of a world")
+    parser.add_argument("--world_dir", type=Path, required=True)
+    parser.add_argument(
+        "--interval", type=float, default=0.1, help="Seconds between replayed versions."
+    )
+    parser.add_argument("--first_version", type=int, default=1)
+    parser.add_argument(
+        "--log_level",
+        type=str,
+        default="INFO",
+        help="Set the logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+
+    recorded = EntityManager(args.world_dir / World.DB_FILE)
+    recorded.load()
+    last_version = recorded.version
+    if last_version < args.first_version:
+        raise ValueError(f"{args.world_dir} has no recorded version {args.first_version}")
+    logging.info(f"Replaying versions {args.first_version} to {last_version}")
+    with tempfile.TemporaryDirectory() as replay_dir:
+        # Replay a checked out copy so the recorded world is never written to
+        recorded.checkout(last_version, Path(replay_dir) / World.DB_FILE)
+        recorded.close()
+        world = World(
+            Path(replay_dir),
+            PeopleManager(client=None, environment=None),
+            [PhysicalEntityHandler()],
+            viewport=Viewport(800, 600),
+        )
+        world.load()
+        world.restore_version(args.first_version)
+        renderer = WorldRenderer(world)
+        renderer.replay(range(args.first_version + 1, last_version + 1), args.interval)
+        try:
+            renderer.run()
+        finally:
+            world.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,17 @@
 import argparse
+from contextlib import nullcontext
 from concurrent.futures import thread
 import logging
 from pathlib import Path
-from time import sleep
-import numpy as np
-from pyglet.app import run  # type: ignore[import]
 
-from token_world.drawable.physical import PhysicalEntityHandler
+from token_world.columnar import ColumnStore
 from token_world.entity import physical_entity
+from token_world.person.person import PeopleManager
+from token_world.physics import PhysicsSystem
+from token_world.profiler import Profiler
+from token_world.scheduler import OverrunPolicy, TickScheduler
+from token_world.snapshot import SnapshotBuffer
+from token_world.viewport import Viewport
 from token_world.world import persistent_world
 
 
@@ -20,39 +24,109 @@ def main():
         default="INFO",
         choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
     )
+    parser.add_argument(
+        "--renderer",
+        type=str,
+        default="shapes",
+        choices=["shapes", "vectorized"],
+        help="Draw one pyglet shape per entity or all glyphs in one instanced draw call.",
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Simulate at full speed without opening a window.",
+    )
+    parser.add_argument(
+        "--ticks", type=int, default=None, help="Stop after this many ticks, runs until Ctrl-C."
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=None,
+        help="Simulation ticks per second, independent of the frame rate. Defaults to 10, or to "
+        "maximum speed when headless.",
+    )
+    parser.add_argument("--max-speed", action="store_true", help="Tick as fast as possible.")
+    parser.add_argument(
+        "--overrun-policy",
+        type=str,
+        default=OverrunPolicy.CATCH_UP.value,
+        choices=[policy.value for policy in OverrunPolicy],
+        help="Whether ticks that fall behind schedule are caught up or dropped.",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        help="Show a profiler overlay and write the rolling percentiles to this JSON file on exit.",
+    )
     args = parser.parse_args()
 
     logging.basicConfig(level=getattr(logging, args.log_level.upper()))
 
     root_dir = args.root_dir
 
-    physical_entity_handler = PhysicalEntityHandler()
-    with persistent_world(root_dir, [physical_entity_handler]) as world:
+    handlers = []
+    if not args.headless:
+        # Imported here so headless runs never load pyglet
+        from token_world.drawable.physical import PhysicalEntityHandler
+        from token_world.drawable.vectorized import VectorizedPhysicalEntityHandler
+
+        handlers.append(
+            VectorizedPhysicalEntityHandler()
+            if args.renderer == "vectorized"
+            else PhysicalEntityHandler()
+        )
+    people_manager = PeopleManager(client=None, environment=None)
+    positions = ColumnStore(("x", "y", "z"))
+    with persistent_world(
+        root_dir,
+        people_manager,
+        handlers,
+        column_store=positions,
+        autosave_every_n_ticks=100,
+        viewport=Viewport(800, 600),
+    ) as world:
         if not world._entity_manager.entities:
             [
                 world.add_entity(physical_entity(f"Entity {i}", x=100 + i * 5, y=350 + i))
                 for i in range(50)
             ]
 
-        running = True
+        if args.profile is not None:
+            world.profiler = Profiler()
+        rate = None if args.max_speed else args.rate or (None if args.headless else 10.0)
+        # Ticks advance a tenth of a second of simulated time at maximum speed too
+        dt = 0.1 if rate is None else 1.0 / rate
+        physics = PhysicsSystem(positions, gravity=(0.0, -980.0), restitution=0.9)
 
         def update_y():
-            vels = np.array([0.0] * 50)
-            while running:
-                vels -= 9.8
-                for i, entity in enumerate(world._entity_manager.entities.values()):
-                    if not physical_entity_handler.is_applicable(entity):
-                        continue
-                    entity.properties["y"] += vels[i]
-                    if entity.properties["y"] < 0:
-                        entity.properties["y"] = -entity.properties["y"]
-                        vels[i] = -vels[i] * 0.9
-                sleep(0.1)
-
-        with thread.ThreadPoolExecutor() as executor:
-            executor.submit(update_y)
-            run()
-            running = False
+            section = nullcontext() if world.profiler is None else world.profiler.section("physics")
+            with section, world._entity_manager.transaction():
+                physics.step(dt)
+            world.tick()
+
+        scheduler = TickScheduler(update_y, rate, OverrunPolicy(args.overrun_policy))
+        try:
+            if args.headless:
+                try:
+                    scheduler.run(args.ticks)
+                except KeyboardInterrupt:
+                    pass
+                logging.info(f"Ran {scheduler.tick_count} ticks, {scheduler.overrun_count} overran")
+            else:
+                from token_world.renderer import WorldRenderer
+
+                # Frames draw from per-tick position copies, interpolated between the last two
+                world.snapshots = SnapshotBuffer()
+                renderer = WorldRenderer(world)
+                with thread.ThreadPoolExecutor() as executor:
+                    executor.submit(scheduler.run, args.ticks)
+                    renderer.run()
+                    scheduler.stop()
+        finally:
+            if world.profiler is not None:
+                world.profiler.export_json(args.profile)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,95 @@
+from abc import ABC, abstractmethod
+import json
+import pickle
+from typing import Any, Dict, Mapping, Type, Union
+
+try:
+    import orjson  # type: ignore[import]
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+EncodedProperties = Union[str, bytes]
+
+
+class PropertyCodec(ABC):
+    """Encodes entity properties for the properties column of the entities table.
+
+    Text codecs must produce JSON, which keeps field-level JSON1 updates possible. Binary codecs
+    always rewrite whole rows.
+    """
+
+    name: str
+    binary: bool
+
+    @abstractmethod
+    def encode(self, properties: Mapping[str, Any]) -> EncodedProperties:
+        pass
+
+    @abstractmethod
+    def decode(self, data: EncodedProperties) -> Dict[str, Any]:
+        pass
+
+
+class JsonCodec(PropertyCodec):
+    name = "json"
+    binary = False
+
+    def encode(self, properties: Mapping[str, Any]) -> str:
+        return json.dumps(properties)
+
+    def decode(self, data: EncodedProperties) -> Dict[str, Any]:
+        return json.loads(data)
+
+
+class OrjsonCodec(PropertyCodec):
+    """JSON encoded with orjson, compatible with rows written by JsonCodec."""
+
+    name = "orjson"
+    binary = False
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise ImportError("OrjsonCodec requires the orjson extra, token_world[orjson]")
+
+    def encode(self, properties: Mapping[str, Any]) -> str:
+        # dict() reads column-backed values, orjson would read the underlying dict directly
+        return orjson.dumps(dict(properties)).decode()
+
+    def decode(self, data: EncodedProperties) -> Dict[str, Any]:
+        return orjson.loads(data)
+
+
+class PickleCodec(PropertyCodec):
+    """Compact binary rows; only open databases from trusted sources with it."""
+
+    name = "pickle"
+    binary = True
+
+    def encode(self, properties: Mapping[str, Any]) -> bytes:
+        return pickle.dumps(dict(properties), protocol=5)
+
+    def decode(self, data: EncodedProperties) -> Dict[str, Any]:
+        return pickle.loads(data)  # type: ignore[arg-type]
+
+
+CODECS: Dict[str, Type[PropertyCodec]] = {
+    codec.name: codec for codec in (JsonCodec, OrjsonCodec, PickleCodec)
+}
+
+_TEXT_FALLBACK = JsonCodec()
+
+
+def codec_for(data: EncodedProperties, preferred: PropertyCodec) -> PropertyCodec:
+    """Returns a codec able to decode data, the preferred one when the row has its format.
+
+    Text rows are always JSON and safe to read. Binary rows are only decoded by a binary codec
+    the manager was configured with, a text codec never hands them to an unpickler.
+    """
+    if isinstance(data, str) != preferred.binary:
+        return preferred
+    if isinstance(data, str):
+        return _TEXT_FALLBACK
+    raise ValueError(
+        f"Found a binary properties row but the {preferred.name} codec only reads text, open "
+        "the database with the binary codec that wrote it if it comes from a trusted source"
+    )
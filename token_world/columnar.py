@@ -0,0 +1,404 @@
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+from token_world.entity import Entity, EntityId, EntityProperties, LazySnapshot
+
+# Called with a column key and the rows of a bulk write
+ColumnListener = Callable[[str, np.ndarray], None]
+
+
+def _frozen(properties: "ColumnarProperties") -> Mapping[str, Any]:
+    return MappingProxyType(dict(properties.items()))
+
+
+class ColumnFrame(NamedTuple):
+    """A read-only copy of the columns and the row of each entity in it."""
+
+    columns: np.ndarray
+    rows: Dict[EntityId, int]
+
+
+@dataclass
+class Publication:
+    """Entities affected by publishing a frame of the columns."""
+
+    # Entities whose committed properties are read from the frames from now on
+    fresh: List[Tuple[EntityId, "PublishedRow"]]
+    # Entities to place in the spatial index one by one
+    reindexed: List[EntityId]
+    # Entities the spatial index moves in bulk, the indices of those that left their cell
+    keys: Sequence[EntityId] = ()
+    positions: List[Tuple[float, float, float]] = field(default_factory=list)
+    left_cell: List[int] = field(default_factory=list)
+
+
+class ColumnStore:
+    """Struct-of-arrays storage for numeric entity properties.
+
+    Bound entities get ColumnarProperties views whose column keys read and write one row of the
+    shared arrays, so whole columns can be processed with NumPy. Before writing to an array
+    directly call changing(), and commit() after, so snapshots, dirty tracking and indexes see the
+    change.
+
+    The entity manager owning the store sets listener and before_change to handle the rows of
+    those calls in bulk, otherwise the hooks of every row's properties run. It then reads the
+    committed rows from per-row flags and publishes the columns to snapshot readers as a frame,
+    one copy for all rows.
+    """
+
+    def __init__(self, columns: Sequence[str] = ("x", "y", "z"), capacity: int = 1024):
+        if not columns:
+            raise ValueError("A column store needs at least one column")
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self._column_index = {key: i for i, key in enumerate(self.columns)}
+        self._data = np.zeros((len(self.columns), max(capacity, 1)), dtype=np.float64)
+        self._ids: List[EntityId] = []
+        self._views: List["ColumnarProperties"] = []
+        self._rows: Dict[EntityId, int] = {}
+        # Columns of each row committed since the manager last took them to save, and since the
+        # last frame was published
+        self._unsaved = np.zeros(self._data.shape, dtype=bool)
+        self._unpublished = np.zeros(self._data.shape, dtype=bool)
+        # Rows whose entity reads its committed properties from the published frames
+        self._published = np.zeros(self._data.shape[1], dtype=bool)
+        # Bumped whenever rows are added, removed or moved
+        self.layout_version = 0
+        self._frame = ColumnFrame(self._data[:, :0].copy(), {})
+        self._frame_layout = 0
+        self.listener: Optional[ColumnListener] = None
+        self.before_change: Optional[ColumnListener] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, entity_id: object) -> bool:
+        return entity_id in self._rows
+
+    @property
+    def ids(self) -> List[EntityId]:
+        return self._ids
+
+    def row(self, entity_id: EntityId) -> int:
+        return self._rows[entity_id]
+
+    def properties(self, row: int) -> "ColumnarProperties":
+        return self._views[row]
+
+    def column(self, key: str) -> np.ndarray:
+        return self._data[self._column_index[key], : len(self._ids)]
+
+    def accepts(self, entity: Entity) -> bool:
+        props = entity.properties
+        return all(
+            isinstance(props.get(key), (int, float)) and not isinstance(props.get(key), bool)
+            for key in self.columns
+        )
+
+    def bind(self, entity: Entity):
+        if entity.id in self._rows:
+            raise ValueError(f"Entity with id {entity.id} already bound")
+        row = len(self._ids)
+        if row == self._data.shape[1]:
+            self._data = np.concatenate([self._data, np.zeros_like(self._data)], axis=1)
+            self._unsaved = np.concatenate([self._unsaved, np.zeros_like(self._unsaved)], axis=1)
+            self._unpublished = np.concatenate(
+                [self._unpublished, np.zeros_like(self._unpublished)], axis=1
+            )
+            self._published = np.concatenate([self._published, np.zeros_like(self._published)])
+        for i, key in enumerate(self.columns):
+            self._data[i, row] = entity.properties[key]
+        self._unsaved[:, row] = self._unpublished[:, row] = self._published[row] = False
+        view = ColumnarProperties(self, row, entity.properties)
+        self._ids.append(entity.id)
+        self._views.append(view)
+        self._rows[entity.id] = row
+        self.layout_version += 1
+        entity.properties = view
+
+    def unbind(self, entity: Entity):
+        row = self._rows.pop(entity.id)
+        view = self._views[row]
+        entity.properties = view.detach()
+        last = len(self._ids) - 1
+        if row != last:
+            # Move the last row into the freed slot to keep the arrays dense
+            self._data[:, row] = self._data[:, last]
+            self._unsaved[:, row] = self._unsaved[:, last]
+            self._unpublished[:, row] = self._unpublished[:, last]
+            self._published[row] = self._published[last]
+            self._ids[row] = self._ids[last]
+            self._views[row] = self._views[last]
+            self._views[row]._row = row
+            self._rows[self._ids[row]] = row
+        self._ids.pop()
+        self._views.pop()
+        self.layout_version += 1
+
+    def changing(self, key: str, rows: Optional[Iterable[int]] = None):
+        """Announces direct writes to a column, before making them.
+
+        Inside a manager transaction readers of Entity.snapshot() then keep seeing the values from
+        before the writes until the transaction ends.
+        """
+        row_array = self._row_array(key, rows)
+        if self.before_change is not None:
+            self.before_change(key, row_array)
+            return
+        for row in row_array.tolist():
+            self._views[row]._changing(key)
+
+    def commit(self, key: str, rows: Optional[Iterable[int]] = None):
+        row_array = self._row_array(key, rows)
+        # Rows join the transaction even if changing() was not called
+        if self.listener is not None:
+            if self.before_change is not None:
+                self.before_change(key, row_array)
+            self.listener(key, row_array)
+            return
+        for row in row_array.tolist():
+            view = self._views[row]
+            view._changing(key)
+            view._changed(key)
+
+    def _row_array(self, key: str, rows: Optional[Iterable[int]]) -> np.ndarray:
+        if key not in self._column_index:
+            raise KeyError(key)
+        if rows is None:
+            return np.arange(len(self._ids))
+        if isinstance(rows, np.ndarray):
+            return rows.astype(np.intp, copy=False)
+        return np.fromiter(rows, dtype=np.intp)
+
+    def row_values(self, row: int) -> Dict[str, float]:
+        return dict(zip(self.columns, self._data[:, row].tolist()))
+
+    def _flag_committed(self, key: str, rows: np.ndarray):
+        index = self._column_index[key]
+        self._unsaved[index, rows] = True
+        self._unpublished[index, rows] = True
+
+    def _take_unsaved(
+        self, rows: Optional[Sequence[int]] = None
+    ) -> List[Tuple[EntityId, List[str]]]:
+        """The entities of rows with committed columns and their keys, clearing the flags."""
+        row_array = np.arange(len(self._ids)) if rows is None else np.asarray(rows, dtype=np.intp)
+        flags = self._unsaved[:, row_array]
+        changed = np.flatnonzero(flags.any(axis=0))
+        if not len(changed):
+            return []
+        self._unsaved[:, row_array] = False
+        # Rows mostly share a few combinations of keys, each is listed once
+        codes = (flags[:, changed].T.astype(np.int64) << np.arange(len(self.columns))).sum(axis=1)
+        keys = {
+            code: [key for i, key in enumerate(self.columns) if code >> i & 1]
+            for code in np.unique(codes).tolist()
+        }
+        ids = map(self._ids.__getitem__, row_array[changed].tolist())
+        return list(zip(ids, map(keys.__getitem__, codes.tolist())))
+
+    def _publish(self, cell_size: float) -> "Publication":
+        """Copies the columns into a new frame, once for every row, and lists what changed.
+
+        Rows published before have their cells compared in NumPy against the previous frame,
+        which the spatial index holds for them.
+        """
+        count = len(self._ids)
+        columns = self._data[:, :count].copy()
+        columns.flags.writeable = False
+        rows = self._frame.rows
+        if self._frame_layout != self.layout_version:
+            rows = dict(self._rows)
+            self._frame_layout = self.layout_version
+        previous, self._frame = self._frame, ColumnFrame(columns, rows)
+        committed = self._unpublished[:, :count].copy()
+        self._unpublished[:, :count] = False
+
+        changed = np.flatnonzero(committed.any(axis=0))
+        published = self._published[changed]
+        axes = [self._column_index[axis] for axis in ("x", "y", "z") if axis in self._column_index]
+        moved = np.logical_or.reduce(committed[axes][:, changed], axis=0)
+        fresh = changed[~published]
+        self._published[fresh] = True
+        ids = self._ids
+        publication = Publication(
+            fresh=[
+                (ids[row], PublishedRow(_frozen(self._views[row]), self, ids[row]))
+                for row in fresh.tolist()
+            ],
+            reindexed=list(map(ids.__getitem__, fresh[moved[~published]].tolist())),
+        )
+        kept = changed[published & moved]
+        if not len(kept):
+            return publication
+        if len(axes) < 3:
+            publication.reindexed.extend(map(ids.__getitem__, kept.tolist()))
+            return publication
+        if previous.rows is rows:
+            before = previous.columns[axes[:2]][:, kept]
+        else:
+            # Rows were added or removed since the last frame, look up where they were
+            previous_rows = [previous.rows[ids[row]] for row in kept.tolist()]
+            before = previous.columns[axes[:2]][:, previous_rows]
+        after = columns[axes][:, kept]
+        left_cell = (np.floor(after[:2] / cell_size) != np.floor(before / cell_size)).any(axis=0)
+        publication.keys = ids if len(kept) == count else list(map(ids.__getitem__, kept.tolist()))
+        publication.positions = list(zip(*after.tolist()))
+        publication.left_cell = np.flatnonzero(left_cell).tolist()
+        return publication
+
+    def _unpublish(self, entity_id: EntityId):
+        row = self._rows.get(entity_id)
+        if row is not None:
+            self._published[row] = False
+
+    def _get(self, key: str, row: int) -> float:
+        return float(self._data[self._column_index[key], row])
+
+    def _set(self, key: str, row: int, value: float):
+        self._data[self._column_index[key], row] = value
+
+
+class ColumnarSnapshot(Mapping[str, Any]):
+    """Frozen properties of an entity whose column keys are read from a copy of the columns."""
+
+    __slots__ = ("base", "_columns", "_row", "_column_index")
+
+    def __init__(
+        self,
+        base: Mapping[str, Any],
+        columns: np.ndarray,
+        row: int,
+        column_index: Dict[str, int],
+    ):
+        # Holds every key, the values of column keys are only placeholders
+        self.base = base
+        self._columns = columns
+        self._row = row
+        self._column_index = column_index
+
+    def __getitem__(self, key: str) -> Any:
+        index = self._column_index.get(key)
+        if index is not None and key in self.base:
+            return float(self._columns[index, self._row])
+        return self.base[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.base)
+
+    def __len__(self) -> int:
+        return len(self.base)
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+
+class PublishedRow(LazySnapshot):
+    """Committed properties of a bound entity whose column keys are read from the last frame.
+
+    One frame copy per transaction then publishes the bulk writes of every row at once.
+    """
+
+    __slots__ = ("base", "_store", "_entity_id")
+
+    def __init__(self, base: Mapping[str, Any], store: ColumnStore, entity_id: EntityId):
+        # Holds every key, the values of column keys are only placeholders
+        self.base = base
+        self._store = store
+        self._entity_id = entity_id
+
+    def resolve(self) -> Mapping[str, Any]:
+        columns, rows = self._store._frame
+        row = rows.get(self._entity_id)
+        if row is None:
+            return self.base
+        return ColumnarSnapshot(self.base, columns, row, self._store._column_index)
+
+
+class ColumnarProperties(EntityProperties):
+    """Entity properties whose column keys live in a ColumnStore row."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: ColumnStore, row: int, properties: Dict[str, Any]):
+        super().__init__(properties)
+        self.listener = getattr(properties, "listener", None)
+        self.before_change = getattr(properties, "before_change", None)
+        self._store = store
+        self._row = row
+
+    def detach(self) -> EntityProperties:
+        properties = EntityProperties(self.items())
+        properties.listener = self.listener
+        properties.before_change = self.before_change
+        return properties
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._store._column_index:
+            return self._store._get(key, self._row)
+        return super().__getitem__(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._store._column_index:
+            return self._store._get(key, self._row)
+        return super().get(key, default)
+
+    def __setitem__(self, key: str, value: Any):
+        if key in self._store._column_index:
+            self._changing(key)
+            self._store._set(key, self._row, value)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: str):
+        if key in self._store._column_index:
+            raise KeyError(f"Column-backed property {key!r} cannot be removed")
+        super().__delitem__(key)
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key in self._store._column_index:
+            raise KeyError(f"Column-backed property {key!r} cannot be removed")
+        return super().pop(key, *default)
+
+    def popitem(self):
+        raise KeyError("Column-backed properties do not support popitem")
+
+    def clear(self):
+        raise KeyError("Column-backed properties cannot be cleared")
+
+    def __iter__(self) -> Iterator[str]:
+        # Overriding iteration makes dict(view) go through keys() and __getitem__
+        return super().__iter__()
+
+    def items(self):  # type: ignore[override]
+        # One read of the row rather than one per column key
+        columns = self._store.row_values(self._row)
+        return [(key, columns[key] if key in columns else value) for key, value in super().items()]
+
+    def values(self):  # type: ignore[override]
+        return [value for _, value in self.items()]
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __eq__(self, other: object) -> bool:
+        return dict(self.items()) == other
+
+    def __ne__(self, other: object) -> bool:
+        return not self == other
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
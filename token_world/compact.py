@@ -0,0 +1,199 @@
+import sys
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from token_world.entity import Entity, EntityId
+
+EntityKey = int
+
+
+class EntityIdInterner:
+    """Maps external string entity ids to dense integer keys and back.
+
+    Released keys are handed out again by later interns, so the keys stay dense as ids come and
+    go.
+    """
+
+    def __init__(self) -> None:
+        self._ids: List[Optional[EntityId]] = []
+        self._keys: Dict[EntityId, EntityKey] = {}
+        self._free: List[EntityKey] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, entity_id: object) -> bool:
+        return entity_id in self._keys
+
+    def intern(self, entity_id: EntityId) -> EntityKey:
+        key = self._keys.get(entity_id)
+        if key is None:
+            if self._free:
+                key = self._free.pop()
+                self._ids[key] = entity_id
+            else:
+                key = len(self._ids)
+                self._ids.append(entity_id)
+            self._keys[entity_id] = key
+        return key
+
+    def release(self, entity_id: EntityId) -> EntityKey:
+        key = self._keys.pop(entity_id)
+        self._ids[key] = None
+        self._free.append(key)
+        return key
+
+    def key(self, entity_id: EntityId) -> EntityKey:
+        return self._keys[entity_id]
+
+    def id(self, key: EntityKey) -> EntityId:
+        entity_id = self._ids[key]
+        if entity_id is None:
+            raise KeyError(key)
+        return entity_id
+
+
+class PropertySchema:
+    """Shared, ordered set of property names; entities with the same keys share one schema."""
+
+    __slots__ = ("keys", "index", "_registry", "_extensions")
+
+    def __init__(self, keys: Tuple[str, ...], registry: "SchemaRegistry"):
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+        self._registry = registry
+        self._extensions: Dict[str, "PropertySchema"] = {}
+
+    def extend(self, key: str) -> "PropertySchema":
+        schema = self._extensions.get(key)
+        if schema is None:
+            # Racing threads get the same schema from the registry
+            schema = self._extensions[key] = self._registry.of(self.keys + (key,))
+        return schema
+
+
+class SchemaRegistry:
+    """The schemas of one table, dropped along with it."""
+
+    def __init__(self) -> None:
+        self._schemas: Dict[Tuple[str, ...], PropertySchema] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._schemas)
+
+    def of(self, keys: Iterable[str]) -> PropertySchema:
+        interned = tuple(sys.intern(key) for key in keys)
+        with self._lock:
+            schema = self._schemas.get(interned)
+            if schema is None:
+                schema = self._schemas[interned] = PropertySchema(interned, self)
+        return schema
+
+
+class CompactEntity:
+    """Slotted entity addressed by an integer key.
+
+    Property names live in a PropertySchema shared by every entity with the same keys, so each
+    entity only stores a list of values.
+    """
+
+    __slots__ = ("key", "name", "_schema", "_values")
+
+    def __init__(
+        self, key: EntityKey, name: str, properties: Mapping[str, Any], schemas: SchemaRegistry
+    ):
+        self.key = key
+        self.name = name
+        self._schema = schemas.of(properties)
+        self._values = list(properties.values())
+
+    @property
+    def properties(self) -> Mapping[str, Any]:
+        """A read-only copy, properties are set on the entity itself."""
+        return MappingProxyType(dict(zip(self._schema.keys, self._values)))
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._schema.index[key]]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        i = self._schema.index.get(key)
+        return default if i is None else self._values[i]
+
+    def __setitem__(self, key: str, value: Any):
+        i = self._schema.index.get(key)
+        if i is None:
+            self._schema = self._schema.extend(key)
+            self._values.append(value)
+        else:
+            self._values[i] = value
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CompactEntity):
+            return NotImplemented
+        return (self.key, self.name, self.properties) == (other.key, other.name, other.properties)
+
+    def __repr__(self) -> str:
+        return f"CompactEntity(key={self.key}, name={self.name!r}, properties={self.properties!r})"
+
+
+class CompactEntityTable:
+    """Compact entities stored by integer key, looked up by their external string id.
+
+    Removing an entity frees its key and slot for the next entity added, so keys held on to
+    after a removal may address another entity.
+    """
+
+    def __init__(self) -> None:
+        self.interner = EntityIdInterner()
+        self.schemas = SchemaRegistry()
+        self._entities: List[Optional[CompactEntity]] = []
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, entity_id: object) -> bool:
+        return isinstance(entity_id, str) and self.get(entity_id) is not None
+
+    def __iter__(self) -> Iterator[EntityId]:
+        for entity in self._entities:
+            if entity is not None:
+                yield self.interner.id(entity.key)
+
+    def add(self, entity: Entity) -> CompactEntity:
+        key = self.interner.intern(entity.id)
+        if key < len(self._entities) and self._entities[key] is not None:
+            raise ValueError(f"Entity with id {entity.id} already managed")
+        compact = CompactEntity(key, entity.name, entity.properties, self.schemas)
+        self._entities.extend([None] * (key + 1 - len(self._entities)))
+        self._entities[key] = compact
+        self._count += 1
+        return compact
+
+    def get(self, entity_id: EntityId) -> Optional[CompactEntity]:
+        if entity_id not in self.interner:
+            return None
+        return self.get_by_key(self.interner.key(entity_id))
+
+    def get_by_key(self, key: EntityKey) -> Optional[CompactEntity]:
+        return self._entities[key] if key < len(self._entities) else None
+
+    def __getitem__(self, entity_id: EntityId) -> CompactEntity:
+        entity = self.get(entity_id)
+        if entity is None:
+            raise KeyError(entity_id)
+        return entity
+
+    def remove(self, entity_id: EntityId):
+        if self.get(entity_id) is None:
+            raise KeyError(entity_id)
+        self._entities[self.interner.release(entity_id)] = None
+        self._count -= 1
+
+    def id_of(self, entity: CompactEntity) -> EntityId:
+        return self.interner.id(entity.key)
+
+    def to_entity(self, entity: CompactEntity) -> Entity:
+        return Entity(self.id_of(entity), entity.name, dict(entity.properties))
@@ -1,15 +1,25 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Dict
+from typing import Callable, Dict, FrozenSet, Optional, TYPE_CHECKING
 from pyglet.graphics import Batch  # type: ignore[import]
 
 
 from token_world.entity import Entity
 
+if TYPE_CHECKING:
+    from token_world.snapshot import PositionSnapshot  # pragma: no cover
+
 DrawableEntityHandlerId = str
 DrawCallable = Callable[[], None]
 
 
 class DrawableEntityHandler(ABC):
+    # Properties marking the entities this handler applies to, any one of them being truthy is a
+    # match. Handlers without tags are asked through is_applicable() for every entity.
+    tags: Optional[FrozenSet[str]] = None
+    # Properties the draw callbacks depend on. When set, a callback only runs in frames after one
+    # of them changed, otherwise it runs every frame.
+    watched_keys: Optional[FrozenSet[str]] = None
+
     def __init__(self, id: DrawableEntityHandlerId):
         self.id = id
         self._batch = Batch()
@@ -22,6 +32,16 @@ class DrawableEntityHandler(ABC):
     def new_draw_callback(self, entity: Entity) -> DrawCallable:
         pass  # pragma: no cover
 
+    def release_draw_callback(self, callback: DrawCallable):
+        """Frees whatever the callback added to the batch once its entity is removed."""
+
+    def apply_snapshot(self, snapshot: "PositionSnapshot") -> bool:
+        """Updates every drawn entity from a position snapshot instead of its draw callback.
+
+        Returns whether it did, the draw callbacks of handlers that did are not run that frame.
+        """
+        return False
+
     def draw(self):
         self._batch.draw()
 
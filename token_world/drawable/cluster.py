@@ -0,0 +1,39 @@
+from math import log2
+from typing import List, Sequence, Tuple
+
+from pyglet.graphics import Batch  # type: ignore[import]
+from pyglet.shapes import Circle  # type: ignore[import]
+
+from token_world.viewport import Cluster
+
+
+class ClusterGlyphs:
+    """Level of detail glyphs standing in for groups of entities when zoomed out.
+
+    Every cluster is one circle growing with the log of its entity count, circles are reused
+    between frames so drawing costs the number of clusters rather than entities.
+    """
+
+    def __init__(self, color: Tuple[int, int, int, int] = (200, 0, 0, 160)):
+        self.color = color
+        self._batch = Batch()
+        self._circles: List[Circle] = []
+
+    def __len__(self) -> int:
+        return len(self._circles)
+
+    def update(self, clusters: Sequence[Cluster], zoom: float):
+        while len(self._circles) > len(clusters):
+            self._circles.pop().delete()
+        for i, (x, y, count) in enumerate(clusters):
+            # Circles are drawn in world coordinates, keep their size constant on screen
+            radius = (4.0 + 2.0 * log2(count)) / zoom
+            if i < len(self._circles):
+                circle = self._circles[i]
+                circle.position = x, y
+                circle.radius = radius
+            else:
+                self._circles.append(Circle(x, y, radius, color=self.color, batch=self._batch))
+
+    def draw(self):
+        self._batch.draw()
@@ -1,8 +1,11 @@
+from typing import Dict
+
 from pyglet.shapes import Triangle  # type: ignore[import]
 from pyglet.graphics import Batch  # type: ignore[import]
 
 from token_world.drawable.base import DrawableEntityHandler, DrawCallable
-from token_world.entity import Entity  # type: ignore[import]
+from token_world.entity import Entity, EntityId  # type: ignore[import]
+from token_world.snapshot import PositionSnapshot
 
 
 class PhysicalEntityHandler(DrawableEntityHandler):
@@ -15,14 +18,37 @@ class PhysicalEntityHandler(DrawableEntityHandler):
             self.shape = Triangle(x, y, x + 10, y, x + 5, y + 10, color=(255, 0, 0), batch=batch)
 
         def __call__(self):
-            self.shape.x = self.entity.properties["x"]
-            self.shape.y = self.entity.properties["y"]
+            props = self.entity.snapshot()
+            self.shape.x = props["x"]
+            self.shape.y = props["y"]
+
+    tags = frozenset({"is_physical"})
+    watched_keys = frozenset({"x", "y"})
 
-    def __init__(self):
+    def __init__(self) -> None:
         super().__init__("physical")
+        self._callbacks: Dict[EntityId, DrawCallable] = {}
 
     def is_applicable(self, entity: Entity) -> bool:
         return entity.properties.get("is_physical", False)
 
     def new_draw_callback(self, entity: Entity) -> DrawCallable:
-        return self.Callback(entity, self._batch)
+        callback = self._callbacks[entity.id] = self.Callback(entity, self._batch)
+        return callback
+
+    def release_draw_callback(self, callback: DrawCallable):
+        assert isinstance(callback, self.Callback)
+        del self._callbacks[callback.entity.id]
+        callback.shape.delete()
+
+    def apply_snapshot(self, snapshot: PositionSnapshot) -> bool:
+        rows, positions = snapshot.rows, snapshot.positions
+        for entity_id, callback in self._callbacks.items():
+            assert isinstance(callback, self.Callback)
+            row = rows.get(entity_id)
+            if row is None:
+                # Not column-backed, read its committed properties as usual
+                callback()
+            else:
+                callback.shape.position = float(positions[row, 0]), float(positions[row, 1])
+        return True
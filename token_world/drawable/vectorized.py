@@ -0,0 +1,214 @@
+from ctypes import byref, sizeof
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pyglet.gl import (  # type: ignore[import]
+    GL_ARRAY_BUFFER,
+    GL_FALSE,
+    GL_FLOAT,
+    GL_STATIC_DRAW,
+    GL_STREAM_DRAW,
+    GL_TRIANGLES,
+    GLfloat,
+    GLuint,
+    glBindBuffer,
+    glBindVertexArray,
+    glBufferData,
+    glDrawArraysInstanced,
+    glEnableVertexAttribArray,
+    glGenBuffers,
+    glGenVertexArrays,
+    glVertexAttribDivisor,
+    glVertexAttribPointer,
+)
+from pyglet.graphics.shader import Shader, ShaderProgram  # type: ignore[import]
+
+from token_world.drawable.base import DrawCallable
+from token_world.drawable.physical import PhysicalEntityHandler
+from token_world.entity import Entity, EntityId
+from token_world.snapshot import PositionSnapshot
+
+# Corners of the triangle glyph relative to the entity position, as drawn by PhysicalEntityHandler
+GLYPH = (0.0, 0.0, 10.0, 0.0, 5.0, 10.0)
+
+_VERTEX_SOURCE = """#version 330 core
+layout(location = 0) in vec2 corner;
+layout(location = 1) in vec2 translation;
+
+uniform WindowBlock
+{
+    mat4 projection;
+    mat4 view;
+} window;
+
+void main()
+{
+    gl_Position = window.projection * window.view * vec4(corner + translation, 0.0, 1.0);
+}
+"""
+
+_FRAGMENT_SOURCE = """#version 330 core
+uniform vec4 color;
+out vec4 final_color;
+
+void main()
+{
+    final_color = color;
+}
+"""
+
+
+class GlyphBuffer:
+    """Dense float32 array of glyph positions, one row per entity."""
+
+    def __init__(self, capacity: int = 1024):
+        self._positions = np.zeros((max(capacity, 1), 2), dtype=np.float32)
+        self._ids: List[EntityId] = []
+        self._rows: Dict[EntityId, int] = {}
+        self.dirty = False
+        self._layout_version = 0
+        # Snapshot layout and own layout version the cached gather indices and missing ids are for
+        self._gather: Optional[Tuple[object, int, np.ndarray, List[EntityId]]] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, entity_id: object) -> bool:
+        return entity_id in self._rows
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self._positions[: len(self._ids)]
+
+    def add(self, entity_id: EntityId, x: float, y: float):
+        if entity_id in self._rows:
+            raise ValueError(f"Entity with id {entity_id} already has a glyph")
+        row = len(self._ids)
+        if row == len(self._positions):
+            self._positions = np.concatenate([self._positions, np.zeros_like(self._positions)])
+        self._positions[row] = (x, y)
+        self._ids.append(entity_id)
+        self._rows[entity_id] = row
+        self._layout_version += 1
+        self.dirty = True
+
+    def set(self, entity_id: EntityId, x: float, y: float):
+        self._positions[self._rows[entity_id]] = (x, y)
+        self.dirty = True
+
+    def remove(self, entity_id: EntityId):
+        row = self._rows.pop(entity_id)
+        last = len(self._ids) - 1
+        if row != last:
+            # Move the last glyph into the freed row to keep the array dense
+            self._positions[row] = self._positions[last]
+            self._ids[row] = self._ids[last]
+            self._rows[self._ids[row]] = row
+        self._ids.pop()
+        self._layout_version += 1
+        self.dirty = True
+
+    def copy_from(self, snapshot: PositionSnapshot) -> List[EntityId]:
+        """Gathers the glyph positions from a snapshot, returns the ids the snapshot lacks."""
+        gather = self._gather
+        if (
+            gather is None
+            or snapshot.layout is None
+            or gather[0] is not snapshot.layout
+            or gather[1] != self._layout_version
+        ):
+            rows = snapshot.rows
+            index = np.array([rows.get(entity_id, -1) for entity_id in self._ids], dtype=np.intp)
+            missing = [entity_id for entity_id, row in zip(self._ids, index) if row < 0]
+            gather = self._gather = (snapshot.layout, self._layout_version, index, missing)
+        _, _, index, missing = gather
+        positions = self._positions[: len(self._ids)]
+        if missing:
+            found = index >= 0
+            positions[found] = snapshot.positions[index[found], :2]
+        else:
+            positions[:] = snapshot.positions[index, :2]
+        self.dirty = True
+        return missing
+
+
+class VectorizedPhysicalEntityHandler(PhysicalEntityHandler):
+    """Renderer mode of PhysicalEntityHandler drawing every glyph with one instanced draw call.
+
+    Draw callbacks only copy positions into a GlyphBuffer. draw() uploads the whole buffer in
+    a single call when it changed and lets the vertex shader place the glyph at each position.
+    """
+
+    class Callback:
+        def __init__(self, entity: Entity, glyphs: GlyphBuffer):
+            self.entity = entity
+            self.glyphs = glyphs
+            props = entity.properties
+            glyphs.add(entity.id, props["x"], props["y"])
+
+        def __call__(self):
+            props = self.entity.snapshot()
+            self.glyphs.set(self.entity.id, props["x"], props["y"])
+
+    def __init__(self, color: Tuple[float, float, float, float] = (1.0, 0.0, 0.0, 1.0)):
+        super().__init__()
+        self.color = color
+        self.glyphs = GlyphBuffer()
+        self._program: Optional[ShaderProgram] = None
+        self._vao = GLuint()
+        self._positions_buffer = GLuint()
+
+    def new_draw_callback(self, entity: Entity) -> DrawCallable:
+        callback = self._callbacks[entity.id] = self.Callback(entity, self.glyphs)
+        return callback
+
+    def release_draw_callback(self, callback: DrawCallable):
+        assert isinstance(callback, self.Callback)
+        del self._callbacks[callback.entity.id]
+        self.glyphs.remove(callback.entity.id)
+
+    def apply_snapshot(self, snapshot: PositionSnapshot) -> bool:
+        for entity_id in self.glyphs.copy_from(snapshot):
+            self._callbacks[entity_id]()
+        return True
+
+    def _create_program(self):
+        self._program = ShaderProgram(
+            Shader(_VERTEX_SOURCE, "vertex"), Shader(_FRAGMENT_SOURCE, "fragment")
+        )
+        glGenVertexArrays(1, byref(self._vao))
+        glBindVertexArray(self._vao)
+        corners = (GLfloat * len(GLYPH))(*GLYPH)
+        corners_buffer = GLuint()
+        glGenBuffers(1, byref(corners_buffer))
+        glBindBuffer(GL_ARRAY_BUFFER, corners_buffer)
+        glBufferData(GL_ARRAY_BUFFER, sizeof(corners), corners, GL_STATIC_DRAW)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 2, GL_FLOAT, GL_FALSE, 0, 0)
+        glGenBuffers(1, byref(self._positions_buffer))
+        glBindBuffer(GL_ARRAY_BUFFER, self._positions_buffer)
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE, 0, 0)
+        # One translation per glyph instance rather than per vertex
+        glVertexAttribDivisor(1, 1)
+        glBindVertexArray(0)
+        self.glyphs.dirty = True
+
+    def draw(self):
+        count = len(self.glyphs)
+        if count == 0:
+            return
+        if self._program is None:
+            self._create_program()
+        assert self._program is not None
+        self._program.use()
+        self._program["color"] = self.color
+        glBindVertexArray(self._vao)
+        if self.glyphs.dirty:
+            positions = self.glyphs.positions
+            glBindBuffer(GL_ARRAY_BUFFER, self._positions_buffer)
+            glBufferData(GL_ARRAY_BUFFER, positions.nbytes, positions.ctypes.data, GL_STREAM_DRAW)
+            self.glyphs.dirty = False
+        glDrawArraysInstanced(GL_TRIANGLES, 0, len(GLYPH) // 2, count)
+        glBindVertexArray(0)
+        self._program.stop()
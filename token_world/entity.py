@@ -1,19 +1,137 @@
-from dataclasses import dataclass
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 import json
 import logging
+from math import isfinite
+import operator
 from pathlib import Path
-from typing import Any, Dict, Optional
+import re
+import threading
+from types import MappingProxyType
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+    ValuesView,
+)
 import uuid
 import sqlite3
 
+from token_world.codec import EncodedProperties, JsonCodec, PropertyCodec, codec_for
+from token_world.events import EntityEvent, EntityEventBus, EntityEventKind
+from token_world.spatial import Position, SpatialGrid
+
+if TYPE_CHECKING:
+    import numpy as np  # pragma: no cover
+
+    from token_world.columnar import ColumnStore  # pragma: no cover
+
 EntityId = str
+PropertyListener = Callable[[str], None]
 
 
-@dataclass
+class EntityProperties(Dict[str, Any]):
+    """A property dict that reports the key of every top-level mutation.
+
+    before_change is called before a key is modified and listener right after.
+    """
+
+    __slots__ = ("listener", "before_change")
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.listener: Optional[PropertyListener] = None
+        self.before_change: Optional[PropertyListener] = None
+
+    def _changing(self, key: str):
+        if self.before_change is not None:
+            self.before_change(key)
+
+    def _changed(self, key: str):
+        if self.listener is not None:
+            self.listener(key)
+
+    def __setitem__(self, key: str, value: Any):
+        self._changing(key)
+        super().__setitem__(key, value)
+        self._changed(key)
+
+    def __delitem__(self, key: str):
+        self._changing(key)
+        super().__delitem__(key)
+        self._changed(key)
+
+    def __ior__(self, other):  # type: ignore[misc]
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key not in self:
+            return super().pop(key, *default)
+        self._changing(key)
+        value = super().pop(key)
+        self._changed(key)
+        return value
+
+    def popitem(self):
+        if self:
+            self._changing(next(reversed(self)))
+        key, value = super().popitem()
+        self._changed(key)
+        return key, value
+
+    def clear(self):
+        keys = list(self)
+        for key in keys:
+            self._changing(key)
+        super().clear()
+        for key in keys:
+            self._changed(key)
+
+
+class LazySnapshot:
+    """Committed properties that are looked up when read, see ColumnStore."""
+
+    __slots__ = ()
+
+    def resolve(self) -> Mapping[str, Any]:
+        raise NotImplementedError
+
+
+@dataclass(slots=True)
 class Entity:
     id: EntityId
     name: str
     properties: Dict[str, Any]
+    # Copy of the properties as of the last committed transaction, shared with readers
+    committed: Optional[Union[Mapping[str, Any], LazySnapshot]] = field(
+        default=None, compare=False, repr=False
+    )
+
+    def __post_init__(self):
+        if not isinstance(self.properties, EntityProperties):
+            self.properties = EntityProperties(self.properties)
 
     @staticmethod
     def new(name: str, id: Optional[str] = None, **kwargs):
@@ -22,8 +140,16 @@ class Entity:
     def properties_json(self) -> str:
         return json.dumps(self.properties)
 
+    def snapshot(self) -> Mapping[str, Any]:
+        committed = self.committed
+        if committed is None:
+            return self.properties
+        if isinstance(committed, LazySnapshot):
+            return committed.resolve()
+        return committed
+
 
-EntityDict = Dict[EntityId, Entity]
+EntityDict = MutableMapping[EntityId, Entity]
 
 
 def physical_entity(
@@ -32,14 +158,369 @@ def physical_entity(
     return Entity.new(name, id, is_physical=True, x=x, y=y, z=z, **kwargs)
 
 
+SPATIAL_KEYS = frozenset(("is_physical", "x", "y", "z"))
+
+
+def entity_position(entity: Entity) -> Optional[Position]:
+    props = entity.properties
+    if not props.get("is_physical", False):
+        return None
+    position = props.get("x", 0.0), props.get("y", 0.0), props.get("z", 0.0)
+    # A NaN or infinite coordinate places the entity nowhere, like a non-physical one
+    return position if all(isfinite(axis) for axis in position) else None
+
+
+def _freeze(properties: Mapping[str, Any]) -> Mapping[str, Any]:
+    return MappingProxyType(dict(properties.items()))
+
+
+def _json_path(key: str) -> str:
+    return f'$."{key}"'
+
+
+def _use_field_update(entity: Entity, keys: Set[str]) -> bool:
+    # Rewriting the whole row is cheaper once most of the property bag changed
+    if any('"' in key for key in keys):
+        return False
+    return len(keys) * 2 <= len(entity.properties)
+
+
+def _may_be_non_finite(data: EncodedProperties) -> bool:
+    # SQLite's JSON functions reject the NaN and Infinity tokens json.dumps writes, a key merely
+    # containing them only costs a whole-row write
+    return isinstance(data, str) and ("NaN" in data or "Infinity" in data)
+
+
+def _field_update_sql(set_count: int, removed_count: int, columns: Tuple[str, ...]) -> str:
+    expression = "properties"
+    if set_count:
+        expression = f"json_set({expression}{', ?, json(?)' * set_count})"
+    if removed_count:
+        expression = f"json_remove({expression}{', ?' * removed_count})"
+    assignments = "".join(f", {column} = ?" for column in columns)
+    return f"UPDATE entities SET properties = {expression}{assignments} WHERE id = ?"
+
+
+DEFAULT_PRAGMAS: Dict[str, Union[int, str]] = {
+    # WAL lets checkpoints be written from a background thread while others read
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -16000,
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+DEFAULT_INDEXED_PROPERTIES: Dict[str, str] = {
+    "is_person": "INTEGER",
+    "is_physical": "INTEGER",
+}
+# Coordinates of physical entities are stored once, in entity_positions, where find() reads them
+POSITION_KEYS = ("x", "y", "z")
+_COLUMN_TYPES = {"INTEGER", "REAL", "TEXT"}
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+Predicate = Tuple[str, str, Any]
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def _property_column(key: str) -> str:
+    return f"prop_{key}"
+
+
+def _predicate_column(key: str) -> str:
+    return f"positions.{key}" if key in POSITION_KEYS else _property_column(key)
+
+
+def _column_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return json.dumps(value)
+
+
+def _matches(entity: Entity, predicates: Tuple[Predicate, ...]) -> bool:
+    for key, op, value in predicates:
+        if key in POSITION_KEYS:
+            position = entity_position(entity)
+            actual = None if position is None else position[POSITION_KEYS.index(key)]
+        else:
+            actual = _column_value(entity.properties.get(key))
+        # Mirror SQL semantics where any comparison with NULL is false
+        if actual is None or value is None:
+            return False
+        try:
+            if not _OPERATORS[op](actual, value):
+                return False
+        except TypeError:
+            return False
+    return True
+
+
+HistoryRow = Tuple[int, EntityId, Optional[str], Optional[EncodedProperties]]
+
+
+@dataclass
+class _WriteBatch:
+    indexed: List[str]
+    rows: List[Tuple[Any, ...]] = field(default_factory=list)
+    field_updates: Dict[Tuple[int, int, Tuple[str, ...]], List[List[Any]]] = field(
+        default_factory=dict
+    )
+    positions: List[Tuple[EntityId, float, float, float]] = field(default_factory=list)
+    removed_positions: List[Tuple[EntityId]] = field(default_factory=list)
+    removed: List[Tuple[EntityId]] = field(default_factory=list)
+    versions: List[Tuple[int, bool]] = field(default_factory=list)
+    # Rows without a name and properties record a removal
+    history: List[HistoryRow] = field(default_factory=list)
+
+
+class _LazyValues(ValuesView[Entity]):
+    _mapping: "LazyEntityDict"
+
+    def __iter__(self) -> Iterator[Entity]:
+        return self._mapping.iter_values()
+
+
+class LazyEntityDict(MutableMapping[EntityId, Entity]):
+    """Entities hydrated from the database on demand and kept in a bounded LRU cache.
+
+    Evicted entities are written back if dirty and detached, so references to them must not be
+    mutated afterwards; pin entities that are held on to. Pinned entities are never evicted, when
+    they fill the cache it holds the most recently used entity beyond its capacity.
+    """
+
+    def __init__(self, manager: "EntityManager", capacity: int, page_size: int = 1000):
+        if capacity <= 0:
+            raise ValueError(f"Cache capacity must be positive, got {capacity}")
+        self._manager = manager
+        self.capacity = capacity
+        self.page_size = page_size
+        self._cache: OrderedDict[EntityId, Entity] = OrderedDict()
+        self._pinned: Set[EntityId] = set()
+        # Entities added since the last save that have no row in the database yet
+        self._new: Set[EntityId] = set()
+        self._lock = threading.RLock()
+
+    @property
+    def cached_count(self) -> int:
+        return len(self._cache)
+
+    def pin(self, entity_id: EntityId):
+        with self._lock:
+            self._pinned.add(entity_id)
+
+    def unpin(self, entity_id: EntityId):
+        with self._lock:
+            self._pinned.discard(entity_id)
+            self._evict()
+
+    def persisted(self, entity_ids: Iterable[EntityId]):
+        with self._lock:
+            self._new.difference_update(entity_ids)
+
+    def peek(self, entity_id: EntityId) -> Entity:
+        # Lock free so it can be used while the manager holds its dirty lock
+        return self._cache[entity_id]
+
+    def __getitem__(self, entity_id: EntityId) -> Entity:
+        with self._lock:
+            entity = self._cache.get(entity_id)
+            if entity is not None:
+                self._cache.move_to_end(entity_id)
+                return entity
+            entity = self._manager._fetch(entity_id)
+            if entity is None:
+                raise KeyError(entity_id)
+            self._insert(entity)
+            return entity
+
+    def __setitem__(self, entity_id: EntityId, entity: Entity):
+        with self._lock:
+            if entity_id not in self._cache and not self._manager._exists(entity_id):
+                self._new.add(entity_id)
+            self._insert(entity)
+
+    def __delitem__(self, entity_id: EntityId):
+        # Only drops the entity from memory, EntityManager.remove_entity() deletes its row
+        with self._lock:
+            if entity_id not in self._cache:
+                raise KeyError(entity_id)
+            del self._cache[entity_id]
+            self._pinned.discard(entity_id)
+            self._new.discard(entity_id)
+
+    def is_new(self, entity_id: EntityId) -> bool:
+        return entity_id in self._new
+
+    def __contains__(self, entity_id: object) -> bool:
+        return entity_id in self._cache or self._manager._exists(entity_id)
+
+    def __len__(self) -> int:
+        return self._manager._count() + len(self._new)
+
+    def __iter__(self) -> Iterator[EntityId]:
+        with self._lock:
+            cached = list(self._cache)
+        yield from cached
+        seen = set(cached)
+        for rows in self._manager._pages(self.page_size, ids_only=True):
+            yield from (entity_id for entity_id, *_ in rows if entity_id not in seen)
+
+    def values(self) -> ValuesView[Entity]:
+        return _LazyValues(self)
+
+    def iter_values(self) -> Iterator[Entity]:
+        with self._lock:
+            new = [self._cache[entity_id] for entity_id in self._new if entity_id in self._cache]
+        yield from new
+        seen = {entity.id for entity in new}
+        for rows in self._manager._pages(self.page_size):
+            for entity_id, name, data in rows:
+                if entity_id in seen:
+                    continue
+                with self._lock:
+                    entity = self._cache.get(entity_id)
+                    if entity is None:
+                        entity = self._manager._hydrate(entity_id, name, data)
+                        self._insert(entity)
+                yield entity
+
+    def rows(self) -> Iterator[Tuple[EntityId, str, EncodedProperties]]:
+        """Yields the current id, name and encoded properties of every entity without caching."""
+        encode = self._manager.codec.encode
+        with self._lock:
+            new = [self._cache[entity_id] for entity_id in self._new if entity_id in self._cache]
+        for entity in new:
+            yield entity.id, entity.name, encode(entity.properties)
+        seen = {entity.id for entity in new}
+        for rows in self._manager._pages(self.page_size):
+            for entity_id, name, data in rows:
+                if entity_id in seen:
+                    continue
+                with self._lock:
+                    resident = self._cache.get(entity_id)
+                    # Resident entities may have changes that are not saved yet
+                    if resident is not None:
+                        name, data = resident.name, encode(resident.properties)
+                yield entity_id, name, data
+
+    def _insert(self, entity: Entity):
+        self._cache[entity.id] = entity
+        self._cache.move_to_end(entity.id)
+        # The caller is handed the entity, so it outlives capacity when pins fill the cache
+        self._evict(keep=entity.id)
+
+    def _evict(self, keep: Optional[EntityId] = None):
+        overflow = len(self._cache) - self.capacity
+        if overflow <= 0:
+            return
+        victims: List[EntityId] = []
+        for entity_id in self._cache:
+            if len(victims) == overflow:
+                break
+            if entity_id not in self._pinned and entity_id != keep:
+                victims.append(entity_id)
+        self._manager._write_back(victims)
+        for entity_id in victims:
+            self._manager._release(self._cache.pop(entity_id))
+            self._new.discard(entity_id)
+
+
 class EntityManager:
-    def __init__(self, db_path: Path):
+    def __init__(
+        self,
+        db_path: Path,
+        spatial_cell_size: float = 50.0,
+        cache_size: Optional[int] = None,
+        indexed_properties: Optional[Dict[str, str]] = None,
+        column_store: Optional["ColumnStore"] = None,
+        pragmas: Optional[Dict[str, Union[int, str]]] = None,
+        keyframe_interval: Optional[int] = None,
+        codec: Optional[PropertyCodec] = None,
+    ):
         self.db_path = db_path
-        self.entities: EntityDict = {}
+        # Text rows written by another codec are still read and rewritten with this one on save
+        self.codec = codec or JsonCodec()
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        for name, value in self.pragmas.items():
+            if not _IDENTIFIER.match(name) or not (
+                isinstance(value, int) or _IDENTIFIER.match(str(value))
+            ):
+                raise ValueError(f"Invalid pragma {name}={value!r}")
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self.indexed_properties = {**DEFAULT_INDEXED_PROPERTIES, **(indexed_properties or {})}
+        for key, column_type in self.indexed_properties.items():
+            if not _IDENTIFIER.match(key):
+                raise ValueError(f"Indexed property {key!r} is not a valid identifier")
+            if key in POSITION_KEYS:
+                raise ValueError(f"Indexed property {key!r} is already indexed by entity_positions")
+            if column_type not in _COLUMN_TYPES:
+                raise ValueError(f"Indexed property {key!r} has unsupported type {column_type}")
+        self._cache = None if cache_size is None else LazyEntityDict(self, cache_size)
+        self.entities: EntityDict = {} if self._cache is None else self._cache
+        self.spatial_index = SpatialGrid[EntityId](spatial_cell_size)
+        self.column_store = column_store
+        if column_store is not None:
+            column_store.before_change = self._columns_changing
+            column_store.listener = self._columns_changed
+        if keyframe_interval is not None and keyframe_interval <= 0:
+            raise ValueError(f"Keyframe interval must be positive, got {keyframe_interval}")
+        # History is only recorded when a keyframe interval is given
+        self.keyframe_interval = keyframe_interval
+        self.version = 0
+        self._last_keyframe = 0
+        self._history_changed: Set[EntityId] = set()
+        self._pending_versions: List[Tuple[int, bool]] = []
+        self._pending_history: List[HistoryRow] = []
+        # Removed entities whose rows are deleted by the next save()
+        self._removed: Set[EntityId] = set()
+        # Entities whose stored row may hold non-finite floats, only ever rewritten whole
+        self._non_finite_rows: Set[EntityId] = set()
+        # None marks an entity whose whole row must be written, otherwise the set of changed keys
+        self._dirty: Dict[EntityId, Optional[Set[str]]] = {}
+        self._dirty_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        # Held from preparing a batch until it is committed, so batches reach the database in
+        # the order they were prepared and an older batch never overwrites a newer one
+        self._flush_lock = threading.Lock()
+        self._transaction_local = threading.local()
+        self.events = EntityEventBus()
         self._create_table()
 
+    @property
+    def dirty_count(self) -> int:
+        with self._dirty_lock:
+            self._take_column_changes()
+            return len(self._dirty)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # One long-lived connection per thread keeps its statement cache warm between saves
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name}={value}")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
     def _create_table(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -50,38 +531,845 @@ class EntityManager:
                 )
             """
             )
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entity_positions'"
+            )
+            backfill_positions = cursor.fetchone() is None
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entity_positions (
+                    id TEXT PRIMARY KEY,
+                    x REAL,
+                    y REAL,
+                    z REAL
+                )
+            """
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS entity_positions_xy ON entity_positions (x, y)"
+            )
+            if backfill_positions:
+                cursor.execute(
+                    """
+                    INSERT INTO entity_positions (id, x, y, z)
+                    SELECT id, coalesce(json_extract(properties, '$.x'), 0.0),
+                        coalesce(json_extract(properties, '$.y'), 0.0),
+                        coalesce(json_extract(properties, '$.z'), 0.0)
+                    FROM entities
+                    WHERE typeof(properties) = 'text' AND json_valid(properties)
+                        AND json_extract(properties, '$.is_physical')
+                """
+                )
+                cursor.executemany(
+                    "INSERT INTO entity_positions (id, x, y, z) VALUES (?, ?, ?, ?)",
+                    [
+                        (entity.id, *position)
+                        for entity in self._non_json_rows(cursor)
+                        if (position := entity_position(entity)) is not None
+                    ],
+                )
+            self._create_property_columns(cursor)
+            self._create_history_tables(cursor)
             conn.commit()
 
+    def _create_property_columns(self, cursor: sqlite3.Cursor):
+        cursor.execute("PRAGMA table_info(entities)")
+        existing = {row[1] for row in cursor.fetchall()}
+        for key, column_type in self.indexed_properties.items():
+            column = _property_column(key)
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE entities ADD COLUMN {column} {column_type}")
+                cursor.execute(
+                    f"UPDATE entities SET {column} = json_extract(properties, ?) "
+                    "WHERE typeof(properties) = 'text' AND json_valid(properties)",
+                    (_json_path(key),),
+                )
+                cursor.executemany(
+                    f"UPDATE entities SET {column} = ? WHERE id = ?",
+                    [
+                        (_column_value(entity.properties.get(key)), entity.id)
+                        for entity in self._non_json_rows(cursor)
+                    ],
+                )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS entities_{column} ON entities ({column})")
+        for key in POSITION_KEYS:
+            # Older databases also kept coordinates in property columns, which are no longer written
+            cursor.execute(f"DROP INDEX IF EXISTS entities_{_property_column(key)}")
+
+    def _non_json_rows(self, cursor: sqlite3.Cursor) -> List[Entity]:
+        # JSON1 cannot read binary rows nor the NaN and Infinity tokens json.dumps writes, so
+        # backfills decode those rows here instead
+        cursor.execute(
+            "SELECT id, name, properties FROM entities "
+            "WHERE NOT (typeof(properties) = 'text' AND json_valid(properties))"
+        )
+        return [
+            Entity(entity_id, name, self._decode(data))
+            for entity_id, name, data in cursor.fetchall()
+        ]
+
+    def _create_history_tables(self, cursor: sqlite3.Cursor):
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entity_versions (
+                version INTEGER PRIMARY KEY,
+                keyframe INTEGER NOT NULL
+            )
+        """
+        )
+        # Keyframe versions hold a row for every entity, other versions only the changed ones
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entity_history (
+                version INTEGER,
+                id TEXT,
+                name TEXT,
+                properties TEXT,
+                PRIMARY KEY (version, id)
+            )
+        """
+        )
+        cursor.execute(
+            "SELECT coalesce(max(version), 0), coalesce(max(version) FILTER (WHERE keyframe), 0) "
+            "FROM entity_versions"
+        )
+        self.version, self._last_keyframe = cursor.fetchone()
+
+    def find(self, *predicates: Predicate) -> List[Entity]:
+        """Entities matching every predicate on indexed properties or coordinates.
+
+        Coordinates only match physical entities, with the position the spatial index uses.
+        """
+        for key, op, _ in predicates:
+            if key not in self.indexed_properties and key not in POSITION_KEYS:
+                raise ValueError(f"Property {key!r} is not indexed")
+            if op not in _OPERATORS:
+                raise ValueError(f"Unsupported operator {op!r}")
+        source = "entities"
+        if any(key in POSITION_KEYS for key, _, _ in predicates):
+            source += " JOIN entity_positions AS positions ON positions.id = entities.id"
+        where = " AND ".join(f"{_predicate_column(key)} {op} ?" for key, op, _ in predicates)
+        with self._connection() as conn:
+            rows = conn.execute(
+                f"SELECT entities.id FROM {source} WHERE {where or 1}",
+                [_column_value(value) for _, _, value in predicates],
+            ).fetchall()
+        # Rows of dirty entities may be stale, those are matched against their in-memory state
+        with self._dirty_lock:
+            self._take_column_changes()
+            dirty = set(self._dirty)
+        ids = [
+            entity_id
+            for entity_id, in rows
+            if entity_id not in dirty and entity_id not in self._removed
+        ]
+        ids += [entity_id for entity_id in dirty if _matches(self.entities[entity_id], predicates)]
+        return [self.entities[entity_id] for entity_id in ids]
+
+    def _track(self, entity: Entity):
+        if self.column_store is not None and self.column_store.accepts(entity):
+            self.column_store.bind(entity)
+        assert isinstance(entity.properties, EntityProperties)
+
+        def before_change(key: str, entity: Entity = entity):
+            changed = getattr(self._transaction_local, "changed", None)
+            if changed is not None and entity.id not in changed:
+                changed[entity.id] = entity
+                if entity.committed is None:
+                    # Copy on first write so readers keep seeing the state before the transaction
+                    entity.committed = _freeze(entity.properties)
+
+        def on_change(key: str, entity: Entity = entity):
+            changed = getattr(self._transaction_local, "changed", None)
+            if changed is None and entity.committed is not None:
+                # Written outside a transaction, readers fall back to the live properties
+                entity.committed = None
+            if self.column_store is not None:
+                # Neither the frames nor the spatial index follow writes made one by one
+                self.column_store._unpublish(entity.id)
+            self._mark_dirty(entity.id, key)
+            if key in SPATIAL_KEYS:
+                self._index_position(entity)
+            self._publish(EntityEvent(EntityEventKind.UPDATED, entity.id, key))
+
+        entity.properties.before_change = before_change
+        entity.properties.listener = on_change
+        self._index_position(entity)
+
+    def _columns_changing(self, key: str, rows: "np.ndarray"):
+        changed = getattr(self._transaction_local, "changed", None)
+        if changed is None:
+            return
+        store = self.column_store
+        assert store is not None
+        # Published rows keep reading the last frame until the transaction publishes a new one,
+        # the others are copied on first write like entities changed one by one
+        ids = store.ids
+        for row in rows[~store._published[rows]].tolist():
+            entity = self._resident(ids[row])
+            if entity.committed is None:
+                entity.committed = _freeze(entity.properties)
+
+    def _columns_changed(self, key: str, rows: "np.ndarray"):
+        # The bulk counterpart of the on_change listener of _track(). Rows are only flagged, the
+        # dirty entities, snapshots and spatial index catch up in bulk.
+        store = self.column_store
+        assert store is not None
+        with self._write_lock:
+            with self._dirty_lock:
+                store._flag_committed(key, rows)
+            in_transaction = getattr(self._transaction_local, "changed", None) is not None
+            if not in_transaction:
+                self._publish_columns()
+            if not self.events:
+                return
+            ids = list(map(store.ids.__getitem__, rows.tolist()))
+            updates = getattr(self._transaction_local, "updates", None)
+            if updates is None:
+                self.events.publish_many(EntityEventKind.UPDATED, ids, key)
+            else:
+                updates.setdefault(key, {}).update(dict.fromkeys(ids))
+
+    def _publish_columns(self):
+        """Publishes the committed columns to snapshot readers and the spatial index in bulk."""
+        store = self.column_store
+        assert store is not None
+        publication = store._publish(self.spatial_index.cell_size)
+        for entity_id, committed in publication.fresh:
+            self._resident(entity_id).committed = committed
+        for entity_id in publication.reindexed:
+            self._index_position(self._resident(entity_id))
+        if publication.keys:
+            # Only entities in the grid are physical, the others stay out of it
+            self.spatial_index.move_many(
+                publication.keys, publication.positions, publication.left_cell
+            )
+
+    def _release(self, entity: Entity):
+        store = self.column_store
+        if store is not None and entity.id in store:
+            with self._dirty_lock:
+                self._take_column_changes([store.row(entity.id)])
+            if isinstance(entity.committed, LazySnapshot):
+                # Its row leaves the frames, keep the values it had in the last one
+                entity.committed = entity.committed.resolve()
+            store.unbind(entity)
+        assert isinstance(entity.properties, EntityProperties)
+        entity.properties.listener = None
+        entity.properties.before_change = None
+
+    def _index_position(self, entity: Entity):
+        position = entity_position(entity)
+        if position is None:
+            self.spatial_index.remove(entity.id)
+        else:
+            self.spatial_index.insert(entity.id, position)
+
+    def entities_within(self, center: Position, radius: float) -> List[Entity]:
+        return [self.entities[entity_id] for entity_id in self.spatial_index.within(center, radius)]
+
+    def nearest_entities(self, center: Position, k: int) -> List[Entity]:
+        return [self.entities[entity_id] for entity_id in self.spatial_index.nearest(center, k)]
+
+    def _take_column_changes(self, rows: Optional[List[int]] = None):
+        # Bulk column writes only flag their rows, those join the dirty entities once read.
+        # Called holding the dirty lock.
+        if self.column_store is None:
+            return
+        history = self.keyframe_interval is not None
+        for entity_id, keys in self.column_store._take_unsaved(rows):
+            if history:
+                self._history_changed.add(entity_id)
+            if entity_id not in self._dirty:
+                self._dirty[entity_id] = set(keys)
+                continue
+            dirty_keys = self._dirty[entity_id]
+            if dirty_keys is not None:
+                dirty_keys.update(keys)
+
+    def _mark_dirty(self, entity_id: EntityId, key: Optional[str] = None):
+        with self._dirty_lock:
+            if self.keyframe_interval is not None:
+                self._history_changed.add(entity_id)
+            if entity_id not in self._dirty:
+                self._dirty[entity_id] = None if key is None else {key}
+                return
+            keys = self._dirty[entity_id]
+            if keys is None:
+                return
+            if key is None:
+                self._dirty[entity_id] = None
+            else:
+                keys.add(key)
+
     def add_entity(self, entity):
-        if entity.id in self.entities:
-            raise ValueError(f"Entity with id {entity.id} already managed")
-        self.entities[entity.id] = entity
+        with self._write_lock:
+            if entity.id in self.entities:
+                raise ValueError(f"Entity with id {entity.id} already managed")
+            self.entities[entity.id] = entity
+            self._track(entity)
+            with self._dirty_lock:
+                self._removed.discard(entity.id)
+            self._mark_dirty(entity.id)
+            self._publish(EntityEvent(EntityEventKind.ADDED, entity.id))
 
-    def save(self):
-        with sqlite3.connect(self.db_path) as conn:
+    def remove_entity(self, entity_id: EntityId) -> Entity:
+        """Stops managing an entity and returns it detached; its row is deleted by save()."""
+        with self._write_lock:
+            entity = self.entities[entity_id]
+            persisted = self._cache is None or not self._cache.is_new(entity_id)
+            del self.entities[entity_id]
+            self._release(entity)
+            self.spatial_index.remove(entity_id)
+            with self._dirty_lock:
+                self._dirty.pop(entity_id, None)
+                if persisted:
+                    self._removed.add(entity_id)
+                if self.keyframe_interval is not None:
+                    self._history_changed.add(entity_id)
+            self._publish(EntityEvent(EntityEventKind.REMOVED, entity_id))
+        return entity
+
+    def _publish(self, event: EntityEvent):
+        if not self.events:
+            return
+        pending = getattr(self._transaction_local, "events", None)
+        if pending is None:
+            self.events.publish(event)
+        else:
+            # Events of a transaction are coalesced and delivered once its snapshots are published
+            pending.setdefault(event, None)
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Groups one tick of mutations made by this thread.
+
+        Transactions of different threads and save() never interleave, and readers using
+        Entity.snapshot() see each changed entity switch atomically to its state at the end of
+        the outermost transaction. Entity events are delivered after that switch. Mutations are
+        not rolled back if the block raises.
+        """
+        with self._write_lock:
+            outermost = getattr(self._transaction_local, "changed", None) is None
+            if outermost:
+                self._transaction_local.changed = {}
+                self._transaction_local.events = {}
+                # Ids of bulk column writes per key, delivered after the other events
+                self._transaction_local.updates = {}
+            try:
+                yield
+            finally:
+                if outermost:
+                    changed = self._transaction_local.changed
+                    events = self._transaction_local.events
+                    updates = self._transaction_local.updates
+                    self._transaction_local.changed = None
+                    self._transaction_local.events = None
+                    self._transaction_local.updates = None
+                    for entity in changed.values():
+                        entity.committed = _freeze(entity.properties)
+                    if self.column_store is not None:
+                        self._publish_columns()
+                    for event in events:
+                        self.events.publish(event)
+                    for key, ids in updates.items():
+                        self.events.publish_many(EntityEventKind.UPDATED, ids, key)
+
+    def pin(self, entity_id: EntityId):
+        if self._cache is not None:
+            self._cache.pin(entity_id)
+
+    def unpin(self, entity_id: EntityId):
+        if self._cache is not None:
+            self._cache.unpin(entity_id)
+
+    def mark_dirty(self, entity_id: EntityId):
+        if entity_id not in self.entities:
+            raise KeyError(f"Entity with id {entity_id} not managed")
+        self._mark_dirty(entity_id)
+
+    def record_version(self) -> int:
+        """Records the current state as a new version and returns its number.
+
+        Every keyframe_interval versions the whole world is stored, in between only the entities
+        changed since the previous version. The history is written by the next save().
+        """
+        if self.keyframe_interval is None:
+            raise RuntimeError("History is disabled, pass a keyframe_interval to record versions")
+        with self._write_lock:
+            with self._dirty_lock:
+                self._take_column_changes()
+                changed, self._history_changed = self._history_changed, set()
+            version = self.version + 1
+            keyframe = self._last_keyframe == 0 or (
+                version - self._last_keyframe >= self.keyframe_interval
+            )
+            if keyframe:
+                rows: Iterable[Tuple[EntityId, Optional[str], Optional[EncodedProperties]]] = (
+                    self._cache.rows()
+                    if self._cache is not None
+                    else (
+                        (entity.id, entity.name, self.codec.encode(entity.properties))
+                        for entity in self.entities.values()
+                    )
+                )
+            else:
+                rows = [self._history_row(entity_id) for entity_id in changed]
+            history = [(version, *row) for row in rows]
+            with self._dirty_lock:
+                self._pending_versions.append((version, keyframe))
+                self._pending_history += history
+            self.version = version
+            if keyframe:
+                self._last_keyframe = version
+        return version
+
+    def _history_row(
+        self, entity_id: EntityId
+    ) -> Tuple[EntityId, Optional[str], Optional[EncodedProperties]]:
+        try:
+            entity = self.entities[entity_id]
+        except KeyError:
+            return entity_id, None, None
+        return entity.id, entity.name, self.codec.encode(entity.properties)
+
+    def scan(self, any_of: Optional[Collection[str]] = None) -> Iterator[Entity]:
+        """Yields every entity, read only when loading lazily.
+
+        Entities that are not resident are decoded into detached copies rather than cached, so a
+        pass over a lazily loaded world neither evicts nor pins entities. Given indexed properties
+        in any_of, only the rows where one of their columns may be truthy are read and decoded.
+        """
+        if any_of is not None:
+            yield from self._scan_any_of(list(any_of))
+            return
+        if self._cache is None:
+            yield from list(self.entities.values())
+            return
+        for entity_id, name, data in self._cache.rows():
+            yield Entity(entity_id, name, self._decode(data))
+
+    def _scan_any_of(self, keys: List[str]) -> Iterator[Entity]:
+        for key in keys:
+            if key not in self.indexed_properties:
+                raise ValueError(f"Property {key!r} is not indexed")
+        # SQLite orders NULL first, then numbers, text and blobs. Each range searches the column's
+        # index where an OR of them would scan the table. Together they hold every truthy value
+        # and a few falsy ones like "[]", which the caller rules out reading the properties.
+        # TEXT columns store numbers as text and compare 0 as "0", text ranges cover them.
+        ranges = {
+            key: (
+                ("{0} > ''",)
+                if self.indexed_properties[key] == "TEXT"
+                else ("{0} > 0 AND {0} < ''", "{0} < 0", "{0} > ''")
+            )
+            for key in keys
+        }
+        with self._connection() as conn:
+            ids = {
+                entity_id
+                for key in keys
+                for condition in ranges[key]
+                for entity_id, in conn.execute(
+                    "SELECT id FROM entities WHERE " + condition.format(_property_column(key))
+                )
+            }
+        # Rows of dirty entities may be stale, those are matched against their in-memory state
+        with self._dirty_lock:
+            self._take_column_changes()
+            dirty = set(self._dirty)
+        for entity_id in dirty:
+            entity = self._resident(entity_id)
+            if any(entity.properties.get(key) for key in keys):
+                yield entity if self._cache is None else self._detached(entity)
+        matched = sorted(ids - dirty - self._removed)
+        if self._cache is None:
+            yield from (self.entities[entity_id] for entity_id in matched)
+            return
+        page_size = self._cache.page_size
+        for start in range(0, len(matched), page_size):
+            end = start + page_size
+            page = matched[start:end]
+            with self._connection() as conn:
+                rows = conn.execute(
+                    "SELECT id, name, properties FROM entities "
+                    f"WHERE id IN ({', '.join('?' * len(page))})",
+                    page,
+                ).fetchall()
+            for entity_id, name, data in rows:
+                yield Entity(entity_id, name, self._decode(data))
+
+    def _detached(self, entity: Entity) -> Entity:
+        return Entity(entity.id, entity.name, self._decode(self.codec.encode(entity.properties)))
+
+    def entities_at(self, version: int) -> Dict[EntityId, Entity]:
+        """Rebuilds the entities as they were at a recorded version from its keyframe and deltas.
+
+        The returned entities are detached from the manager.
+        """
+        self.save()
+        with self._connection() as conn:
             cursor = conn.cursor()
-            cursor.executemany(
+            cursor.execute(
+                "SELECT max(version) FILTER (WHERE keyframe), "
+                "count(*) FILTER (WHERE version = ?) FROM entity_versions WHERE version <= ?",
+                (version, version),
+            )
+            keyframe, exists = cursor.fetchone()
+            if not exists:
+                raise KeyError(f"Version {version} not recorded")
+            # SQLite takes the bare columns from the row holding the maximum version of each id
+            cursor.execute(
                 """
-                INSERT OR REPLACE INTO entities (id, name, properties) VALUES (?, ?, ?)
+                SELECT id, name, properties, max(version) FROM entity_history
+                WHERE version BETWEEN ? AND ? GROUP BY id
                 """,
-                [
-                    (entity.id, entity.name, entity.properties_json())
-                    for entity in self.entities.values()
-                ],
+                (keyframe, version),
             )
-            inserted_count = cursor.rowcount
-            logging.info(f"Inserted {inserted_count} out of {len(self.entities)} entities")
-            conn.commit()
+            return {
+                entity_id: Entity.new(id=entity_id, name=name, **self._decode(data))
+                for entity_id, name, data, _ in cursor.fetchall()
+                if data is not None
+            }
+
+    def checkout(self, version: int, db_path: Path):
+        """Writes a new database at db_path holding the world and its history up to version."""
+        entities = self.entities_at(version)
+        branch = EntityManager(
+            db_path,
+            indexed_properties=self.indexed_properties,
+            pragmas=self.pragmas,
+            keyframe_interval=self.keyframe_interval,
+            codec=self.codec,
+        )
+        try:
+            for entity in entities.values():
+                branch.add_entity(entity)
+            branch.save()
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT version, keyframe FROM entity_versions WHERE version <= ?", (version,)
+                )
+                versions = cursor.fetchall()
+                cursor.execute(
+                    "SELECT version, id, name, properties FROM entity_history WHERE version <= ?",
+                    (version,),
+                )
+                history = cursor.fetchall()
+            with branch._connection() as conn:
+                conn.executemany("INSERT INTO entity_versions VALUES (?, ?)", versions)
+                conn.executemany("INSERT INTO entity_history VALUES (?, ?, ?, ?)", history)
+                conn.commit()
+        finally:
+            branch.close()
+
+    def save(self):
+        # Holding the write lock keeps transactions out, so the snapshot contains whole ticks only.
+        # It is taken before the flush lock, which ticks evicting entities take after it.
+        with self._write_lock:
+            self._flush_lock.acquire()
+            try:
+                with self._dirty_lock:
+                    self._take_column_changes()
+                    dirty, self._dirty = self._dirty, {}
+                    removed = [(entity_id,) for entity_id in self._removed]
+                    versions, self._pending_versions = self._pending_versions, []
+                    history, self._pending_history = self._pending_history, []
+                batch = self._prepare_or_restore(dirty, versions, history)
+            except BaseException:
+                self._flush_lock.release()
+                raise
+        batch.removed, batch.versions, batch.history = removed, versions, history
+        try:
+            with self._connection() as conn:
+                row_count, field_count = self._execute_write(conn.cursor(), batch)
+                conn.commit()
+        except Exception:
+            self._restore_dirty(dirty, versions, history)
+            raise
+        finally:
+            self._flush_lock.release()
+        logging.info(
+            f"Saved {row_count} rows and {field_count} fields out of {len(self.entities)} entities"
+        )
+        with self._dirty_lock:
+            # Tombstones stay until the rows are gone so lazy lookups never see removed entities
+            self._removed.difference_update(entity_id for entity_id, in batch.removed)
+        if self._cache is not None:
+            self._cache.persisted(dirty)
+
+    def _prepare_or_restore(
+        self,
+        dirty: Dict[EntityId, Optional[Set[str]]],
+        versions: Optional[List[Tuple[int, bool]]] = None,
+        history: Optional[List[HistoryRow]] = None,
+    ) -> _WriteBatch:
+        # Encoding can fail, e.g. on a value the codec does not support, the taken changes must
+        # then stay pending rather than be lost
+        try:
+            with self._dirty_lock:
+                return self._prepare_write(dirty)
+        except Exception:
+            self._restore_dirty(dirty, versions, history)
+            raise
+
+    def _restore_dirty(
+        self,
+        dirty: Dict[EntityId, Optional[Set[str]]],
+        versions: Optional[List[Tuple[int, bool]]] = None,
+        history: Optional[List[HistoryRow]] = None,
+    ):
+        for entity_id, keys in dirty.items():
+            for key in keys or [None]:
+                self._mark_dirty(entity_id, key)
+        with self._dirty_lock:
+            self._pending_versions[:0] = versions or []
+            self._pending_history[:0] = history or []
+
+    def _write_back(self, entity_ids: List[EntityId]):
+        with self._flush_lock:
+            with self._dirty_lock:
+                self._take_column_changes()
+                dirty = {
+                    entity_id: self._dirty.pop(entity_id)
+                    for entity_id in entity_ids
+                    if entity_id in self._dirty
+                }
+            if not dirty:
+                return
+            batch = self._prepare_or_restore(dirty)
+            try:
+                with self._connection() as conn:
+                    self._execute_write(conn.cursor(), batch)
+                    conn.commit()
+            except Exception:
+                self._restore_dirty(dirty)
+                raise
+        logging.debug(f"Wrote back {len(dirty)} evicted entities")
+
+    def _resident(self, entity_id: EntityId) -> Entity:
+        # Dirty entities are always in memory, look them up without touching the LRU order
+        return self.entities[entity_id] if self._cache is None else self._cache.peek(entity_id)
+
+    def _prepare_write(self, dirty: Dict[EntityId, Optional[Set[str]]]) -> _WriteBatch:
+        indexed = list(self.indexed_properties)
+        batch = _WriteBatch(indexed)
+        for entity_id, keys in dirty.items():
+            entity = self._resident(entity_id)
+            if keys is None or not SPATIAL_KEYS.isdisjoint(keys):
+                position = entity_position(entity)
+                if position is None:
+                    batch.removed_positions.append((entity.id,))
+                else:
+                    batch.positions.append((entity.id, *position))
+            if (
+                keys is None
+                or self.codec.binary
+                or entity_id in self._non_finite_rows
+                or not _use_field_update(entity, keys)
+            ):
+                batch.rows.append(self._row(entity, indexed))
+                continue
+            params: List[Any] = []
+            set_keys = [key for key in keys if key in entity.properties]
+            removed_keys = [key for key in keys if key not in entity.properties]
+            indexed_keys = tuple(sorted(key for key in keys if key in self.indexed_properties))
+            try:
+                for key in set_keys:
+                    params += [_json_path(key), json.dumps(entity.properties[key], allow_nan=False)]
+            except ValueError:
+                batch.rows.append(self._row(entity, indexed))
+                continue
+            params += [_json_path(key) for key in removed_keys]
+            params += [_column_value(entity.properties.get(key)) for key in indexed_keys]
+            params.append(entity.id)
+            shape = (len(set_keys), len(removed_keys), indexed_keys)
+            batch.field_updates.setdefault(shape, []).append(params)
+        return batch
+
+    def _row(self, entity: Entity, indexed: List[str]) -> Tuple[Any, ...]:
+        data = self.codec.encode(entity.properties)
+        if _may_be_non_finite(data):
+            self._non_finite_rows.add(entity.id)
+        else:
+            self._non_finite_rows.discard(entity.id)
+        return (
+            entity.id,
+            entity.name,
+            data,
+            *(_column_value(entity.properties.get(key)) for key in indexed),
+        )
+
+    def _execute_write(self, cursor: sqlite3.Cursor, batch: _WriteBatch) -> Tuple[int, int]:
+        indexed = batch.indexed
+        columns = "".join(f", {_property_column(key)}" for key in indexed)
+        cursor.executemany(
+            f"""
+            INSERT OR REPLACE INTO entities (id, name, properties{columns})
+            VALUES (?, ?, ?{', ?' * len(indexed)})
+            """,
+            batch.rows,
+        )
+        field_count = 0
+        for (set_count, removed_count, indexed_keys), params in batch.field_updates.items():
+            indexed_columns = tuple(_property_column(key) for key in indexed_keys)
+            cursor.executemany(_field_update_sql(set_count, removed_count, indexed_columns), params)
+            field_count += len(params) * (set_count + removed_count)
+        cursor.executemany(
+            "INSERT OR REPLACE INTO entity_positions (id, x, y, z) VALUES (?, ?, ?, ?)",
+            batch.positions,
+        )
+        cursor.executemany("DELETE FROM entity_positions WHERE id = ?", batch.removed_positions)
+        cursor.executemany("DELETE FROM entities WHERE id = ?", batch.removed)
+        cursor.executemany("DELETE FROM entity_positions WHERE id = ?", batch.removed)
+        cursor.executemany("INSERT INTO entity_versions VALUES (?, ?)", batch.versions)
+        cursor.executemany("INSERT INTO entity_history VALUES (?, ?, ?, ?)", batch.history)
+        return len(batch.rows), field_count
+
+    def import_jsonl(self, path: Path, chunk_size: int = 10_000) -> int:
+        """Adds the entities of a JSONL file written by export_jsonl() and returns their count.
+
+        The file is streamed and every chunk is written in its own transaction, so with a bounded
+        entity cache memory use does not depend on the file size. Chunks written before an error
+        stay imported. Imported entities start out clean.
+        """
+        if chunk_size <= 0:
+            raise ValueError(f"Chunk size must be positive, got {chunk_size}")
+        # Unsaved entities must be in the database for duplicate ids to be detected
+        self.save()
+        count = 0
+        with open(path) as f:
+            chunk: List[Entity] = []
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                chunk.append(Entity(record["id"], record["name"], record["properties"]))
+                if len(chunk) == chunk_size:
+                    count += self._import_chunk(chunk)
+                    chunk = []
+            if chunk:
+                count += self._import_chunk(chunk)
+        if self.keyframe_interval is not None:
+            # Imported entities are not tracked as changes, so the next version is a keyframe
+            self._last_keyframe = 0
+        logging.info(f"Imported {count} entities from {path}")
+        return count
+
+    def _import_chunk(self, chunk: List[Entity]) -> int:
+        ids = [entity.id for entity in chunk]
+        seen: Set[EntityId] = set()
+        for entity_id in ids:
+            if entity_id in seen:
+                raise ValueError(f"Entity with id {entity_id} already managed")
+            seen.add(entity_id)
+        indexed = list(self.indexed_properties)
+        batch = _WriteBatch(indexed)
+        for entity in chunk:
+            batch.rows.append(self._row(entity, indexed))
+            position = entity_position(entity)
+            if position is not None:
+                batch.positions.append((entity.id, *position))
+        with self._write_lock:
+            with self._connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"SELECT id FROM entities WHERE id IN ({', '.join('?' * len(ids))})", ids
+                )
+                existing = cursor.fetchone()
+                if existing is not None:
+                    raise ValueError(f"Entity with id {existing[0]} already managed")
+                self._execute_write(cursor, batch)
+                conn.commit()
+            for entity in chunk:
+                if self._cache is None:
+                    self.entities[entity.id] = entity
+                    self._track(entity)
+                else:
+                    # Lazily loaded entities only keep their position in memory
+                    self._index_position(entity)
+                self._publish(EntityEvent(EntityEventKind.ADDED, entity.id))
+        return len(chunk)
+
+    def export_jsonl(self, path: Path, page_size: int = 10_000) -> int:
+        """Saves, then streams every entity to a JSONL file and returns the number written."""
+        self.save()
+        count = 0
+        with open(path, "w") as f:
+            for rows in self._pages(page_size):
+                for entity_id, name, data in rows:
+                    record = {"id": entity_id, "name": name, "properties": self._decode(data)}
+                    f.write(json.dumps(record) + "\n")
+                count += len(rows)
+        logging.info(f"Exported {count} entities to {path}")
+        return count
 
     def load(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.cursor()
+            if self._cache is not None:
+                # Older saves stored NaN coordinates, which SQLite keeps as NULL
+                cursor.execute(
+                    "SELECT id, x, y, z FROM entity_positions "
+                    "WHERE x IS NOT NULL AND y IS NOT NULL AND z IS NOT NULL"
+                )
+                for entity_id, x, y, z in cursor:
+                    self.spatial_index.insert(entity_id, (x, y, z))
+                logging.info(f"Indexed {len(self.spatial_index)} positions, entities load lazily")
+                return
             cursor.execute("SELECT count(id) FROM entities")
             count = cursor.fetchone()
             logging.info(f"Loading {count[0]} entities")
             cursor.execute("SELECT id, name, properties FROM entities")
-            for row in cursor.fetchall():
-                entity_id, entity_name, data = row
-                data = json.loads(data)
-                entity = Entity.new(id=entity_id, name=entity_name, **data)
+            for entity_id, entity_name, data in cursor.fetchall():
+                entity = self._hydrate(entity_id, entity_name, data)
                 self.entities[entity.id] = entity
+
+    def _hydrate(self, entity_id: EntityId, name: str, data: EncodedProperties) -> Entity:
+        codec = codec_for(data, self.codec)
+        entity = Entity.new(id=entity_id, name=name, **codec.decode(data))
+        if _may_be_non_finite(data):
+            self._non_finite_rows.add(entity_id)
+        self._track(entity)
+        if codec is not self.codec:
+            # Migrate the row so field updates never run against a row in another format
+            self._mark_dirty(entity.id)
+        return entity
+
+    def _decode(self, data: EncodedProperties) -> Dict[str, Any]:
+        return codec_for(data, self.codec).decode(data)
+
+    def _fetch(self, entity_id: EntityId) -> Optional[Entity]:
+        if entity_id in self._removed:
+            return None
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT id, name, properties FROM entities WHERE id = ?", (entity_id,)
+            ).fetchone()
+        return None if row is None else self._hydrate(*row)
+
+    def _exists(self, entity_id: object) -> bool:
+        if entity_id in self._removed:
+            return False
+        with self._connection() as conn:
+            row = conn.execute("SELECT 1 FROM entities WHERE id = ?", (entity_id,)).fetchone()
+        return row is not None
+
+    def _count(self) -> int:
+        with self._connection() as conn:
+            return conn.execute("SELECT count(id) FROM entities").fetchone()[0] - len(self._removed)
+
+    def _pages(self, page_size: int, ids_only: bool = False) -> Iterator[List[Tuple[Any, ...]]]:
+        columns = "id" if ids_only else "id, name, properties"
+        last_id = ""
+        while True:
+            with self._connection() as conn:
+                rows = conn.execute(
+                    f"SELECT {columns} FROM entities WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, page_size),
+                ).fetchall()
+            if not rows:
+                return
+            yield [row for row in rows if row[0] not in self._removed]
+            last_id = rows[-1][0]
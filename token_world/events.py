@@ -0,0 +1,202 @@
+from dataclasses import dataclass
+from enum import Enum
+import logging
+import threading
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+)
+
+if TYPE_CHECKING:
+    from token_world.entity import EntityId  # pragma: no cover
+
+
+class EntityEventKind(Enum):
+    ADDED = "added"
+    UPDATED = "updated"
+    REMOVED = "removed"
+
+
+@dataclass(frozen=True, slots=True)
+class EntityEvent:
+    kind: EntityEventKind
+    entity_id: "EntityId"
+    # The changed property for updates, None for additions and removals
+    key: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class EntityEventBatch:
+    """Events of one kind and key for many entities, published together."""
+
+    kind: EntityEventKind
+    entity_ids: List["EntityId"]
+    key: Optional[str] = None
+
+    def events(self) -> List[EntityEvent]:
+        return [EntityEvent(self.kind, entity_id, self.key) for entity_id in self.entity_ids]
+
+
+EntityEventCallback = Callable[[EntityEvent], None]
+EntityEventBatchCallback = Callable[[EntityEventBatch], None]
+
+
+@dataclass(frozen=True, eq=False)
+class Subscription:
+    callback: Optional[EntityEventCallback]
+    kinds: FrozenSet[EntityEventKind]
+    keys: Optional[FrozenSet[str]]
+    # Receives every event as a batch instead of callback, those of publish_many() in one call
+    batch_callback: Optional[EntityEventBatchCallback] = None
+
+    def deliver(self, batch: EntityEventBatch, events: Optional[List[EntityEvent]] = None):
+        try:
+            if self.batch_callback is not None:
+                self.batch_callback(batch)
+                return
+            assert self.callback is not None
+            for event in batch.events() if events is None else events:
+                self.callback(event)
+        except Exception as e:
+            logging.error(f"Entity event subscriber failed on {batch}: {e}", exc_info=True)
+
+
+class EntityEventBus:
+    """Delivers entity events synchronously to the subscriptions whose filters match.
+
+    Update subscriptions filtered on keys are indexed by key, so publishing an update only
+    touches the subscriptions interested in that key.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # Tuples are replaced rather than mutated so publish() can iterate without the lock
+        self._by_kind: Dict[EntityEventKind, Tuple[Subscription, ...]] = {}
+        self._by_key: Dict[str, Tuple[Subscription, ...]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._by_kind or self._by_key)
+
+    def subscribe(
+        self,
+        callback: EntityEventCallback,
+        kinds: Optional[Collection[EntityEventKind]] = None,
+        keys: Optional[Collection[str]] = None,
+    ) -> Subscription:
+        return self._add(
+            Subscription(
+                callback,
+                frozenset(EntityEventKind if kinds is None else kinds),
+                None if keys is None else frozenset(keys),
+            )
+        )
+
+    def subscribe_batches(
+        self,
+        callback: EntityEventBatchCallback,
+        kinds: Optional[Collection[EntityEventKind]] = None,
+        keys: Optional[Collection[str]] = None,
+    ) -> Subscription:
+        """Like subscribe(), but events are delivered as batches, one per publish_many()."""
+        return self._add(
+            Subscription(
+                None,
+                frozenset(EntityEventKind if kinds is None else kinds),
+                None if keys is None else frozenset(keys),
+                callback,
+            )
+        )
+
+    def _add(self, subscription: Subscription) -> Subscription:
+        with self._lock:
+            for kind in subscription.kinds:
+                if kind is EntityEventKind.UPDATED and subscription.keys is not None:
+                    for key in subscription.keys:
+                        self._by_key[key] = self._by_key.get(key, ()) + (subscription,)
+                else:
+                    self._by_kind[kind] = self._by_kind.get(kind, ()) + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            _discard(self._by_kind, subscription)
+            _discard(self._by_key, subscription)
+
+    def publish(self, event: EntityEvent):
+        subscriptions = self._subscriptions(event.kind, event.key)
+        if not subscriptions:
+            return
+        batch = EntityEventBatch(event.kind, [event.entity_id], event.key)
+        for subscription in subscriptions:
+            subscription.deliver(batch, [event])
+
+    def publish_many(
+        self, kind: EntityEventKind, entity_ids: Iterable["EntityId"], key: Optional[str] = None
+    ):
+        """Publishes an event of the kind and key for each entity, matching subscriptions once."""
+        subscriptions = self._subscriptions(kind, key)
+        if not subscriptions:
+            return
+        batch = EntityEventBatch(kind, list(entity_ids), key)
+        if not batch.entity_ids:
+            return
+        # Events are only created for subscribers that take them one at a time
+        events = None
+        for subscription in subscriptions:
+            if subscription.batch_callback is None and events is None:
+                events = batch.events()
+            subscription.deliver(batch, events)
+
+    def _subscriptions(self, kind: EntityEventKind, key: Optional[str]) -> Tuple[Subscription, ...]:
+        subscriptions = self._by_kind.get(kind, ())
+        if key is not None:
+            subscriptions += self._by_key.get(key, ())
+        return subscriptions
+
+
+def _discard(index: Dict[Any, Tuple[Subscription, ...]], subscription: Subscription):
+    for name, subscriptions in list(index.items()):
+        remaining = tuple(s for s in subscriptions if s is not subscription)
+        if remaining:
+            index[name] = remaining
+        else:
+            del index[name]
+
+
+class ChangeCollector:
+    """Accumulates the ids of changed entities until drained, e.g. once per frame."""
+
+    def __init__(
+        self,
+        bus: EntityEventBus,
+        kinds: Optional[Collection[EntityEventKind]] = None,
+        keys: Optional[Collection[str]] = None,
+    ):
+        self._bus = bus
+        self._lock = threading.Lock()
+        self._changed: Set["EntityId"] = set()
+        self.subscription = bus.subscribe_batches(self._collect, kinds, keys)
+
+    def __len__(self) -> int:
+        return len(self._changed)
+
+    def _collect(self, batch: EntityEventBatch):
+        with self._lock:
+            self._changed.update(batch.entity_ids)
+
+    def drain(self) -> Set["EntityId"]:
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        return changed
+
+    def close(self):
+        self._bus.unsubscribe(self.subscription)
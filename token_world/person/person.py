@@ -5,7 +5,6 @@ import logging
 
 from swarm import Swarm, Agent  # type: ignore[import]
 
-from time import sleep
 from typing import Dict, Iterator, Optional
 
 from token_world.entity import Entity, physical_entity, EntityId
@@ -16,6 +15,7 @@ from token_world.llm.form_filling.form_filler import FormFiller
 from token_world.llm.form_filling.template_parser import parse_template
 from token_world.llm.llm import Message
 from token_world.llm.message_tree import MessageTreeTraversal
+from token_world.scheduler import OverrunPolicy, TickScheduler
 
 
 def person_entity(
@@ -98,11 +98,12 @@ class PersonHandler:
 
 
 class PeopleManager:
-    def __init__(self, client: Swarm, environment: Environment):
+    def __init__(self, client: Swarm, environment: Environment, act_rate: float = 1.0):
         self._person_handlers: Dict[EntityId, PersonHandler] = {}
-        self._is_running = False
         self._client = client
         self._environment = environment
+        # A round of LLM calls can outlast the period, its missed rounds are skipped not queued
+        self.scheduler = TickScheduler(self._act_safely, act_rate, OverrunPolicy.DROP)
 
     @staticmethod
     def is_person(entity: Entity) -> bool:
@@ -111,23 +112,27 @@ class PeopleManager:
     def add_entity(self, entity: Entity):
         self._person_handlers[entity.id] = PersonHandler(entity)
 
+    def remove_entity(self, entity_id: EntityId):
+        self._person_handlers.pop(entity_id, None)
+
     def act(self):
-        for handler in self._person_handlers.values():
+        # Copied since entities can be removed by another thread while people act
+        for handler in list(self._person_handlers.values()):
             handler.act(self._client)
             self._environment.react(handler.message_traversal.node.get_message_chain())
 
+    def _act_safely(self):
+        try:
+            self.act()
+        except Exception as e:
+            logging.error(f"Error in person loop: {e}", exc_info=True)
+
     def start_person_loop(self):
-        self._is_running = True
-        while self._is_running:
-            try:
-                self.act()
-            except Exception as e:
-                logging.error(f"Error in person loop: {e}", exc_info=True)
-            sleep(1)
+        self.scheduler.run()
 
     def stop_person_loop(self):
         logging.info("Stopping person loop requested")
-        self._is_running = False
+        self.scheduler.stop()
 
 
 @contextmanager
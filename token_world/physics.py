@@ -0,0 +1,114 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from token_world.columnar import ColumnStore
+from token_world.entity import EntityId
+
+
+class PhysicsSystem:
+    """Integrates gravity, velocity and ground bounces of physical entities in bulk.
+
+    Positions are the column store's columns and velocities an array whose rows line up with the
+    store's rows. Rows only move when entities are bound or unbound, the velocities are then
+    carried over by id, so each step is a handful of NumPy operations over all bodies. Initial
+    velocities come from the optional velocity properties, vx and vy by default. Bodies falling
+    below the ground along the last axis bounce back, keeping restitution of their speed.
+    """
+
+    def __init__(
+        self,
+        store: ColumnStore,
+        gravity: Sequence[float] = (0.0, -9.8),
+        restitution: float = 0.9,
+        ground: float = 0.0,
+        axes: Sequence[str] = ("x", "y"),
+        velocity_keys: Sequence[str] = ("vx", "vy"),
+    ):
+        if len(gravity) != len(axes) or len(velocity_keys) != len(axes):
+            raise ValueError(f"Gravity and velocity keys need one entry per axis of {axes}")
+        if not 0 <= restitution <= 1:
+            raise ValueError(f"Restitution must be between 0 and 1, got {restitution}")
+        self.store = store
+        self.gravity = np.array(gravity, dtype=np.float64)
+        self.restitution = restitution
+        self.ground = ground
+        self.axes = tuple(axes)
+        self.velocity_keys = tuple(velocity_keys)
+        self._velocities = np.zeros((0, len(self.axes)), dtype=np.float64)
+        self._rows: Dict[EntityId, int] = {}
+        # Store rows of physical entities, None when every row is one
+        self._bodies: Optional[np.ndarray] = None
+        self._layout_version: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._rows) if self._bodies is None else len(self._bodies)
+
+    @property
+    def velocities(self) -> np.ndarray:
+        """Velocities aligned with the store's rows, rows of non-physical entities stay zero."""
+        self._sync_rows()
+        return self._velocities
+
+    def velocity(self, entity_id: EntityId) -> Tuple[float, ...]:
+        return tuple(float(v) for v in self.velocities[self.store.row(entity_id)])
+
+    def set_velocity(self, entity_id: EntityId, velocity: Sequence[float]):
+        self.velocities[self.store.row(entity_id)] = velocity
+
+    def _sync_rows(self):
+        if self._layout_version == self.store.layout_version:
+            return
+        ids = self.store.ids
+        velocities = np.zeros((len(ids), len(self.axes)), dtype=np.float64)
+        physical = np.zeros(len(ids), dtype=bool)
+        for row, entity_id in enumerate(ids):
+            properties = self.store.properties(row)
+            physical[row] = bool(properties.get("is_physical", False))
+            old_row = self._rows.get(entity_id)
+            if old_row is not None:
+                velocities[row] = self._velocities[old_row]
+            elif physical[row]:
+                velocities[row] = [properties.get(key, 0.0) for key in self.velocity_keys]
+        self._velocities = velocities
+        self._rows = {entity_id: row for row, entity_id in enumerate(ids)}
+        self._bodies = None if physical.all() else np.flatnonzero(physical)
+        self._layout_version = self.store.layout_version
+
+    def step(self, dt: float, commit: bool = True):
+        """Advances every body by dt seconds with semi-implicit Euler.
+
+        With commit the moved columns are committed to the store, so entity changes are tracked as
+        usual. Call it inside the manager's transaction to publish a whole tick at once.
+        """
+        self._sync_rows()
+        bodies = self._bodies
+        if bodies is not None and not len(bodies):
+            return
+        velocities = self._velocities if bodies is None else self._velocities[bodies]
+        velocities += self.gravity * dt
+        moved = {i for i in range(len(self.axes)) if velocities[:, i].any()}
+        ground_axis = len(self.axes) - 1
+        if commit:
+            for i in moved | {ground_axis}:
+                self.store.changing(self.axes[i], bodies)
+        for i in moved:
+            column = self.store.column(self.axes[i])
+            if bodies is None:
+                column += velocities[:, i] * dt
+            else:
+                column[bodies] += velocities[:, i] * dt
+        heights = self.store.column(self.axes[ground_axis])
+        body_heights = heights if bodies is None else heights[bodies]
+        below = body_heights < self.ground
+        if below.any():
+            # Mirror the overshoot above the ground and reverse the damped vertical speed
+            bounced = below if bodies is None else bodies[below]
+            heights[bounced] = 2 * self.ground - heights[bounced]
+            velocities[below, ground_axis] *= -self.restitution
+            moved.add(ground_axis)
+        if bodies is not None:
+            self._velocities[bodies] = velocities
+        if commit:
+            for i in sorted(moved):
+                self.store.commit(self.axes[i], bodies)
@@ -0,0 +1,90 @@
+from collections import deque
+from contextlib import contextmanager
+import json
+from pathlib import Path
+import threading
+from time import perf_counter
+from typing import Callable, Deque, Dict, Iterator, List
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+class Profiler:
+    """Rolling timings of named sections, each over its last window samples.
+
+    Sections are timed with section() or record(). Events counted with mark() keep the intervals
+    between them, from which rate() derives their frequency, like frames or simulation ticks.
+    Samples come from any thread.
+    """
+
+    def __init__(self, window: int = 600, clock: Callable[[], float] = perf_counter):
+        if window <= 0:
+            raise ValueError(f"Window must be positive, got {window}")
+        self.window = window
+        self._clock = clock
+        self._samples: Dict[str, Deque[float]] = {}
+        self._last_marks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._samples
+
+    @property
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._samples)
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    @contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.record(name, self._clock() - start)
+
+    def mark(self, name: str):
+        """Records the time since the previous mark of the same name."""
+        now = self._clock()
+        with self._lock:
+            last = self._last_marks.get(name)
+            self._last_marks[name] = now
+        if last is not None:
+            self.record(name, now - last)
+
+    def samples(self, name: str) -> List[float]:
+        with self._lock:
+            return list(self._samples.get(name, ()))
+
+    def mean(self, name: str) -> float:
+        samples = self.samples(name)
+        return sum(samples) / len(samples) if samples else 0.0
+
+    def rate(self, name: str) -> float:
+        """Marks per second over the window."""
+        mean = self.mean(name)
+        return 1.0 / mean if mean > 0 else 0.0
+
+    def percentiles(self, name: str) -> Dict[str, float]:
+        samples = self.samples(name)
+        if not samples:
+            return {"count": 0}
+        values = np.percentile(samples, PERCENTILES)
+        stats = {f"p{p}": float(value) for p, value in zip(PERCENTILES, values)}
+        return {"count": len(samples), "mean": sum(samples) / len(samples), **stats}
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {name: self.percentiles(name) for name in self.names}
+
+    def export_json(self, path: Path):
+        """Writes the rolling percentiles of every section, in seconds."""
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
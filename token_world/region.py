@@ -0,0 +1,262 @@
+from math import floor
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from token_world.entity import Entity, EntityId, EntityManager, SPATIAL_KEYS, entity_position
+from token_world.events import ChangeCollector, EntityEventKind
+from token_world.spatial import Position
+
+RegionKey = Tuple[int, int]
+
+
+def is_agent(entity: Entity) -> bool:
+    return entity.properties.get("is_person", False)
+
+
+class RegionManager:
+    """Shards physical entities into square regions of the x/y plane, one database per region.
+
+    Only regions holding an agent are active, that is loaded with their own EntityManager. The
+    others stay dormant on disk until an agent enters them, so memory and tick cost follow the
+    active regions. Non-physical entities live in an always active global store. A directory
+    database maps every regional entity to its region. Call update() once per tick to move
+    entities that crossed a region border and to put regions without agents back to sleep.
+
+    Writes reach disk in save() only, ordered so that a crash at any point leaves every entity
+    in one region. Entities placed in a region since the last save are written to its database
+    first, then the directory commits, then the regions save and delete the entities that left
+    them. The directory decides where an entity lives, loading a region drops the copies of
+    entities the directory places elsewhere that an interrupted save left behind.
+
+    It is a standalone store, World still keeps every entity in one EntityManager. Worlds need a
+    single manager for their draw handlers, event subscriptions, column store, position
+    snapshots and history, while entities here change managers and go stale when their region
+    deactivates. Simulations that outgrow one database drive a RegionManager themselves.
+    """
+
+    DIRECTORY_FILE = "regions.db"
+    GLOBAL_FILE = "global.db"
+
+    def __init__(
+        self,
+        root_dir: Path,
+        region_size: float = 1000.0,
+        is_agent: Callable[[Entity], bool] = is_agent,
+        **manager_options: Any,
+    ):
+        if region_size <= 0:
+            raise ValueError(f"Region size must be positive, got {region_size}")
+        (root_dir / "regions").mkdir(exist_ok=True, parents=True)
+        self.root_dir = root_dir
+        self.region_size = region_size
+        self.is_agent = is_agent
+        self._manager_options = manager_options
+        self.global_entities = EntityManager(root_dir / self.GLOBAL_FILE, **manager_options)
+        self.regions: Dict[RegionKey, EntityManager] = {}
+        self._moved: Dict[RegionKey, ChangeCollector] = {}
+        self._agents: Dict[RegionKey, Set[EntityId]] = {}
+        # Entities placed in active regions and entities waiting for their dormant region, both
+        # since the last save, and deactivated regions whose changes that save still writes
+        self._placed: Dict[RegionKey, Set[EntityId]] = {}
+        self._pending: Dict[RegionKey, Dict[EntityId, Entity]] = {}
+        self._retired: Dict[RegionKey, EntityManager] = {}
+        self._lock = threading.RLock()
+        # Directory changes are committed by save(), this connection already sees them
+        self._directory = sqlite3.connect(root_dir / self.DIRECTORY_FILE, check_same_thread=False)
+        self._directory.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entity_regions (
+                id TEXT PRIMARY KEY,
+                rx INTEGER,
+                ry INTEGER,
+                is_agent INTEGER
+            )
+        """
+        )
+        self._directory.execute(
+            "CREATE INDEX IF NOT EXISTS entity_regions_agents ON entity_regions (rx, ry, is_agent)"
+        )
+        self._directory.commit()
+
+    def region_of(self, entity: Entity) -> Optional[RegionKey]:
+        position = entity_position(entity)
+        return None if position is None else self._region_at(position)
+
+    def _region_at(self, position: Position) -> RegionKey:
+        return floor(position[0] / self.region_size), floor(position[1] / self.region_size)
+
+    def _region_path(self, region: RegionKey) -> Path:
+        return self.root_dir / "regions" / f"{region[0]}_{region[1]}.db"
+
+    def load(self):
+        with self._lock:
+            self.global_entities.load()
+            rows = self._directory.execute(
+                "SELECT DISTINCT rx, ry FROM entity_regions WHERE is_agent"
+            ).fetchall()
+            for region in rows:
+                self.activate(region)
+
+    def activate(self, region: RegionKey) -> EntityManager:
+        with self._lock:
+            manager = self.regions.get(region)
+            if manager is not None:
+                return manager
+            manager = self._retired.pop(region, None)
+            if manager is None:
+                manager = EntityManager(self._region_path(region), **self._manager_options)
+                manager.load()
+                self._drop_strays(region, manager)
+            pending = self._pending.pop(region, {})
+            for entity in pending.values():
+                if entity.id in manager.entities:
+                    # A copy left behind by an interrupted save
+                    manager.remove_entity(entity.id)
+                manager.add_entity(entity)
+            self._placed.setdefault(region, set()).update(pending)
+            self.regions[region] = manager
+            self._moved[region] = ChangeCollector(
+                manager.events, kinds=[EntityEventKind.UPDATED], keys=SPATIAL_KEYS
+            )
+            rows = self._directory.execute(
+                "SELECT id FROM entity_regions WHERE rx = ? AND ry = ? AND is_agent", region
+            ).fetchall()
+            self._agents[region] = {entity_id for entity_id, in rows}
+            return manager
+
+    def _drop_strays(self, region: RegionKey, manager: EntityManager):
+        rows = self._directory.execute(
+            "SELECT id FROM entity_regions WHERE rx = ? AND ry = ?", region
+        ).fetchall()
+        located = {entity_id for entity_id, in rows}
+        for entity_id in [entity_id for entity_id in manager.entities if entity_id not in located]:
+            manager.remove_entity(entity_id)
+
+    def deactivate(self, region: RegionKey):
+        """Unloads a region, its changes are written by the next save()."""
+        with self._lock:
+            # Saving it now would delete the entities that left it before the directory commits
+            self._retired[region] = self.regions.pop(region)
+            self._moved.pop(region).close()
+            self._agents.pop(region, None)
+
+    def add_entity(self, entity: Entity) -> Entity:
+        region = self.region_of(entity)
+        if region is None:
+            self.global_entities.add_entity(entity)
+            return entity
+        with self._lock:
+            if self._locate(entity.id) is not None:
+                raise ValueError(f"Entity with id {entity.id} already managed")
+            self._place(entity, region)
+        return entity
+
+    def _place(self, entity: Entity, region: RegionKey):
+        agent = self.is_agent(entity)
+        self._directory.execute(
+            "INSERT OR REPLACE INTO entity_regions (id, rx, ry, is_agent) VALUES (?, ?, ?, ?)",
+            (entity.id, *region, agent),
+        )
+        if region in self.regions or agent:
+            self.activate(region).add_entity(entity)
+            self._placed[region].add(entity.id)
+            if agent:
+                self._agents[region].add(entity.id)
+        else:
+            # Entities entering a dormant region wait for save() to write them to its database
+            self._pending.setdefault(region, {})[entity.id] = entity
+
+    def _locate(self, entity_id: EntityId) -> Optional[RegionKey]:
+        row = self._directory.execute(
+            "SELECT rx, ry FROM entity_regions WHERE id = ?", (entity_id,)
+        ).fetchone()
+        return None if row is None else (row[0], row[1])
+
+    def get(self, entity_id: EntityId) -> Entity:
+        """Returns an entity, activating its region if it is dormant."""
+        with self._lock:
+            region = self._locate(entity_id)
+            if region is None:
+                return self.global_entities.entities[entity_id]
+            return self.activate(region).entities[entity_id]
+
+    def remove_entity(self, entity_id: EntityId) -> Entity:
+        with self._lock:
+            region = self._locate(entity_id)
+            if region is None:
+                return self.global_entities.remove_entity(entity_id)
+            entity = self.activate(region).remove_entity(entity_id)
+            self._agents[region].discard(entity_id)
+            self._placed[region].discard(entity_id)
+            self._directory.execute("DELETE FROM entity_regions WHERE id = ?", (entity_id,))
+            return entity
+
+    def entities_within(self, center: Position, radius: float) -> List[Entity]:
+        """Entities within radius of center in the global store and the active regions."""
+        x, y, _ = center
+        min_x, min_y = self._region_at((x - radius, y - radius, 0.0))
+        max_x, max_y = self._region_at((x + radius, y + radius, 0.0))
+        result = self.global_entities.entities_within(center, radius)
+        for region, manager in self.regions.items():
+            if min_x <= region[0] <= max_x and min_y <= region[1] <= max_y:
+                result += manager.entities_within(center, radius)
+        return result
+
+    def update(self):
+        with self._lock:
+            for region in list(self.regions):
+                manager = self.regions[region]
+                for entity_id in self._moved[region].drain():
+                    if entity_id not in manager.spatial_index:
+                        # Removed, or no longer physical which keeps it where it is
+                        continue
+                    target = self._region_at(manager.spatial_index.position(entity_id))
+                    if target != region:
+                        entity = manager.remove_entity(entity_id)
+                        self._agents[region].discard(entity_id)
+                        self._placed[region].discard(entity_id)
+                        self._place(entity, target)
+            for region in list(self.regions):
+                if not self._agents[region]:
+                    self.deactivate(region)
+
+    def save(self):
+        with self._lock:
+            self.global_entities.save()
+            # Entities reach their new region before the directory moves them there
+            for region, entity_ids in self._placed.items():
+                manager = self.regions.get(region) or self._retired[region]
+                self._write(region, [manager.entities[entity_id] for entity_id in entity_ids])
+            for region, pending in self._pending.items():
+                self._write(region, pending.values())
+            self._placed = {region: set() for region in self.regions}
+            self._pending = {}
+            self._directory.commit()
+            # Only then are they deleted from the region they left
+            for manager in self.regions.values():
+                manager.save()
+            retired, self._retired = self._retired, {}
+            for manager in retired.values():
+                manager.save()
+                manager.close()
+
+    def _write(self, region: RegionKey, entities: Iterable[Entity]):
+        manager = EntityManager(self._region_path(region), **self._manager_options)
+        try:
+            for entity in entities:
+                if entity.id in manager.entities:
+                    manager.remove_entity(entity.id)
+                # A copy, the entity itself stays with the manager of its region
+                manager.add_entity(Entity(entity.id, entity.name, dict(entity.properties)))
+            manager.save()
+        finally:
+            manager.close()
+
+    def close(self):
+        with self._lock:
+            self.global_entities.close()
+            for manager in [*self.regions.values(), *self._retired.values()]:
+                manager.close()
+            self._directory.close()
@@ -0,0 +1,150 @@
+from contextlib import nullcontext
+import logging
+from time import perf_counter
+from typing import ContextManager, Iterable, Iterator, List, Optional
+
+from pyglet import app, clock  # type: ignore[import]
+from pyglet.gl import glClearColor  # type: ignore[import]
+from pyglet.math import Mat4  # type: ignore[import]
+from pyglet.text import Label  # type: ignore[import]
+from pyglet.window import Window  # type: ignore[import]
+
+from token_world.drawable.cluster import ClusterGlyphs
+from token_world.profiler import Profiler
+from token_world.world import World
+
+
+class ProfilerOverlay:
+    """Text in the top left corner of the window summarizing the world's profiler.
+
+    The text is only rebuilt every refresh_interval seconds, when it is also logged.
+    """
+
+    def __init__(self, world: World, window: Window, refresh_interval: float = 1.0):
+        assert world.profiler is not None
+        self.world = world
+        self.profiler: Profiler = world.profiler
+        self.refresh_interval = refresh_interval
+        self._refreshed_at: Optional[float] = None
+        self._label = Label(
+            "",
+            x=10,
+            y=window.height - 10,
+            width=window.width - 20,
+            anchor_y="top",
+            multiline=True,
+            font_size=10,
+            color=(0, 0, 0, 255),
+        )
+
+    def lines(self) -> List[str]:
+        def ms(name: str, percentile: str = "p95") -> str:
+            return f"{self.profiler.percentiles(name).get(percentile, 0.0) * 1000:.1f}ms"
+
+        lines = [
+            f"FPS {self.profiler.rate('frame'):.1f}  frame p50 {ms('frame', 'p50')} p99 "
+            f"{ms('frame', 'p99')}",
+            f"sync p95 {ms('sync')} ({self.world.synced_count} callbacks)  snapshot p95 "
+            f"{ms('snapshot')}  view p95 {ms('view')}",
+        ]
+        lines += [
+            f"draw {handler.id} p95 {ms('draw.' + handler.id)}"
+            for handler in self.world.drawable_handlers
+        ]
+        lines.append(
+            f"entities {self.world.entity_count}  ticks/s {self.profiler.rate('tick'):.1f}"
+        )
+        return lines
+
+    def draw(self):
+        now = perf_counter()
+        if self._refreshed_at is None or now - self._refreshed_at >= self.refresh_interval:
+            self._refreshed_at = now
+            lines = self.lines()
+            self._label.text = "\n".join(lines)
+            logging.info(" | ".join(lines))
+        self._label.draw()
+
+
+class WorldRenderer:
+    """Window drawing a World, kept apart so simulations can run headless.
+
+    Attach it to a live world whose simulation runs on another thread, frames then only read the
+    world and never hold up its ticks. Or replay() the recorded versions of a world.
+    """
+
+    def __init__(self, world: World, width: int = 800, height: int = 600):
+        self.world = world
+        self.window = Window(width=width, height=height)
+        self._cluster_glyphs = ClusterGlyphs()
+        self._replay: Optional[Iterator[int]] = None
+        self.overlay = None if world.profiler is None else ProfilerOverlay(world, self.window)
+
+        # Set a different clear color (e.g., white)
+        glClearColor(1.0, 1.0, 1.0, 1.0)
+
+        @self.window.event
+        def on_draw():
+            self.draw()
+
+        viewport = world.viewport
+        if viewport is not None:
+
+            @self.window.event
+            def on_mouse_drag(x, y, dx, dy, buttons, modifiers):
+                viewport.pan(dx, dy)
+
+            @self.window.event
+            def on_mouse_scroll(x, y, scroll_x, scroll_y):
+                viewport.zoom_at(1.25**scroll_y, x, y)
+
+    def draw(self):
+        world = self.world
+        if world.profiler is not None:
+            world.profiler.mark("frame")
+        if world.viewport is not None:
+            with self._section("view"):
+                world.update_view()
+                self._cluster_glyphs.update(world.clusters, world.viewport.zoom)
+            self.window.view = Mat4(*world.viewport.view_matrix())
+        # Handlers taking the whole snapshot skip their per-entity callbacks
+        applied = set()
+        snapshot = None if world.snapshots is None else world.snapshots.interpolated()
+        if snapshot is not None:
+            with self._section("snapshot"):
+                for handler in world.drawable_handlers:
+                    if handler.apply_snapshot(snapshot):
+                        applied.add(handler.id)
+        with self._section("sync"):
+            world.sync_draw_callbacks(applied)
+
+        self.window.clear()
+        for handler in world.drawable_handlers:
+            with self._section(f"draw.{handler.id}"):
+                handler.draw()
+        self._cluster_glyphs.draw()
+        if self.overlay is not None:
+            # The overlay stays put in window coordinates whatever the camera
+            self.window.view = Mat4()
+            self.overlay.draw()
+
+    def _section(self, name: str) -> ContextManager[None]:
+        profiler = self.world.profiler
+        return nullcontext() if profiler is None else profiler.section(name)
+
+    def replay(self, versions: Iterable[int], interval: float = 0.1):
+        """Restores the world to each of the versions in turn, one every interval seconds."""
+        self._replay = iter(versions)
+        clock.schedule_interval(self._replay_step, interval)
+
+    def _replay_step(self, dt: float):
+        assert self._replay is not None
+        version = next(self._replay, None)
+        if version is None:
+            clock.unschedule(self._replay_step)
+            return
+        logging.debug(f"Replaying version {version}")
+        self.world.restore_version(version)
+
+    def run(self):
+        app.run()
@@ -0,0 +1,108 @@
+from enum import Enum
+import logging
+from math import ceil
+import threading
+from time import perf_counter
+from typing import Callable, Optional
+
+
+class OverrunPolicy(Enum):
+    # Run the missed ticks back to back until the schedule is met, at most max_catch_up behind
+    CATCH_UP = "catch_up"
+    # Skip the missed ticks and wait for the next slot of the schedule
+    DROP = "drop"
+
+
+class TickScheduler:
+    """Calls tick at a fixed rate, measured against the clock rather than from the end of a tick.
+
+    A tick lasting longer than the period is an overrun, counted in overrun_count and logged. The
+    ticks it put behind schedule are handled by the overrun policy. Without a rate ticks run back
+    to back at maximum speed, for batch runs. The scheduler paces the simulation only, rendering
+    runs at its own frame rate.
+    """
+
+    def __init__(
+        self,
+        tick: Callable[[], None],
+        rate: Optional[float] = 10.0,
+        policy: OverrunPolicy = OverrunPolicy.CATCH_UP,
+        max_catch_up: int = 5,
+        clock: Callable[[], float] = perf_counter,
+        sleep: Optional[Callable[[float], None]] = None,
+    ):
+        if rate is not None and rate <= 0:
+            raise ValueError(f"Tick rate must be positive, got {rate}")
+        if max_catch_up < 0:
+            raise ValueError(f"Catch up limit must not be negative, got {max_catch_up}")
+        self._tick = tick
+        self.rate = rate
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self._clock = clock
+        self._stopping = threading.Event()
+        # Waiting on the stop event lets stop() interrupt a long pause between ticks
+        self._sleep = sleep if sleep is not None else self._stopping.wait
+        self.tick_count = 0
+        self.overrun_count = 0
+        self.dropped_count = 0
+        self.last_duration: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def period(self) -> Optional[float]:
+        """Simulated seconds per tick, None at maximum speed."""
+        return None if self.rate is None else 1.0 / self.rate
+
+    def run(self, max_ticks: Optional[int] = None):
+        """Ticks on the calling thread until stop() or until max_ticks ran."""
+        period = self.period
+        due = self._clock()
+        ticks = 0
+        while not self._stopping.is_set() and (max_ticks is None or ticks < max_ticks):
+            if period is not None:
+                delay = due - self._clock()
+                if delay > 0:
+                    self._sleep(delay)
+                    if self._stopping.is_set():
+                        break
+            start = self._clock()
+            self._tick()
+            now = self._clock()
+            self.last_duration = now - start
+            self.tick_count += 1
+            ticks += 1
+            if period is not None:
+                if self.last_duration > period:
+                    self.overrun_count += 1
+                    logging.warning(
+                        f"Tick {self.tick_count} overran, took {self.last_duration:.3f}s "
+                        f"of a {period:.3f}s period"
+                    )
+                due = self._schedule(due + period, now, period)
+
+    def _schedule(self, due: float, now: float, period: float) -> float:
+        if now <= due:
+            return due
+        behind = ceil((now - due) / period)
+        if self.policy == OverrunPolicy.DROP:
+            dropped = behind
+        else:
+            dropped = max(behind - self.max_catch_up, 0)
+        if dropped:
+            self.dropped_count += dropped
+            logging.debug(f"Dropped {dropped} ticks behind schedule")
+        return due + dropped * period
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("Scheduler already started")
+        self._thread = threading.Thread(target=self.run, name="tick-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops ticking after the current tick, even when called before run()."""
+        self._stopping.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,105 @@
+from time import perf_counter
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from token_world.columnar import ColumnStore
+from token_world.entity import EntityId
+
+
+class PositionSnapshot:
+    """Immutable positions of entities at one tick, one read-only array row per entity."""
+
+    __slots__ = ("sequence", "time", "ids", "rows", "positions", "layout")
+
+    def __init__(
+        self,
+        sequence: int,
+        time: float,
+        ids: Tuple[EntityId, ...],
+        rows: Dict[EntityId, int],
+        positions: np.ndarray,
+        layout: object = None,
+    ):
+        positions.flags.writeable = False
+        self.sequence = sequence
+        self.time = time
+        self.ids = ids
+        self.rows = rows
+        self.positions = positions
+        # Snapshots sharing a layout share ids and rows, so their arrays line up row by row
+        self.layout = layout
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, entity_id: object) -> bool:
+        return entity_id in self.rows
+
+    def position(self, entity_id: EntityId) -> Tuple[float, ...]:
+        return tuple(float(value) for value in self.positions[self.rows[entity_id]])
+
+
+class SnapshotBuffer:
+    """The two most recent position snapshots, published by the simulation for the renderer.
+
+    Publishing swaps in a new pair with a single assignment and snapshots are never written to
+    after that, so readers neither lock nor block the simulation and never see a torn tick.
+    """
+
+    def __init__(self, keys: Sequence[str] = ("x", "y"), clock: Callable[[], float] = perf_counter):
+        self.keys = tuple(keys)
+        self._clock = clock
+        self._pair: Tuple[Optional[PositionSnapshot], Optional[PositionSnapshot]] = (None, None)
+        self._layout: Optional[Tuple[int, Tuple[EntityId, ...], Dict[EntityId, int]]] = None
+
+    @property
+    def latest(self) -> Optional[PositionSnapshot]:
+        return self._pair[1]
+
+    @property
+    def previous(self) -> Optional[PositionSnapshot]:
+        return self._pair[0]
+
+    def publish(self, store: ColumnStore) -> PositionSnapshot:
+        """Copies the key columns of a column store into a new snapshot."""
+        if self._layout is None or self._layout[0] != store.layout_version:
+            ids = tuple(store.ids)
+            self._layout = (
+                store.layout_version,
+                ids,
+                {entity_id: row for row, entity_id in enumerate(ids)},
+            )
+        _, ids, rows = self._layout
+        positions = np.stack([store.column(key) for key in self.keys], axis=1)
+        latest = self._pair[1]
+        snapshot = PositionSnapshot(
+            0 if latest is None else latest.sequence + 1,
+            self._clock(),
+            ids,
+            rows,
+            positions,
+            layout=self._layout,
+        )
+        self._pair = (latest, snapshot)
+        return snapshot
+
+    def interpolated(self, now: Optional[float] = None) -> Optional[PositionSnapshot]:
+        """Positions blended from the previous towards the latest snapshot.
+
+        The blend advances by the time elapsed since the latest snapshot relative to the interval
+        between the two, so motion is smooth at any frame rate while trailing the simulation by
+        up to a tick. Without two snapshots of the same layout the latest one is returned as is.
+        """
+        previous, latest = self._pair
+        if latest is None or previous is None or previous.layout is not latest.layout:
+            return latest
+        now = self._clock() if now is None else now
+        interval = latest.time - previous.time
+        alpha = 1.0 if interval <= 0 else min(max((now - latest.time) / interval, 0.0), 1.0)
+        if alpha == 1.0:
+            return latest
+        positions = previous.positions + (latest.positions - previous.positions) * alpha
+        return PositionSnapshot(
+            latest.sequence, now, latest.ids, latest.rows, positions, latest.layout
+        )
@@ -0,0 +1,247 @@
+import heapq
+from itertools import compress
+from math import floor, inf, isfinite, sqrt
+import threading
+from typing import (
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+Position = Tuple[float, float, float]
+Cell = Tuple[int, int]
+Key = TypeVar("Key", bound=Hashable)
+
+
+def _finite(position: Position) -> bool:
+    return isfinite(position[0]) and isfinite(position[1]) and isfinite(position[2])
+
+
+class SpatialGrid(Generic[Key]):
+    """Uniform grid over the x/y plane; distances are measured in full 3D.
+
+    Updates and queries hold a lock, so a renderer can query the grid while the simulation moves
+    entities on another thread.
+    """
+
+    def __init__(self, cell_size: float = 50.0):
+        if cell_size <= 0:
+            raise ValueError(f"Cell size must be positive, got {cell_size}")
+        self.cell_size = cell_size
+        self._cells: Dict[Cell, Set[Key]] = {}
+        self._positions: Dict[Key, Position] = {}
+        # Bounding box of every cell used since the grid was last empty, kept conservative
+        self._bounds: Tuple[Cell, Cell] = ((0, 0), (0, 0))
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self._positions
+
+    def _cell(self, x: float, y: float) -> Cell:
+        return floor(x / self.cell_size), floor(y / self.cell_size)
+
+    def position(self, key: Key) -> Position:
+        with self._lock:
+            return self._positions[key]
+
+    def insert(self, key: Key, position: Position):
+        """Adds or moves a key, a NaN or infinite position has no cell and removes it instead."""
+        with self._lock:
+            if _finite(position):
+                self._insert(key, position)
+            else:
+                self._remove(key)
+
+    def _insert(self, key: Key, position: Position):
+        old_position = self._positions.get(key)
+        cell = self._cell(position[0], position[1])
+        self._extend_bounds(cell)
+        if old_position is not None:
+            old_cell = self._cell(old_position[0], old_position[1])
+            if old_cell != cell:
+                self._discard(key, old_cell)
+                self._cells.setdefault(cell, set()).add(key)
+        else:
+            self._cells.setdefault(cell, set()).add(key)
+        self._positions[key] = position
+
+    def move_many(
+        self,
+        keys: Sequence[Key],
+        positions: Sequence[Position],
+        cell_changed: Optional[Iterable[int]] = None,
+    ):
+        """Moves the keys already in the grid to new positions, the others are left out.
+
+        Keys moved to a NaN or infinite position leave the grid, as they do with `insert`. Callers
+        that already know which keys left their cell pass their indices as `cell_changed`, the
+        other keys keep their cell and only have their position updated.
+        """
+        with self._lock:
+            if cell_changed is not None:
+                for index in cell_changed:
+                    key, position = keys[index], positions[index]
+                    if key not in self._positions:
+                        continue
+                    if _finite(position):
+                        self._insert(key, position)
+                    else:
+                        self._remove(key)
+                contains = self._positions.__contains__
+                self._positions.update(compress(zip(keys, positions), map(contains, keys)))
+                return
+            cell_size = self.cell_size
+            for key, position in zip(keys, positions):
+                old_position = self._positions.get(key)
+                if old_position is None:
+                    continue
+                if not _finite(position):
+                    self._remove(key)
+                    continue
+                # Most keys stay in their cell from one tick to the next
+                if floor(position[0] / cell_size) == floor(old_position[0] / cell_size) and floor(
+                    position[1] / cell_size
+                ) == floor(old_position[1] / cell_size):
+                    self._positions[key] = position
+                else:
+                    self._insert(key, position)
+
+    def _extend_bounds(self, cell: Cell):
+        if not self._positions:
+            self._bounds = (cell, cell)
+        (min_x, min_y), (max_x, max_y) = self._bounds
+        x, y = cell
+        self._bounds = ((min(min_x, x), min(min_y, y)), (max(max_x, x), max(max_y, y)))
+
+    def remove(self, key: Key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: Key):
+        position = self._positions.pop(key, None)
+        if position is not None:
+            self._discard(key, self._cell(position[0], position[1]))
+
+    def _discard(self, key: Key, cell: Cell):
+        keys = self._cells[cell]
+        keys.discard(key)
+        if not keys:
+            del self._cells[cell]
+
+    def _ring(self, center: Cell, radius: int) -> Iterator[Set[Key]]:
+        cx, cy = center
+        if radius == 0:
+            cells = [center]
+        else:
+            cells = [
+                (cx + dx, cy + dy) for dx in (-radius, radius) for dy in range(-radius, radius + 1)
+            ]
+            cells += [
+                (cx + dx, cy + dy) for dy in (-radius, radius) for dx in range(1 - radius, radius)
+            ]
+        for cell in cells:
+            keys = self._cells.get(cell)
+            if keys:
+                yield keys
+
+    def _max_ring(self, center: Cell) -> int:
+        cx, cy = center
+        (min_x, min_y), (max_x, max_y) = self._bounds
+        return max(cx - min_x, max_x - cx, cy - min_y, max_y - cy, 0)
+
+    def within(self, center: Position, radius: float) -> List[Key]:
+        x, y, z = center
+        min_x, min_y = self._cell(x - radius, y - radius)
+        max_x, max_y = self._cell(x + radius, y + radius)
+        squared_radius = radius * radius
+        result = []
+        with self._lock:
+            for keys in self._occupied(min_x, min_y, max_x, max_y):
+                for key in keys:
+                    px, py, pz = self._positions[key]
+                    if (px - x) ** 2 + (py - y) ** 2 + (pz - z) ** 2 <= squared_radius:
+                        result.append(key)
+        return result
+
+    def within_box(self, min_x: float, min_y: float, max_x: float, max_y: float) -> List[Key]:
+        return [key for key, _ in self.items_in_box(min_x, min_y, max_x, max_y)]
+
+    def items_in_box(
+        self, min_x: float, min_y: float, max_x: float, max_y: float
+    ) -> List[Tuple[Key, Position]]:
+        """Keys in the box with their positions, read together so they agree with each other."""
+        min_cx, min_cy = self._cell(min_x, min_y)
+        max_cx, max_cy = self._cell(max_x, max_y)
+        result = []
+        with self._lock:
+            for keys in self._occupied(min_cx, min_cy, max_cx, max_cy):
+                for key in keys:
+                    position = self._positions[key]
+                    if min_x <= position[0] <= max_x and min_y <= position[1] <= max_y:
+                        result.append((key, position))
+        return result
+
+    def _occupied(self, min_cx: int, min_cy: int, max_cx: int, max_cy: int) -> Iterator[Set[Key]]:
+        """The keys of each non-empty cell in a range, visiting no more cells than are in use."""
+        if not self._positions:
+            return
+        (low_x, low_y), (high_x, high_y) = self._bounds
+        min_cx, min_cy = max(min_cx, low_x), max(min_cy, low_y)
+        max_cx, max_cy = min(max_cx, high_x), min(max_cy, high_y)
+        if min_cx > max_cx or min_cy > max_cy:
+            return
+        if (max_cx - min_cx + 1) * (max_cy - min_cy + 1) > len(self._cells):
+            # Zoomed far out the range spans mostly empty cells, walk the used ones instead
+            for (cx, cy), keys in self._cells.items():
+                if min_cx <= cx <= max_cx and min_cy <= cy <= max_cy:
+                    yield keys
+            return
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                cell_keys = self._cells.get((cx, cy))
+                if cell_keys:
+                    yield cell_keys
+
+    def nearest(self, center: Position, k: int, max_distance: float = inf) -> List[Key]:
+        with self._lock:
+            return self._nearest(center, k, max_distance)
+
+    def _nearest(self, center: Position, k: int, max_distance: float) -> List[Key]:
+        if k <= 0 or not self._positions:
+            return []
+        x, y, z = center
+        center_cell = self._cell(x, y)
+        max_ring = self._max_ring(center_cell)
+        # Max-heap of the k best candidates so far, stored as (-distance, tie breaker, key)
+        best: List[Tuple[float, int, Key]] = []
+        counter = 0
+        for ring in range(max_ring + 1):
+            # Anything in this ring or beyond is at least this far from the center
+            ring_distance = max(ring - 1, 0) * self.cell_size
+            if ring_distance > max_distance:
+                break
+            if len(best) == k and ring_distance > -best[0][0]:
+                break
+            for keys in self._ring(center_cell, ring):
+                for key in keys:
+                    px, py, pz = self._positions[key]
+                    distance = sqrt((px - x) ** 2 + (py - y) ** 2 + (pz - z) ** 2)
+                    if distance > max_distance:
+                        continue
+                    counter += 1
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, counter, key))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, counter, key))
+        return [key for _, _, key in sorted(best, key=lambda item: (-item[0], item[1]))]
@@ -0,0 +1,96 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from token_world.spatial import Position
+
+# Centroid x, centroid y and entity count of an aggregated group of entities
+Cluster = Tuple[float, float, int]
+
+
+class Viewport:
+    """Camera over the x/y plane showing a width x height pixel window of the world.
+
+    x and y are the world coordinates at the bottom left corner of the window and zoom the number
+    of pixels per world unit. Below lod_zoom entities are too small to tell apart, so they are
+    aggregated into clusters of roughly cluster_pixels on screen instead of being drawn one by one.
+    """
+
+    def __init__(
+        self,
+        width: float,
+        height: float,
+        x: float = 0.0,
+        y: float = 0.0,
+        zoom: float = 1.0,
+        min_zoom: float = 0.001,
+        max_zoom: float = 100.0,
+        lod_zoom: float = 0.25,
+        cluster_pixels: float = 24.0,
+        margin_pixels: float = 16.0,
+    ):
+        if not min_zoom <= zoom <= max_zoom:
+            raise ValueError(f"Zoom must be between {min_zoom} and {max_zoom}, got {zoom}")
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+        self.zoom = zoom
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.lod_zoom = lod_zoom
+        self.cluster_pixels = cluster_pixels
+        # Glyphs are drawn up and to the right of their position, keep those at the edges in view
+        self.margin_pixels = margin_pixels
+
+    @property
+    def detailed(self) -> bool:
+        return self.zoom >= self.lod_zoom
+
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """World box in view as min x, min y, max x and max y, margin included."""
+        margin = self.margin_pixels / self.zoom
+        return (
+            self.x - margin,
+            self.y - margin,
+            self.x + self.width / self.zoom + margin,
+            self.y + self.height / self.zoom + margin,
+        )
+
+    def to_world(self, px: float, py: float) -> Tuple[float, float]:
+        return self.x + px / self.zoom, self.y + py / self.zoom
+
+    def pan(self, dx: float, dy: float):
+        """Drags the world by dx, dy pixels."""
+        self.x -= dx / self.zoom
+        self.y -= dy / self.zoom
+
+    def zoom_at(self, factor: float, px: float, py: float):
+        """Zooms by factor keeping the world point under pixel px, py in place."""
+        wx, wy = self.to_world(px, py)
+        self.zoom = min(max(self.zoom * factor, self.min_zoom), self.max_zoom)
+        self.x = wx - px / self.zoom
+        self.y = wy - py / self.zoom
+
+    def view_matrix(self) -> Tuple[float, ...]:
+        """Column-major 4x4 matrix mapping world coordinates to window pixels."""
+        z = self.zoom
+        columns = (
+            (z, 0.0, 0.0, 0.0),
+            (0.0, z, 0.0, 0.0),
+            (0.0, 0.0, 1.0, 0.0),
+            (-z * self.x, -z * self.y, 0.0, 1.0),
+        )
+        return tuple(value for column in columns for value in column)
+
+    def clusters(self, positions: Sequence[Position]) -> List[Cluster]:
+        """Aggregates positions falling in the same cluster_pixels wide square of the screen."""
+        if not positions:
+            return []
+        xy = np.array(positions, dtype=np.float64)[:, :2]
+        cells = np.floor(xy / (self.cluster_pixels / self.zoom)).astype(np.int64)
+        _, groups, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+        groups = groups.reshape(-1)
+        xs = np.bincount(groups, weights=xy[:, 0]) / counts
+        ys = np.bincount(groups, weights=xy[:, 1]) / counts
+        return [(float(x), float(y), int(n)) for x, y, n in zip(xs, ys, counts)]
@@ -1,12 +1,27 @@
 from contextlib import contextmanager
+import json
+import logging
 from pathlib import Path
-from typing import List
-from pyglet.window import Window  # type: ignore[import]
-from pyglet.gl import glClearColor  # type: ignore[import]
+from typing import Collection, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
 
-from token_world.drawable.base import DrawableEntityHandler, DrawableEntityHandlerDict, DrawCallable
-from token_world.entity import Entity, EntityManager
+from token_world.autosave import Checkpointer
+from token_world.entity import Entity, EntityId, EntityManager
+from token_world.events import ChangeCollector, EntityEventBus, EntityEventKind
 from token_world.person.person import PeopleManager
+from token_world.profiler import Profiler
+from token_world.snapshot import SnapshotBuffer
+from token_world.viewport import Cluster, Viewport
+
+# Drawing is left to an optional WorldRenderer, the world itself never imports pyglet
+if TYPE_CHECKING:
+    from token_world.codec import PropertyCodec  # pragma: no cover
+    from token_world.columnar import ColumnStore  # pragma: no cover
+    from token_world.drawable.base import (  # pragma: no cover
+        DrawableEntityHandler,
+        DrawableEntityHandlerDict,
+        DrawableEntityHandlerId,
+        DrawCallable,
+    )
 
 
 class World:
@@ -16,64 +31,288 @@ class World:
         self,
         root_dir: Path,
         people_manager: PeopleManager,
-        handlers: List[DrawableEntityHandler] = [],
+        handlers: List["DrawableEntityHandler"] = [],
+        entity_cache_size: Optional[int] = None,
+        column_store: Optional["ColumnStore"] = None,
+        keyframe_interval: Optional[int] = None,
+        codec: Optional["PropertyCodec"] = None,
+        viewport: Optional[Viewport] = None,
     ):
         root_dir.mkdir(exist_ok=True, parents=True)
-        self._entity_manager = EntityManager(root_dir / self.DB_FILE)
-        self._drawable_entity_handler: DrawableEntityHandlerDict = {}
-        self._draw_callbacks: List[DrawCallable] = []
+        self._entity_manager = EntityManager(
+            root_dir / self.DB_FILE,
+            cache_size=entity_cache_size,
+            column_store=column_store,
+            keyframe_interval=keyframe_interval,
+            codec=codec,
+        )
+        self._drawable_entity_handler: "DrawableEntityHandlerDict" = {}
+        self._handlers_by_tag: Dict[
+            str, Dict["DrawableEntityHandlerId", "DrawableEntityHandler"]
+        ] = {}
+        self._untagged_handlers: "DrawableEntityHandlerDict" = {}
+        # Keyed by entity and handler so a removed entity's callbacks are found in constant time
+        self._draw_callbacks: Dict[Tuple[EntityId, "DrawableEntityHandlerId"], "DrawCallable"] = {}
+        # Callbacks of handlers without watched keys, run every frame
+        self._polled_callbacks: Dict[Tuple[EntityId, "DrawableEntityHandlerId"], "DrawCallable"] = (
+            {}
+        )
+        self._changed: Dict["DrawableEntityHandlerId", ChangeCollector] = {}
+        self.synced_count = 0
+        # With a viewport, positioned entities only get draw callbacks while in view
+        self.viewport = viewport
+        self._cullable: Dict[EntityId, List["DrawableEntityHandler"]] = {}
+        self._visible: Set[EntityId] = set()
+        self.clusters: List[Cluster] = []
         self._people_manager = people_manager
+        self.checkpointer: Optional[Checkpointer] = None
+        # Set to measure ticks per second, renderers add their frame timings to it
+        self.profiler: Optional[Profiler] = None
+        # Set to publish the column store positions of every tick for renderers to read
+        self.snapshots: Optional[SnapshotBuffer] = None
+
+        for handler in handlers:
+            self.add_drawable_callback_factory(handler)
 
-        self._window = Window(width=800, height=600)
+    @property
+    def events(self) -> EntityEventBus:
+        return self._entity_manager.events
+
+    @property
+    def drawable_handlers(self) -> List["DrawableEntityHandler"]:
+        return list(self._drawable_entity_handler.values())
+
+    def add_drawable_callback_factory(self, handler: "DrawableEntityHandler"):
+        self._drawable_entity_handler[handler.id] = handler
+        if handler.watched_keys is not None:
+            self._changed[handler.id] = ChangeCollector(
+                self.events, kinds=[EntityEventKind.UPDATED], keys=handler.watched_keys
+            )
+        if handler.tags is None:
+            self._untagged_handlers[handler.id] = handler
+        else:
+            for tag in handler.tags:
+                self._handlers_by_tag.setdefault(tag, {})[handler.id] = handler
 
-        # Set a different clear color (e.g., white)
-        glClearColor(1.0, 1.0, 1.0, 1.0)
+    def sync_draw_callbacks(self, skip: Collection["DrawableEntityHandlerId"] = ()) -> int:
+        """Runs the draw callbacks that need to, returns and records how many did.
 
-        @self._window.event
-        def on_draw():
-            for callback in self._draw_callbacks:
+        Callbacks of the skipped handlers do not run, like those already updated from a snapshot.
+        """
+        count = 0
+        for (_, handler_id), callback in self._polled_callbacks.items():
+            if handler_id not in skip:
                 callback()
+                count += 1
+        for handler_id, changed in self._changed.items():
+            changed_ids = changed.drain()
+            if handler_id in skip:
+                continue
+            for entity_id in changed_ids:
+                watched = self._draw_callbacks.get((entity_id, handler_id))
+                if watched is not None:
+                    watched()
+                    count += 1
+        self.synced_count = count
+        logging.debug(f"Synced {count} draw callbacks")
+        return count
 
-            self._window.clear()
-            for handler in self._drawable_entity_handler.values():
-                handler.draw()
+    def update_view(self) -> int:
+        """Gives draw callbacks to the entities in view and takes them from the others.
 
-        for handler in handlers:
-            self.add_drawable_callback_factory(handler)
+        Zoomed out below the viewport's LOD zoom, the entities in view are aggregated into
+        clusters instead. Returns how many entities have draw callbacks.
+        """
+        assert self.viewport is not None
+        # Positions are read along with the ids while the simulation may be moving entities
+        in_view = [
+            (entity_id, position)
+            for entity_id, position in self._entity_manager.spatial_index.items_in_box(
+                *self.viewport.bounds()
+            )
+            if entity_id in self._cullable
+        ]
+        if self.viewport.detailed:
+            visible = {entity_id for entity_id, _ in in_view}
+            clusters: List[Cluster] = []
+        else:
+            visible = set()
+            clusters = self.viewport.clusters([position for _, position in in_view])
+        for entity_id in self._visible - visible:
+            self._detach(entity_id)
+            if not self._people_manager.is_person(self._entity_manager.entities[entity_id]):
+                self._entity_manager.unpin(entity_id)
+        for entity_id in visible - self._visible:
+            self._attach(self._entity_manager.entities[entity_id], self._cullable[entity_id])
+        self._visible = visible
+        self.clusters = clusters
+        return len(visible)
 
-    def add_drawable_callback_factory(self, handler: DrawableEntityHandler):
-        self._drawable_entity_handler[handler.id] = handler
+    def _applicable_handlers(self, entity: Entity) -> List["DrawableEntityHandler"]:
+        handlers = [h for h in self._untagged_handlers.values() if h.is_applicable(entity)]
+        properties = entity.properties
+        tagged: "DrawableEntityHandlerDict" = {}
+        for tag, tag_handlers in self._handlers_by_tag.items():
+            if properties.get(tag):
+                tagged.update(tag_handlers)
+        return handlers + list(tagged.values())
 
     def load(self):
         self._entity_manager.load()
-        for entity in self._entity_manager.entities.values():
+        # Only people and the entities a tagged handler applies to need handing out, which the
+        # indexed property columns find without decoding every row
+        tags = ["is_person", *self._handlers_by_tag]
+        indexed = self._entity_manager.indexed_properties
+        if self._untagged_handlers or any(tag not in indexed for tag in tags):
+            entities = self._entity_manager.scan()
+        else:
+            entities = self._entity_manager.scan(any_of=tags)
+        for entity in entities:
             self._on_add_entity(entity)
 
     def save(self):
         self._entity_manager.save()
 
+    def close(self):
+        self._entity_manager.close()
+
+    @property
+    def entity_count(self) -> int:
+        return len(self._entity_manager.entities)
+
+    def tick(self):
+        if self.profiler is not None:
+            self.profiler.mark("tick")
+        if self.snapshots is not None:
+            column_store = self._entity_manager.column_store
+            if column_store is None:
+                raise RuntimeError("Position snapshots are copied from a column store, pass one")
+            self.snapshots.publish(column_store)
+        # With history enabled every tick becomes a version that can be checked out later
+        if self._entity_manager.keyframe_interval is not None:
+            self._entity_manager.record_version()
+        if self.checkpointer is not None:
+            self.checkpointer.tick()
+
     def add_entity(self, entity: Entity) -> Entity:
         self._entity_manager.add_entity(entity)
         self._on_add_entity(entity)
         return entity
 
+    def import_jsonl(self, path: Path, chunk_size: int = 10_000) -> int:
+        count = self._entity_manager.import_jsonl(path, chunk_size)
+        # Handlers are only consulted once every chunk is written, streaming the file a second time
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._on_add_entity(Entity(record["id"], record["name"], record["properties"]))
+        return count
+
+    def export_jsonl(self, path: Path) -> int:
+        return self._entity_manager.export_jsonl(path)
+
+    def remove_entity(self, entity_id: EntityId) -> Entity:
+        """Removes an entity along with its draw callbacks, shapes and person handler.
+
+        Its row is deleted by the next save.
+        """
+        entity = self._entity_manager.remove_entity(entity_id)
+        self._people_manager.remove_entity(entity_id)
+        self._cullable.pop(entity_id, None)
+        self._visible.discard(entity_id)
+        self._detach(entity_id)
+        return entity
+
+    def restore_version(self, version: int):
+        """Sets the entities to how they were at a recorded version.
+
+        Differences are applied as regular additions, updates and removals so handlers and
+        subscribers follow along, which lets a renderer replay a recorded world.
+        """
+        recorded = self._entity_manager.entities_at(version)
+        for entity_id in [i for i in self._entity_manager.entities if i not in recorded]:
+            self.remove_entity(entity_id)
+        with self._entity_manager.transaction():
+            for entity_id, past in recorded.items():
+                try:
+                    properties = self._entity_manager.entities[entity_id].properties
+                except KeyError:
+                    self.add_entity(past)
+                    continue
+                for key in [key for key in properties if key not in past.properties]:
+                    del properties[key]
+                for key, value in past.properties.items():
+                    if properties.get(key) != value:
+                        properties[key] = value
+
     def _on_add_entity(self, entity: Entity):
+        """Hands an entity to its person and draw handlers.
+
+        The entity may be a detached copy, the managed one is only fetched for handlers that hold
+        on to it, so culled entities of a lazily loaded world stay out of memory.
+        """
+        # Handlers hold on to the entity, so it must stay resident in a bounded entity cache
         if self._people_manager.is_person(entity):
-            self._people_manager.add_entity(entity)
+            self._entity_manager.pin(entity.id)
+            self._people_manager.add_entity(self._entity_manager.entities[entity.id])
+
+        handlers = self._applicable_handlers(entity)
+        if not handlers:
+            return
+        if self.viewport is not None and entity.id in self._entity_manager.spatial_index:
+            # Attached by update_view() once in view, culled entities need not stay resident
+            self._cullable[entity.id] = handlers
+        else:
+            self._attach(self._entity_manager.entities[entity.id], handlers)
 
+    def _attach(self, entity: Entity, handlers: List["DrawableEntityHandler"]):
+        self._entity_manager.pin(entity.id)
+        for handler in handlers:
+            callback = handler.new_draw_callback(entity)
+            self._draw_callbacks[entity.id, handler.id] = callback
+            if handler.watched_keys is None:
+                self._polled_callbacks[entity.id, handler.id] = callback
+
+    def _detach(self, entity_id: EntityId):
         for handler in self._drawable_entity_handler.values():
-            if handler.is_applicable(entity):
-                self._draw_callbacks.append(handler.new_draw_callback(entity))
-        return entity
+            callback = self._draw_callbacks.pop((entity_id, handler.id), None)
+            self._polled_callbacks.pop((entity_id, handler.id), None)
+            if callback is not None:
+                handler.release_draw_callback(callback)
 
 
 @contextmanager
 def persistent_world(
-    root_dir: Path, people_manager: PeopleManager, handlers: List[DrawableEntityHandler]
+    root_dir: Path,
+    people_manager: PeopleManager,
+    handlers: List["DrawableEntityHandler"],
+    entity_cache_size: Optional[int] = None,
+    column_store: Optional["ColumnStore"] = None,
+    autosave_interval: Optional[float] = None,
+    autosave_every_n_ticks: Optional[int] = None,
+    keyframe_interval: Optional[int] = None,
+    codec: Optional["PropertyCodec"] = None,
+    viewport: Optional[Viewport] = None,
 ):
-    world = World(root_dir, people_manager, handlers)
+    world = World(
+        root_dir,
+        people_manager,
+        handlers,
+        entity_cache_size,
+        column_store,
+        keyframe_interval,
+        codec,
+        viewport,
+    )
     world.load()
+    if autosave_interval is not None or autosave_every_n_ticks is not None:
+        world.checkpointer = Checkpointer(world.save, autosave_interval, autosave_every_n_ticks)
+        world.checkpointer.start()
     try:
         yield world
     finally:
+        if world.checkpointer is not None:
+            world.checkpointer.stop()
         world.save()
+        world.close()